@@ -0,0 +1,157 @@
+"""
+audio_io.py
+
+청크 오디오를 한 번만 디코딩하여 16kHz mono float32 NumPy 버퍼로 보관하고,
+파이프라인 각 단계(diarization, Whisper, separation)에는 복사 없는 view를 넘겨주는 모듈
+
+- ffmpeg 서브프로세스 / 임시 wav 파일 제거
+- 업로드 bytes(WebM/Opus, OGG 등)를 PyAV 로 바로 스트림 디코딩
+- 구간 슬라이싱은 NumPy view (zero-copy)
+- pyannote 입력은 torch.from_numpy 로 메모리 공유
+"""
+
+import io
+import math
+import threading
+from pathlib import Path
+
+import av
+import numpy as np
+
+from config import SAMPLE_RATE
+
+# 클라이언트에 광고하는 업로드 형식 (MIME -> 확장자)
+# Opus 는 WAV 대비 약 1/10 대역폭이므로 브라우저 클라이언트는 WebM/Opus 권장
+ACCEPTED_FORMATS = {
+    "audio/webm;codecs=opus": [".webm"],
+    "audio/ogg;codecs=opus": [".ogg", ".opus"],
+    "audio/wav": [".wav"],
+    "audio/flac": [".flac"],
+    "audio/mp4": [".m4a", ".mp4"],
+    "audio/mpeg": [".mp3"],
+}
+PREFERRED_FORMAT = "audio/webm;codecs=opus"
+
+# 리샘플러 flush 용 최소 무음 길이 (입력 샘플 수, swr 필터 지연보다 충분히 큼)
+_FLUSH_SAMPLES = 1024
+
+
+class PcmDecoder:
+    """
+    압축 오디오를 16kHz mono float32 PCM 으로 스트림 디코딩
+
+    입력 형식(sample format, layout, rate)별 AudioResampler 를 보관해 재사용하므로
+    청크마다 필터 그래프를 새로 만들지 않습니다.
+    EOF 를 넣으면 그래프가 닫히므로, 스트림 끝에서는 무음 프레임으로 잔여 샘플을 밀어내고,
+    리샘플러 안에 남은 무음 샘플 수를 기억했다가 다음 스트림 앞부분에서 잘라냅니다.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._resamplers = {}
+        self._residue = {}  # { key: 리샘플러 내부에 남아 있는 flush 무음 샘플 수 }
+        self._lock = threading.Lock()
+
+    def _resampler_for(self, key):
+        resampler = self._resamplers.get(key)
+        if resampler is None:
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=self.sample_rate)
+            self._resamplers[key] = resampler
+        return resampler
+
+    @staticmethod
+    def _to_array(frames):
+        return [f.to_ndarray().reshape(-1) for f in frames]
+
+    def _finish_run(self, key, pieces, expected):
+        """
+        무음 프레임으로 리샘플러를 비우고, 같은 입력 형식으로 디코딩된 구간을 정렬/절단
+        """
+        fmt, layout, rate = key
+        # 출력 샘플 수가 정수가 되도록 무음 길이를 입력/출력 rate 비율의 배수로 맞춤
+        step = rate // math.gcd(rate, self.sample_rate)
+        flush = -(-_FLUSH_SAMPLES // step) * step
+        silence = av.AudioFrame(format=fmt, layout=layout, samples=flush)
+        for plane in silence.planes:
+            plane.update(bytes(plane.buffer_size))
+        silence.sample_rate = rate
+        pieces.extend(self._to_array(self._resampler_for(key).resample(silence)))
+
+        audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        skip = self._residue.get(key, 0)
+        produced = len(audio) - skip
+        self._residue[key] = max(0, int(round(expected + flush * self.sample_rate / rate - produced)))
+        return audio[skip:skip + int(round(expected))]
+
+    def decode(self, source) -> np.ndarray:
+        """
+        :param source: bytes / file-like / 파일 경로
+        :return: (time,) float32, 16kHz mono
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        elif isinstance(source, Path):
+            source = str(source)
+
+        runs = []
+        current, pieces, expected = None, [], 0.0
+
+        with self._lock, av.open(source, mode="r", metadata_errors="ignore") as container:
+            for frame in container.decode(audio=0):
+                key = (frame.format.name, frame.layout.name, frame.sample_rate)
+                if current is not None and key != current:
+                    # 스트림 중간에 입력 형식이 바뀌면 이전 리샘플러를 먼저 비움
+                    runs.append(self._finish_run(current, pieces, expected))
+                    pieces, expected = [], 0.0
+                current = key
+
+                expected += frame.samples * self.sample_rate / frame.sample_rate
+                frame.pts = None
+                pieces.extend(self._to_array(self._resampler_for(key).resample(frame)))
+
+            if current is not None:
+                runs.append(self._finish_run(current, pieces, expected))
+
+        if not runs:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(runs) if len(runs) > 1 else runs[0]
+
+
+# 프로세스 전역 디코더 (리샘플러 재사용)
+decoder = PcmDecoder()
+
+
+def load_waveform(source) -> np.ndarray:
+    """
+    업로드 bytes 또는 오디오 파일을 16kHz mono float32 버퍼로 디코딩 (in-process, PyAV)
+    """
+    return decoder.decode(source)
+
+
+def duration_of(waveform: np.ndarray) -> float:
+    """
+    버퍼 길이(초)
+    """
+    return waveform.shape[-1] / SAMPLE_RATE
+
+
+def slice_waveform(waveform: np.ndarray, start: float, end: float) -> np.ndarray:
+    """
+    [start, end) 초 구간의 view 반환 (복사 없음)
+    waveform: (time,) 또는 (time, channels) - 분리 음원(sources)도 같은 방식으로 자름
+    """
+    s = max(0, int(round(start * SAMPLE_RATE)))
+    e = min(waveform.shape[0], int(round(end * SAMPLE_RATE)))
+    return waveform[s:max(s, e)]
+
+
+def as_pyannote_input(waveform: np.ndarray) -> dict:
+    """
+    pyannote Pipeline / Inference 가 받는 in-memory 입력 형식으로 변환
+    waveform: (time,) float32 -> {"waveform": (1, time) tensor, "sample_rate": int}
+    """
+    import torch
+
+    # torch.from_numpy 는 버퍼를 공유하므로 복사가 일어나지 않음
+    tensor = torch.from_numpy(np.ascontiguousarray(waveform, dtype=np.float32))
+    return {"waveform": tensor.unsqueeze(0), "sample_rate": SAMPLE_RATE}
@@ -0,0 +1,177 @@
+"""
+bench_assign_speakers.py
+
+speaker_assigner.assign_speakers (정렬/인덱스 기반) 와 기존 루프 구현(O(S·(O+D))) 비교 벤치마크
+
+- 2시간 회의 규모의 합성 데이터 (STT 구간, diarization turn, 겹침 구간)
+- 두 구현의 결과가 완전히 같은지 확인 후 소요 시간 출력
+
+사용법: python bench_assign_speakers.py [회의 길이(분)]
+"""
+
+import random
+import sys
+import time
+
+from speaker_assigner import assign_speakers
+
+
+# ----------------------------
+# 기존 루프 구현 (비교 기준)
+# ----------------------------
+def _overlap(a_start, a_end, b_start, b_end):
+    """
+    두 시간 구간의 겹치는 길이 계산
+    """
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+
+def assign_speakers_loop(
+    stt_segments,
+    diar_segments,
+    min_overlap_ratio=0.5,
+    overlaps=None
+):
+    """
+    STT 결과에 speaker 할당 (v8 Overlap Awareness 포함)
+
+    :param stt_segments: [
+        { "start": float, "end": float, "text": str }
+    ]
+
+    :param diar_segments: [
+        { "start": float, "end": float, "global_speaker": str }
+    ]
+
+    :param min_overlap_ratio: STT segment 대비 최소 겹침 비율 (겹침 발화가 없을 경우에만 사용)
+
+    :param overlaps: [
+        { "start": float, "end": float, "speakers": [str] }
+    ] - 겹침 발화 구간 정보
+
+    :return: [
+        { "start", "end", "speaker", "text" }
+    ]
+    """
+
+    results = []
+
+    for seg in stt_segments:
+        seg_len = seg["end"] - seg["start"]
+        overlap_map = {}
+
+        # 1. 겹침 발화(Overlap) 여부 먼저 확인
+        involved_in_overlap = []
+        if overlaps:
+            for ov in overlaps:
+                # STT 구간과 겹침 구간의 교지합이 2초 이상이거나 구간의 50% 이상이면 겹침으로 간주
+                ov_len = _overlap(seg["start"], seg["end"], ov["start"], ov["end"])
+                if ov_len >= 2.0 or (ov_len / seg_len >= 0.5):
+                    involved_in_overlap = ov["speakers"]
+                    break
+
+        # 2. 일반적인 화자 매칭 (가장 높은 점유율)
+        for d in diar_segments:
+            ov = _overlap(
+                seg["start"], seg["end"],
+                d["start"], d["end"]
+            )
+
+            if ov <= 0:
+                continue
+
+            spk = d["global_speaker"]
+            overlap_map[spk] = overlap_map.get(spk, 0.0) + ov
+
+        if involved_in_overlap:
+            # v8: 여러 화자가 동시에 말하는 것으로 표시
+            # 화자들을 정렬하여 일관성 유지
+            sorted_spk = sorted(list(set(involved_in_overlap)))
+            speaker = " & ".join(sorted_spk)
+            
+            # 2초 이상의 유의미한 겹침일 경우 마커 추가
+            # involved_in_overlap이 설정되었다는 것은 이미 내부 루프에서 임계값을 넘었다는 뜻
+            # 여기서는 명시적으로 '(겹침 발화)' 문구 추가
+            speaker += " (겹침 발화)"
+        elif not overlap_map:
+            speaker = "UNKNOWN"
+        else:
+            best_speaker, best_overlap = max(
+                overlap_map.items(),
+                key=lambda x: x[1]
+            )
+
+            if best_overlap / seg_len >= min_overlap_ratio:
+                speaker = best_speaker
+            else:
+                speaker = "UNKNOWN"
+
+        results.append({
+            "start": round(float(seg["start"]), 2),
+            "end": round(float(seg["end"]), 2),
+            "speaker": speaker,
+            "text": seg["text"]
+        })
+
+    return results
+
+
+# ----------------------------
+# 합성 회의 데이터
+# ----------------------------
+def synthetic_meeting(minutes: float = 120.0, speakers: int = 6, seed: int = 0):
+    """
+    :return: (stt_segments, diar_segments, overlaps) 회의 전체 시간 기준
+    """
+    rng = random.Random(seed)
+    total = minutes * 60.0
+
+    diar, t = [], 0.0
+    while t < total:
+        length = round(rng.uniform(0.5, 12.0), 2)
+        diar.append({"start": round(t, 2), "end": round(t + length, 2), "global_speaker": f"SPK_{rng.randrange(speakers)}"})
+        # 가끔 앞 turn 과 겹치게 시작
+        t += length - (round(rng.uniform(0.0, 3.0), 2) if rng.random() < 0.2 else -round(rng.uniform(0.0, 1.0), 2))
+
+    stt, t = [], 0.0
+    while t < total:
+        length = round(rng.uniform(1.0, 8.0), 2)
+        stt.append({"start": round(t, 2), "end": round(t + length, 2), "text": "..."})
+        t += length + round(rng.uniform(0.0, 0.8), 2)
+
+    overlaps = []
+    for prev, cur in zip(diar, diar[1:]):
+        if cur["start"] < prev["end"] and cur["global_speaker"] != prev["global_speaker"]:
+            overlaps.append({
+                "start": cur["start"],
+                "end": min(prev["end"], cur["end"]),
+                "speakers": sorted({prev["global_speaker"], cur["global_speaker"]}),
+            })
+    return stt, diar, overlaps
+
+
+def _timeit(fn, *args, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run_benchmark(minutes: float = 120.0):
+    stt, diar, overlaps = synthetic_meeting(minutes)
+    print(f"[Bench] {minutes:.0f} min: {len(stt)} STT segments, {len(diar)} turns, {len(overlaps)} overlaps")
+
+    fast, fast_sec = _timeit(assign_speakers, stt, diar, 0.5, overlaps)
+    loop, loop_sec = _timeit(assign_speakers_loop, stt, diar, 0.5, overlaps, repeat=1)
+
+    print(f"  - loop (reference): {loop_sec * 1000:9.1f} ms")
+    print(f"  - indexed:          {fast_sec * 1000:9.1f} ms  (x{loop_sec / fast_sec:.0f})")
+    print(f"  - identical: {fast == loop}")
+    return fast == loop
+
+
+if __name__ == "__main__":
+    run_benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 120.0)
@@ -9,7 +9,56 @@ MODEL_NAME = cfg["MODEL_NAME"]
 LANGUAGE = cfg["LANGUAGE"]
 CHUNK_SEC = cfg["CHUNK_SEC"]
 OVERLAP = 3.0
+SAMPLE_RATE = 16000  # 모든 모델 입력 공통 (16kHz mono)
 NUM_WORKERS = 1
-DEVICE = cfg["DEVICE"]  # GPU(CUDA) 강제 사용
+DEVICE = cfg["DEVICE"]  # "cuda" (T4) 또는 "cpu" (CPU 프로필: Linear/LSTM int8 양자화, 저부하/오버플로 노드용)
+CPU_THREADS = cfg.get("CPU_THREADS", 4)  # CPU 프로필 intra-op 스레드 수 (torch / CTranslate2)
+# CPU 프로필에서 pyannote 모델의 Linear/LSTM 층만 int8 동적 양자화 (convolution 층은 fp32 그대로)
+CPU_QUANTIZE_LINEAR = cfg.get("CPU_QUANTIZE_LINEAR", cfg.get("CPU_QUANTIZE", True))
+# 화자 embedding: "model" (pyannote/embedding 별도 로드, 발화 구간마다 계산)
+#               "pipeline" (diarization pipeline 의 화자별 centroid 재사용, 추가 모델 없음)
+# 두 방식의 embedding 공간이 다르므로 변경 시 /reset 필요
+DIARIZATION_EMBEDDINGS = cfg.get("DIARIZATION_EMBEDDINGS", "model")
+PIPELINE_QUEUE_SIZE = cfg.get("PIPELINE_QUEUE_SIZE", 2)  # 단계 사이 대기열 크기 (bounded)
 
+# [v8] Speech separation: "immediate" (청크 처리 중) / "deferred" (POST /end 에서 일괄 처리)
+SEPARATION_MODE = cfg.get("SEPARATION_MODE", "immediate")
+# 분리 실행 단위: "overlap" (diarization 후 겹침 구간마다 separator 실행)
+#               "chunk" (separator 1회로 청크 전체의 화자 구간 + 화자별 음원을 함께 얻음, immediate 전용)
+SEPARATION_PASS = cfg.get("SEPARATION_PASS", "overlap")
 
+# STT 방식: "full" (청크 전체 전사, diarization 과 동시 실행)
+#          "regions" (깨끗한 구간은 원본, 분리된 겹침 구간은 트랙에서만 전사 -> 중복 없음)
+TRANSCRIBE_MODE = cfg.get("TRANSCRIBE_MODE", "full")
+
+# Streaming diarization: 직전 청크 끝 lookback 을 붙여 처리하고 전역 화자 ID 를 바로 부여
+STREAMING_DIARIZATION = cfg.get("STREAMING_DIARIZATION", False)
+STREAMING_LOOKBACK_SEC = cfg.get("STREAMING_LOOKBACK_SEC", 5.0)
+
+# 청크 diarization 에 SpeakerRegistry 기반 화자 수 힌트 전달 (max = 지금까지 들린 화자 수 + margin)
+SPEAKER_COUNT_HINTS = cfg.get("SPEAKER_COUNT_HINTS", True)
+SPEAKER_HINT_MARGIN = cfg.get("SPEAKER_HINT_MARGIN", 2)  # 한 청크에 새로 등장할 수 있는 화자 수
+
+# 회의 종료(POST /end) 시 전체 embedding 으로 화자 재클러스터링 (쪼개진 화자 병합)
+RECLUSTER_AT_END = cfg.get("RECLUSTER_AT_END", True)
+RECLUSTER_THRESHOLD = cfg.get("RECLUSTER_THRESHOLD", 0.7)  # 화자 centroid 병합 기준 cosine similarity
+
+# 등록 화자(voice profile) 저장소: 회의/reset 과 무관하게 유지
+VOICE_PROFILE_DIR = cfg.get("VOICE_PROFILE_DIR", "./profiles")
+VOICE_PROFILE_THRESHOLD = cfg.get("VOICE_PROFILE_THRESHOLD", 0.75)  # 등록 화자로 식별할 cosine similarity
+
+# [v8] Per-chunk time budget (speech_separation_plan.md "Safe-guards")
+CHUNK_DEADLINE_SEC = cfg.get("CHUNK_DEADLINE_SEC", 25.0)  # 업로드 시점부터의 처리 예산
+SEPARATION_MIN_SEC = cfg.get("SEPARATION_MIN_SEC", 2.0)  # 이보다 짧은 겹침은 분리하지 않음
+SEPARATION_MAX_OVERLAPS = cfg.get("SEPARATION_MAX_OVERLAPS", 3)  # 청크당 분리할 최대 겹침 수 (긴 순)
+REFINE_TIMEOUT_SEC = cfg.get("REFINE_TIMEOUT_SEC", 10.0)  # LLM 정제 최대 대기 시간
+REFINE_MAX_CONCURRENCY = cfg.get("REFINE_MAX_CONCURRENCY", 4)  # 동시 LLM 요청 수
+REFINE_MAX_CONNECTIONS = cfg.get("REFINE_MAX_CONNECTIONS", 8)  # 공유 HTTP connection pool 크기
+# LLM 정제 호출 정책: "suspects" - 용어집 교정 후 확인 필요 표기가 남은 청크만 (용어집이 비어 있으면 모든 청크), "always" - 모든 청크
+REFINE_LLM_POLICY = cfg.get("REFINE_LLM_POLICY", "suspects")
+# 정제 대기열이 밀렸을 때 연속 청크를 LLM 요청 1번으로 묶는 한도 (1 이면 묶지 않음)
+REFINE_BATCH_MAX_CHUNKS = cfg.get("REFINE_BATCH_MAX_CHUNKS", 4)
+REFINE_BATCH_TOKEN_BUDGET = cfg.get("REFINE_BATCH_TOKEN_BUDGET", 3000)  # 묶음 입력 세그먼트의 추정 토큰 상한
+GLOSSARY_PATH = cfg.get("GLOSSARY_PATH", "./glossary.json")  # 로컬 용어집 (없으면 원격 검색만 사용)
+SEARCH_CACHE_SIZE = cfg.get("SEARCH_CACHE_SIZE", 256)  # 원격 검색 결과 캐시 항목 수
+SEARCH_CACHE_TTL_SEC = cfg.get("SEARCH_CACHE_TTL_SEC", 600.0)  # 원격 검색 결과 유지 시간
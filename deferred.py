@@ -0,0 +1,149 @@
+"""
+deferred.py
+
+[v8] Deferred Refinement (speech_separation_plan.md 3절)
+
+- 회의 중: 겹침 구간 오디오를 output/overlaps/ 에 저장하고, 실시간으로는 "(겹침 발화)" 라벨만 전송
+- POST /end: 저장된 겹침 구간을 일괄 분리 + 트랙별 Whisper 전사 후,
+  최종 결과에서 해당 구간의 겹침 레코드를 화자별 레코드로 교체
+"""
+
+import json
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from config import CHUNK_SEC, SEPARATION_MIN_SEC
+from audio_io import slice_waveform
+
+OVERLAP_MARK = "(겹침 발화)"
+
+
+class DeferredOverlapStore:
+    """
+    회의 중 기록된 겹침 구간 (오디오는 .npy, 메타데이터는 jsonl)
+    """
+
+    def __init__(self, overlap_dir: Path):
+        self.dir = Path(overlap_dir)
+        self.index_path = self.dir / "deferred_overlaps.jsonl"
+        self._lock = threading.Lock()
+
+    def record(self, chunk_index: int, waveform: np.ndarray, overlaps):
+        """
+        SEPARATION_MIN_SEC 이상인 겹침 구간의 오디오와 위치(청크 내 offset)를 저장
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.index_path, "a", encoding="utf-8") as f:
+            for ov in overlaps:
+                if ov["end"] - ov["start"] < SEPARATION_MIN_SEC:
+                    continue
+                path = self.dir / f"ov_{chunk_index:05d}_{ov['start']:.2f}.npy"
+                np.save(path, slice_waveform(waveform, ov["start"], ov["end"]))
+                f.write(json.dumps({
+                    "chunk": chunk_index,
+                    "start": ov["start"],
+                    "end": ov["end"],
+                    "speakers": ov["speakers"],
+                    "path": str(path),
+                }, ensure_ascii=False) + "\n")
+
+    def load(self):
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def clear(self):
+        with self._lock:
+            if self.dir.exists():
+                shutil.rmtree(self.dir)
+
+
+def _patch(segments, entry, new_records):
+    """
+    겹침 구간 안의 "(겹침 발화)" 레코드를 분리된 화자별 레코드로 교체
+    """
+    g_start = entry["chunk"] * CHUNK_SEC + entry["start"]
+    g_end = entry["chunk"] * CHUNK_SEC + entry["end"]
+
+    kept, removed = [], 0
+    for seg in segments:
+        seg_len = max(seg["end"] - seg["start"], 1e-6)
+        inter = max(0.0, min(seg["end"], g_end) - max(seg["start"], g_start))
+        if seg["chunk"] == entry["chunk"] and OVERLAP_MARK in seg["speaker"] and inter / seg_len >= 0.5:
+            removed += 1
+            continue
+        kept.append(seg)
+    return kept + new_records, removed
+
+
+def run_deferred_separation(store: DeferredOverlapStore, separator, diarizer, speaker_registry, segments):
+    """
+    기록된 겹침 구간을 일괄 분리하고, 모든 트랙을 한 번의 배치 Whisper 호출로 전사한 뒤
+    최종 segments 를 패치
+
+    :return: (patched segments, report)
+    """
+    from transcribe_gpu import transcribe_batch
+    from processor import separate_tracks, label_tracks
+
+    entries = store.load()
+    report = {"overlaps": len(entries), "separated": 0, "replaced": 0, "added": 0, "failed": 0}
+    if not entries or separator is None:
+        return segments, report
+
+    # 1. 분리 + 트랙별 화자 매칭
+    print(f"[Deferred] Separating {len(entries)} recorded overlaps...")
+    separated = []  # (entry, tracks, labels)
+    for entry in entries:
+        try:
+            tracks = separate_tracks(separator, np.load(entry["path"]))
+            labels = label_tracks(diarizer, speaker_registry, tracks, entry["speakers"])
+            separated.append((entry, tracks, labels))
+        except Exception as e:
+            print(f"[Deferred] Separation failed for chunk {entry['chunk']} {entry['start']}s: {e}")
+            report["failed"] += 1
+
+    if not separated:
+        return segments, report
+
+    # 2. 전체 트랙 일괄 전사
+    tracks = [track for _, entry_tracks, _ in separated for track in entry_tracks]
+    print(f"[Deferred] Transcribing {len(tracks)} tracks in one batch...")
+    try:
+        track_segments = transcribe_batch(tracks)
+    except Exception as e:
+        # 회의는 이미 종료됨 -> 실패해도 기존 segments 로 최종 결과는 남겨야 함
+        print(f"[Deferred] Batch transcription failed for {len(tracks)} tracks: {e}")
+        report["failed"] += len(separated)
+        return segments, report
+
+    # 3. 겹침 레코드 교체
+    cursor = 0
+    for entry, entry_tracks, labels in separated:
+        offset = entry["chunk"] * CHUNK_SEC + entry["start"]
+        new_records = []
+        for segs, label in zip(track_segments[cursor:cursor + len(entry_tracks)], labels):
+            for rs in segs:
+                new_records.append({
+                    "id": f"{entry['chunk']}-sep-{report['added'] + len(new_records)}",
+                    "chunk": entry["chunk"],
+                    "speaker": label or " & ".join(entry["speakers"]) + f" {OVERLAP_MARK}",
+                    "start": round(offset + rs["start"], 2),
+                    "end": round(offset + rs["end"], 2),
+                    "text": rs["text"],
+                    "separated": True,
+                })
+        cursor += len(entry_tracks)
+
+        segments, removed = _patch(segments, entry, new_records)
+        report["separated"] += 1
+        report["replaced"] += removed
+        report["added"] += len(new_records)
+
+    segments.sort(key=lambda x: x["start"])
+    print(f"[Deferred] Done: {report}")
+    return segments, report
@@ -2,10 +2,21 @@ from pathlib import Path
 import torch
 import numpy as np
 import os
+import time
+import threading
+import warnings
 from pyannote.audio import Pipeline, Model, Inference, Audio
 from pyannote.core import Segment
 from huggingface_hub import login
-from config import DEVICE
+from config import DEVICE, DIARIZATION_EMBEDDINGS, CPU_THREADS, CPU_QUANTIZE_LINEAR
+from audio_io import as_pyannote_input
+from intervals import find_overlaps
+
+# Turn embeddings are computed in batches of similar-length turns
+EMBED_BATCH_SIZE = 32
+EMBED_BUCKET_RATIO = 1.5  # longest / shortest turn within a batch (bounds padding)
+# Per local speaker, stop embedding turns once this much audio is embedded (longest turns first)
+SPEAKER_EMBED_SEC = 10.0
 
 class Diarizer:
     """
@@ -13,14 +24,27 @@ class Diarizer:
     pyannote.audio 3.3.1 compatible
     """
 
-    def __init__(self, hf_token: str):
-        if DEVICE != "cuda":
-            raise RuntimeError(f"Invalid DEVICE={DEVICE}. This pipeline requires CUDA.")
-
-        if not torch.cuda.is_available():
-            raise RuntimeError("CUDA is required but not available.")
+    def __init__(self, hf_token: str, embedding_source: str = DIARIZATION_EMBEDDINGS):
+        """
+        :param embedding_source: "model" - separate pyannote/embedding model, one embedding per turn
+                                 "pipeline" - per-speaker centroids from the diarization pipeline itself
+                                 (no extra model, no per-turn forward passes)
+        """
+        if DEVICE == "cuda":
+            if not torch.cuda.is_available():
+                raise RuntimeError("CUDA is required but not available.")
+        elif DEVICE == "cpu":
+            # CPU profile: bounded intra-op threads so several replicas can share a node
+            torch.set_num_threads(CPU_THREADS)
+        else:
+            raise RuntimeError(f"Invalid DEVICE={DEVICE}. Use 'cuda' or 'cpu'.")
 
-        self.device = torch.device("cuda")
+        self.device = torch.device(DEVICE)
+        self.quantized_layers = None  # e.g. ["Linear", "LSTM"] once quantized
+        self._rtf_lock = threading.Lock()
+        self._audio_sec = 0.0
+        self._busy_sec = 0.0
+        self._calls = 0
 
         # HF Login (Version-safe)
         login(token=hf_token)
@@ -36,112 +60,380 @@ class Diarizer:
         
         self.pipeline.to(self.device)
 
-        # Embedding model (Used for speaker identity)
-        self.embedding_model = Model.from_pretrained(
-            "pyannote/embedding",
-            use_auth_token=hf_token
-        ).to(self.device)
+        # Embedding model (Used for speaker identity) - optional
+        self.embedding_model = None
+        self.embedding_inference = None
+        if embedding_source == "model":
+            self.embedding_model = Model.from_pretrained(
+                "pyannote/embedding",
+                use_auth_token=hf_token
+            ).to(self.device)
 
-        self.embedding_inference = Inference(
-            self.embedding_model,
-            window="whole",
-        ).to(self.device)
+            self.embedding_inference = Inference(
+                self.embedding_model,
+                window="whole",
+            ).to(self.device)
 
         self.audio = Audio(sample_rate=16000, mono=True)
 
-    def diarize(self, audio_path: str):
+        if DEVICE == "cpu" and CPU_QUANTIZE_LINEAR:
+            self._quantize_linear_int8()
+
+    def _quantize_linear_int8(self):
+        """
+        CPU profile: int8 dynamic quantization of the Linear/LSTM layers only
+        (segmentation LSTM + classifier, embedding heads). Dynamic quantization does not cover
+        convolutions, so the embedding model's conv blocks - most of its cost - stay fp32.
+        Modules are replaced in place, so the pipeline and Inference wrappers keep working unchanged.
+        """
+        models = [
+            getattr(getattr(self.pipeline, "_segmentation", None), "model", None),
+            getattr(getattr(self.pipeline, "_embedding", None), "model_", None),
+            self.embedding_model,
+        ]
+        for model in models:
+            if model is None:
+                continue
+            try:
+                torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8, inplace=True
+                )
+                self.quantized_layers = ["Linear", "LSTM"]
+            except Exception as e:
+                print(f"[WARN] int8 quantization skipped for {type(model).__name__}: {e}")
+
+    def _track_rtf(self, audio_dict, started):
+        with self._rtf_lock:
+            self._audio_sec += audio_dict["waveform"].shape[-1] / audio_dict["sample_rate"]
+            self._busy_sec += time.perf_counter() - started
+            self._calls += 1
+
+    def profile(self) -> dict:
+        """
+        Device profile and the real-time factor measured on this host since startup
+        (processing sec / audio sec, lower is faster) - a local runtime value, not a reference figure
+        """
+        with self._rtf_lock:
+            rtf = self._busy_sec / self._audio_sec if self._audio_sec > 0 else None
+            return {
+                "device": DEVICE,
+                "threads": torch.get_num_threads() if DEVICE == "cpu" else None,
+                "quantized_layers": self.quantized_layers,
+                "embeddings": "pipeline" if self.embedding_inference is None else "model",
+                "calls": self._calls,
+                "audio_sec": round(self._audio_sec, 1),
+                "measured_local_rtf": round(rtf, 3) if rtf is not None else None,
+            }
+
+    def _load(self, audio):
+        """
+        Accepts a decoded 16kHz mono buffer (zero-copy) or a file path.
+        """
+        if isinstance(audio, np.ndarray):
+            return as_pyannote_input(audio)
+        waveform, sample_rate = self.audio(str(Path(audio).resolve()))
+        return {"waveform": waveform, "sample_rate": sample_rate}
+
+    def diarize(self, audio, min_speakers: int = None, max_speakers: int = None):
         """
         Returns diarization results with overlap awareness.
+        :param audio: np.ndarray (16kHz mono float32) or audio file path
+        :param min_speakers / max_speakers: optional bounds for the clustering step
+            (see SpeakerRegistry.count_hints); None leaves pyannote's full search
+        """
+        audio_dict = self._load(audio)
+        hints = _count_kwargs(min_speakers, max_speakers)
+        started = time.perf_counter()
+
+        if self.embedding_inference is None:
+            # centroids: (num_speakers, dim), rows ordered like diarization.labels()
+            diarization, centroids = self.pipeline(audio_dict, return_embeddings=True, **hints)
+            results = self._centroid_turns(diarization, centroids)
+        else:
+            diarization = self.pipeline(audio_dict, **hints)
+            results = self._embed_turns(audio_dict, diarization)
+
+        self._track_rtf(audio_dict, started)
+        return results
+
+    def diarize_separate(self, audio, separator, min_speakers: int = None, max_speakers: int = None):
+        """
+        [v8] Single pass of the separation pipeline over the whole chunk.
+        Its diarization replaces self.pipeline, and the per-speaker sources are kept
+        so overlaps can be cut out without running the separator again.
+        :return: (results like diarize(), sources (time, speakers) float32, { label: source column })
+            A chunk without speech has no sources: (0, len(labels)) empty array.
         """
-        audio_path = str(Path(audio_path).resolve())
-        waveform, sample_rate = self.audio(audio_path)
-        audio_dict = {"waveform": waveform, "sample_rate": sample_rate}
+        audio_dict = self._load(audio)
+
+        # speech-separation-ami-1.0 returns (diarization, sources); one source column per cluster
+        started = time.perf_counter()
+        diarization, sources = separator(audio_dict, **_count_kwargs(min_speakers, max_speakers))
+        if self.embedding_inference is None:
+            results = self._centroid_turns(diarization, self._speaker_embeddings(audio_dict, diarization))
+        else:
+            results = self._embed_turns(audio_dict, diarization)
+        self._track_rtf(audio_dict, started)
+
+        labels = diarization.labels()
+        if sources is None:
+            # No speech in the chunk: the separator returns no sources at all
+            return results, np.zeros((0, len(labels)), dtype=np.float32), {}
+        data = np.asarray(sources.data, dtype=np.float32)
+        return results, data, source_columns(diarization, data, audio_dict["sample_rate"])
+
+    def _centroid_turns(self, diarization, centroids):
+        """
+        Speaker turns (>= 0.5s), each carrying its local speaker's embedding.
+        Speakers without a usable embedding are dropped, like failed turn embeddings.
+        """
+        centroids = np.asarray(centroids, dtype=np.float32)
+        by_label = {
+            label: centroids[k]
+            for k, label in enumerate(diarization.labels())
+            if k < len(centroids) and np.all(np.isfinite(centroids[k]))
+        }
 
-        diarization = self.pipeline(audio_dict)
         results = []
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            if turn.duration < 0.5 or speaker not in by_label:
+                continue
+            results.append({
+                "start": round(float(turn.start), 2),
+                "end": round(float(turn.end), 2),
+                "speaker": speaker,
+                "embedding": by_label[speaker],
+            })
+        return results
+
+    def _speaker_embeddings(self, audio_dict, diarization):
+        """
+        One embedding per local speaker (all of its turns >= 0.5s), computed with the diarization
+        pipeline's own embedding model in a single masked batch.
+        Used when the diarization comes from another pipeline (e.g. the separator).
+        :return: (num_speakers, dim) ordered like diarization.labels()
+        """
+        waveform = audio_dict["waveform"][0]
+        sample_rate = audio_dict["sample_rate"]
 
+        pieces = []
+        for label in diarization.labels():
+            spans = [
+                waveform[int(seg.start * sample_rate):int(seg.end * sample_rate)]
+                for seg in diarization.label_timeline(label)
+                if seg.duration >= 0.5
+            ]
+            pieces.append(torch.cat(spans) if spans else waveform[:0])
+
+        max_len = max((len(p) for p in pieces), default=0)
+        if max_len == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        chunks = torch.zeros(len(pieces), 1, max_len)
+        masks = torch.zeros(len(pieces), max_len)
+        for row, piece in enumerate(pieces):
+            chunks[row, 0, :len(piece)] = piece
+            masks[row, :len(piece)] = 1.0
+        # Speakers without audio come back as NaN rows and are dropped by _centroid_turns
+        return self.pipeline._embedding(chunks, masks=masks)
+
+    def _embed_turns(self, audio_dict, diarization):
+        """
+        Speaker turns (>= 0.5s), each carrying its local speaker's pooled embedding.
+
+        Per local label, the longest turns are embedded (batched) until SPEAKER_EMBED_SEC of audio
+        is covered; the rest are not embedded at all. The embedded turns are pooled into one
+        duration-weighted mean, so short noisy turns do not drift the registry centroids and
+        the registry sees one embedding per local speaker.
+        """
         # pyannote.audio 3.x tracks can overlap
         # We group them to detect multi-speaker segments
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            if turn.duration < 0.5:
-                continue
+        turns = [
+            (turn, speaker)
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+            if turn.duration >= 0.5
+        ]
 
-            try:
-                embedding = self.embedding_inference.crop(audio_dict, turn)
-                if hasattr(embedding, "detach"):
-                    embedding = embedding.detach().cpu().numpy()
-
-                results.append({
-                    "start": round(float(turn.start), 2),
-                    "end": round(float(turn.end), 2),
-                    "speaker": speaker,
-                    "embedding": embedding,
-                })
-            except Exception as e:
-                print(f"[WARN] Embedding error at {turn.start:.2f}s: {e}")
+        # 1. Pick the turns to embed: longest first, until the speaker has enough audio
+        selected, covered = [], {}
+        for turn, speaker in sorted(turns, key=lambda x: x[0].duration, reverse=True):
+            if covered.get(speaker, 0.0) < SPEAKER_EMBED_SEC:
+                selected.append((turn, speaker))
+                covered[speaker] = covered.get(speaker, 0.0) + turn.duration
+
+        # 2. Duration-weighted pooling of the (normalized) turn embeddings per speaker
+        sums, weights = {}, {}
+        for (turn, speaker), embedding in zip(selected, self._embed_batched(audio_dict, [t for t, _ in selected])):
+            if embedding is None:
                 continue
+            unit = embedding / (np.linalg.norm(embedding) + 1e-8)
+            sums[speaker] = sums.get(speaker, 0.0) + turn.duration * unit
+            weights[speaker] = weights.get(speaker, 0.0) + turn.duration
+        pooled = {speaker: (sums[speaker] / weights[speaker]).astype(np.float32) for speaker in sums}
 
+        # Speakers whose embeddings all failed are dropped, like failed turns before
+        results = []
+        for turn, speaker in turns:
+            if speaker not in pooled:
+                continue
+            results.append({
+                "start": round(float(turn.start), 2),
+                "end": round(float(turn.end), 2),
+                "speaker": speaker,
+                "embedding": pooled[speaker],
+            })
         return results
 
+    def _embed_batched(self, audio_dict, turns):
+        """
+        Embeds all turns with as few forward passes as possible.
+        Turns are sorted by length and bucketed (longest <= EMBED_BUCKET_RATIO x shortest,
+        at most EMBED_BATCH_SIZE per batch); padding is masked out of the statistics pooling.
+        A failing batch falls back to per-turn crops, so one bad turn only loses itself.
+        :return: [np.ndarray (dim,) or None] in the order of `turns`
+        """
+        waveform = audio_dict["waveform"][0]
+        sample_rate = audio_dict["sample_rate"]
+        spans = []
+        for turn in turns:
+            start = max(0, int(round(turn.start * sample_rate)))
+            end = min(waveform.shape[-1], int(round(turn.end * sample_rate)))
+            spans.append((start, max(start, end)))
+
+        embeddings = [None] * len(turns)
+        batch = []
+        for i in sorted(range(len(turns)), key=lambda i: spans[i][1] - spans[i][0]):
+            length = spans[i][1] - spans[i][0]
+            if length == 0:
+                continue
+            if batch and (len(batch) >= EMBED_BATCH_SIZE or length > EMBED_BUCKET_RATIO * shortest):
+                self._embed_bucket(audio_dict, turns, spans, batch, embeddings)
+                batch = []
+            if not batch:
+                shortest = length
+            batch.append(i)
+        if batch:
+            self._embed_bucket(audio_dict, turns, spans, batch, embeddings)
+        return embeddings
+
+    def _embed_bucket(self, audio_dict, turns, spans, indices, embeddings):
+        waveform = audio_dict["waveform"][0]
+        lengths = [spans[i][1] - spans[i][0] for i in indices]
+        max_len = max(lengths)
+
+        chunks = torch.zeros(len(indices), 1, max_len)
+        for row, i in enumerate(indices):
+            start, end = spans[i]
+            chunks[row, 0, :end - start] = waveform[start:end]
+
+        # Mask padding out of the statistics pooling (frame resolution when the model exposes it)
+        num_frames = getattr(self.embedding_model, "num_frames", None)
+        if num_frames is not None:
+            weights = torch.zeros(len(indices), num_frames(max_len))
+            for row, length in enumerate(lengths):
+                weights[row, :num_frames(length)] = 1.0
+        else:
+            weights = torch.zeros(len(indices), max_len)
+            for row, length in enumerate(lengths):
+                weights[row, :length] = 1.0
+
+        try:
+            with torch.inference_mode(), warnings.catch_warnings():
+                # StatsPool warns when it has to resample sample-level weights to frames
+                warnings.simplefilter("ignore")
+                output = self.embedding_model(chunks.to(self.device), weights=weights.to(self.device))
+            output = output.detach().cpu().numpy().astype(np.float32)
+            for row, i in enumerate(indices):
+                if np.all(np.isfinite(output[row])):
+                    embeddings[i] = output[row]
+        except Exception as e:
+            print(f"[WARN] Batched embedding failed for {len(indices)} turns, retrying one by one: {e}")
+            for i in indices:
+                try:
+                    embedding = self.embedding_inference.crop(audio_dict, turns[i])
+                    if hasattr(embedding, "detach"):
+                        embedding = embedding.detach().cpu().numpy()
+                    embeddings[i] = np.asarray(embedding, dtype=np.float32).reshape(-1)
+                except Exception as ex:
+                    print(f"[WARN] Embedding error at {turns[i].start:.2f}s: {ex}")
+
+    def embed(self, audio):
+        """
+        Whole-clip speaker embedding (e.g. a separated track). Returns None on failure.
+        """
+        try:
+            audio_dict = self._load(audio)
+            if self.embedding_inference is None:
+                # Same embedding space as the pipeline centroids
+                embedding = self.pipeline._embedding(audio_dict["waveform"][None])
+            else:
+                embedding = self.embedding_inference(audio_dict)
+            if hasattr(embedding, "detach"):
+                embedding = embedding.detach().cpu().numpy()
+            embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            return embedding if np.all(np.isfinite(embedding)) else None
+        except Exception as e:
+            print(f"[WARN] Embedding error on clip: {e}")
+            return None
+
     def get_overlapping_segments(self, diar_results):
         """
         [NEW] 식별된 화자들의 시간대를 분석하여 겹침 구간만 추출합니다.
-        알고리즘: 모든 시작/종료 시점을 정렬한 뒤, 각 구간별 활성 화자 수를 계산합니다.
-        """
-        if not diar_results:
-            return []
-
-        # 1. 모든 시점(Event) 수집
-        events = []
-        for d in diar_results:
-            events.append((d["start"], 1, d["speaker"]))  # 시작
-            events.append((d["end"], -1, d["speaker"]))   # 종료
-
-        # 2. 시간순 정렬
-        events.sort()
-
-        overlaps = []
-        active_speakers = set()
-        last_time = events[0][0]
-
-        # 3. 스윕 라인(Sweep-line) 알고리즘으로 겹침 구간 검색
-        for time, kind, speaker in events:
-            # 이전 시점부터 현재 시점까지 활성 화자가 2명 이상이면 겹침 구간
-            if len(active_speakers) > 1 and time > last_time:
-                overlaps.append({
-                    "start": last_time,
-                    "end": time,
-                    "speakers": list(active_speakers)
-                })
-            
-            if kind == 1:
-                active_speakers.add(speaker)
-            else:
-                active_speakers.discard(speaker)
-            
-            last_time = time
-
-        # 4. 인접한 동일 화자 겹침 구간 병합 (Optional, but cleaner)
-        merged = []
-        if overlaps:
-            curr = overlaps[0]
-            for i in range(1, len(overlaps)):
-                nxt = overlaps[i]
-                # 시간적으로 이어져 있고 참여 화자가 동일하면 병합
-                if nxt["start"] == curr["end"] and set(nxt["speakers"]) == set(curr["speakers"]):
-                    curr["end"] = nxt["end"]
-                else:
-                    merged.append(curr)
-                    curr = nxt
-            merged.append(curr)
-
-        return merged
-
-def diarize_audio(audio_path: str, diarizer: Diarizer = None):
+        구간별 활성 화자 계산은 intervals.find_overlaps (NumPy) 사용
+        """
+        return find_overlaps(diar_results)
+
+def source_columns(diarization, sources: np.ndarray, sample_rate: int) -> dict:
+    """
+    Source column (cluster index) of each diarization label.
+    pyannote renames only the clusters that have turns, in cluster order, to SPEAKER_00, SPEAKER_01, ...
+    so a cluster without turns shifts every later label off its column.
+    Labels keep their order; the columns they skip are chosen so that each label's column
+    carries as much of its energy as possible inside that label's turns (monotone alignment).
+    :return: { label: column }
+    """
+    labels = diarization.labels()
+    num_columns = sources.shape[1] if sources.ndim == 2 else 0
+    if len(labels) >= num_columns:
+        return {label: k for k, label in enumerate(labels) if k < num_columns}
+
+    energy = np.square(sources, dtype=np.float64)
+    cumulative = np.vstack([np.zeros((1, num_columns)), np.cumsum(energy, axis=0)])
+    score = np.zeros((len(labels), num_columns))
+    for j, label in enumerate(labels):
+        for seg in diarization.label_timeline(label):
+            start = min(len(energy), max(0, int(seg.start * sample_rate)))
+            end = min(len(energy), max(start, int(seg.end * sample_rate)))
+            score[j] += cumulative[end] - cumulative[start]
+    score /= cumulative[-1] + 1e-12  # share of each column's energy (columns differ in level)
+
+    # best[j, c]: labels[:j + 1] placed on increasing columns, label j on column c
+    best = np.full((len(labels), num_columns), -np.inf)
+    best[0] = score[0]
+    for j in range(1, len(labels)):
+        best[j, j:] = score[j, j:] + np.maximum.accumulate(best[j - 1])[j - 1:-1]
+
+    columns = [int(np.argmax(best[-1]))]
+    for j in range(len(labels) - 2, -1, -1):
+        columns.append(int(np.argmax(best[j, :columns[-1]])))
+    return dict(zip(labels, reversed(columns)))
+
+def _count_kwargs(min_speakers, max_speakers) -> dict:
+    """
+    Speaker-count keyword arguments for a pyannote pipeline call (only the bounds that are set)
+    """
+    hints = {}
+    if min_speakers is not None:
+        hints["min_speakers"] = int(min_speakers)
+    if max_speakers is not None:
+        hints["max_speakers"] = int(max_speakers)
+    return hints
+
+def diarize_audio(audio, diarizer: Diarizer = None, min_speakers: int = None, max_speakers: int = None):
     if diarizer is None:
         hf_token = os.environ.get("HF_TOKEN")
         if not hf_token:
             raise RuntimeError("HF_TOKEN is not set in environment")
         diarizer = Diarizer(hf_token=hf_token)
-    return diarizer.diarize(audio_path)
+    return diarizer.diarize(audio, min_speakers=min_speakers, max_speakers=max_speakers)
 
@@ -32,9 +32,11 @@ class EngineManager:
             print("[Engine] Loading Diarizer (Pyannote)...")
             self.shared_diarizer = Diarizer(hf_token=self.hf_token)
             
-            # 2. Speech Separator 로드 (v8)
+            # 2. Speech Separator 로드 (v8) - CPU 프로필에서는 실시간 처리가 불가능하므로 생략
             print("[Engine] [v8] Loading Speech Separator (AMI)...")
             try:
+                if not torch.cuda.is_available():
+                    raise RuntimeError("CUDA not available")
                 self.shared_separator = Pipeline.from_pretrained(
                     "pyannote/speech-separation-ami-1.0",
                     use_auth_token=self.hf_token
@@ -0,0 +1,282 @@
+"""
+glossary.py
+
+Refiner 용 도메인 지식 조회 (로컬 용어집 + 원격 검색 결과 캐시)
+
+- Glossary: 용어집 파일을 한 번 읽어 메모리에 색인
+  * 형식: [{"term": "이음", "description": "회사명", "aliases": ["이음사"],
+           "mishearings": ["이윰"], "suspects": ["이름"]}] (JSON)
+    - aliases: 올바른 다른 표기, mishearings: 항상 term 으로 고쳐도 되는 오인식,
+      suspects: 오인식일 수도 있지만 문맥을 봐야 하는 표기 (LLM 확인 대상)
+  * 모든 표기를 Aho-Corasick 자동자 하나로 한 번에 탐색 (텍스트 길이에 비례, 용어 수와 무관)
+  * 단어 시작에서만 매칭, 뒤는 열어 둠 (한국어 조사가 붙은 "이음은" 도 "이음" 으로 매칭), 겹치면 가장 왼쪽-가장 긴 것
+  * correct(): mishearings 는 바로 고치고, 남은 suspects 를 돌려줌 -> 없으면 Refiner 가 LLM 을 건너뜀
+    - 교정/확인은 표기가 어절 전체이거나 뒤에 조사만 붙은 경우만 ("이름다운" 안의 "이름" 은 무시)
+    - 더 긴 단어의 앞부분인 mishearing 은 바로 고치지 않고 suspect 로 낮춤 ("에이피아이" 안의 "에이피")
+- TtlLruCache: 원격 검색(Azure AI Search) 결과를 정규화된 질의 용어 기준으로 보관 (LRU + 만료 시간)
+- query_terms: 청크 텍스트에서 캐시 키 / 원격 질의로 쓸 핵심 용어 추출
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from pathlib import Path
+
+_TOKEN = re.compile(r"[0-9A-Za-z가-힣]+")
+QUERY_TERMS = 8  # 캐시 키 / 원격 질의에 쓰는 핵심 용어 수
+
+
+def normalize(text: str) -> str:
+    """
+    소문자 + 문장부호 제거 + 공백 하나로
+    """
+    return " ".join(_TOKEN.findall(text.lower()))
+
+
+def query_terms(text: str, limit: int = QUERY_TERMS) -> tuple:
+    """
+    청크 텍스트의 핵심 용어 (2글자 이상, 많이 나온 순 -> 긴 순), 정렬된 tuple
+    같은 주제의 청크가 같은 키를 갖도록 순서와 빈도 차이는 지움
+    """
+    counts = Counter(token for token in normalize(text).split() if len(token) >= 2)
+    ranked = sorted(counts, key=lambda token: (-counts[token], -len(token), token))
+    return tuple(sorted(ranked[:limit]))
+
+
+class AhoCorasick:
+    """
+    다중 패턴 문자열 탐색 자동자 (goto / fail / output)
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]  # 노드에서 끝나는 패턴 [(패턴 길이, 값)]
+        self._out = [[]]  # _own + fail 경로의 패턴 (_build 에서 계산)
+        self._built = True
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+            node = nxt
+        self._own[node].append((len(pattern), value))
+        self._built = False
+
+    def _build(self):
+        """
+        BFS 로 fail 링크 계산, 각 노드 output 에 fail 노드 output 병합
+        """
+        self._out = [list(own) for own in self._own]
+        queue = deque(self._goto[0].values())
+        for nxt in queue:
+            self._fail[nxt] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+                queue.append(nxt)
+        self._built = True
+
+    def find(self, text: str):
+        """
+        :return: [(start, end, 값)] 모든 (겹치는 것 포함) 매칭, end 순
+        """
+        if not self._built:
+            self._build()
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                matches.append((i + 1 - length, i + 1, value))
+        return matches
+
+
+# 용어 뒤에 붙어도 같은 단어로 보는 조사 (두 개까지 연달아 붙을 수 있음: "에서는", "으로도")
+PARTICLES = frozenset(
+    "은 는 이 가 을 를 의 에 로 으로 와 과 도 만 에서 에게 께 한테 랑 이랑 하고 까지 부터 "
+    "처럼 보다 마다 조차 밖에 나 이나 든지 라도 이라도 이다 입니다 이에요 예요 라고 이라고 란 이란".split()
+)
+
+
+def _ascii_word(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _ends_word(text: str, end: int) -> bool:
+    """
+    text[:end] 로 끝나는 표기가 어절 끝이거나 뒤에 조사만 붙어 있는지
+    """
+    rest_end = end
+    while rest_end < len(text) and text[rest_end].isalnum():
+        rest_end += 1
+    rest = text[end:rest_end]
+    if not rest or rest in PARTICLES:
+        return True
+    return any(rest[:k] in PARTICLES and rest[k:] in PARTICLES for k in range(1, len(rest)))
+
+
+class Glossary:
+    """
+    메모리 상주 용어집 (표기/별칭/오인식 -> 항목), Aho-Corasick 으로 탐색
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._matcher = AhoCorasick()
+        for entry in entries:
+            self.add(
+                entry["term"], entry.get("description", ""), entry.get("aliases", ()),
+                entry.get("mishearings", ()), entry.get("suspects", ()),
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        용어집 파일을 읽음 (없으면 빈 용어집)
+        """
+        path = Path(path) if path else None
+        if path is None or not path.exists():
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            glossary = cls(json.load(f))
+        print(f"[Glossary] Loaded {len(glossary.entries)} terms from {path}")
+        return glossary
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, term: str, description: str = "", aliases=(), mishearings=(), suspects=()):
+        index = len(self.entries)
+        self.entries.append({"term": term, "description": description})
+        for kind, surfaces in (("term", (term, *aliases)), ("fix", mishearings), ("suspect", suspects)):
+            for surface in surfaces:
+                pattern = surface.strip().lower()
+                if pattern:
+                    self._matcher.add(pattern, (index, kind))
+
+    def scan(self, text: str):
+        """
+        단어 시작에서 시작하는 매칭 중 겹치지 않는 가장 왼쪽-가장 긴 것들
+        :return: [(start, end, 항목 번호, "term" | "fix" | "suspect")] 원문 위치
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = text  # 소문자 변환으로 길이가 바뀌는 문자가 있으면 위치 보존을 위해 그대로 탐색
+
+        candidates = []
+        for start, end, (index, kind) in self._matcher.find(lowered):
+            if start > 0 and lowered[start - 1].isalnum():
+                continue  # 단어 중간에서 시작
+            if end < len(lowered) and _ascii_word(lowered[end - 1]) and _ascii_word(lowered[end]):
+                continue  # 영문/숫자 용어는 단어 끝까지 일치해야 함 (한국어는 조사 허용)
+            candidates.append((start, -(end - start), end, index, kind))
+        candidates.sort()
+
+        matches, cursor = [], 0
+        for start, _, end, index, kind in candidates:
+            if start >= cursor:
+                matches.append((start, end, index, kind))
+                cursor = end
+        return matches
+
+    def match(self, text: str):
+        """
+        텍스트에 나온 용어 항목 번호 (처음 나온 순서)
+        """
+        return list(dict.fromkeys(index for _, _, index, _ in self.scan(text)))
+
+    def lookup(self, text: str, limit: int = 20) -> str:
+        """
+        텍스트에 나온 용어의 "용어: 설명" 줄 (Refiner 참조 지식용)
+        """
+        lines = []
+        for index in self.match(text)[:limit]:
+            entry = self.entries[index]
+            lines.append(f"{entry['term']}: {entry['description']}" if entry["description"] else entry["term"])
+        return "\n".join(lines)
+
+    def correct(self, text: str):
+        """
+        확실한 오인식(mishearings)은 용어로 교체, 문맥 확인이 필요한 표기(suspects)는 모아서 돌려줌
+        :return: (고친 텍스트, [(원래 표기, 용어)] 교체 목록, [(표기, 후보 용어)] 미해결 목록)
+        """
+        pieces, fixes, suspects, cursor = [], [], [], 0
+        for start, end, index, kind in self.scan(text):
+            if kind == "term":
+                continue
+            surface, term = text[start:end], self.entries[index]["term"]
+            if not _ends_word(text, end):
+                # 더 긴 단어의 일부: 확실한 오인식이 아니므로 고치지 않음 (mishearing 은 확인 대상으로 남김)
+                if kind == "fix":
+                    suspects.append((surface, term))
+                continue
+            if kind == "suspect":
+                suspects.append((surface, term))
+                continue
+            pieces.append(text[cursor:start])
+            pieces.append(term)
+            fixes.append((surface, term))
+            cursor = end
+        pieces.append(text[cursor:])
+        return "".join(pieces), fixes, suspects
+
+
+class TtlLruCache:
+    """
+    크기 제한(LRU) + 만료 시간(TTL) 캐시, 스레드 안전
+    """
+
+    def __init__(self, maxsize: int = 256, ttl_sec: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._data = OrderedDict()  # key -> (저장 시각, 값)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        :return: 값 또는 None (없거나 만료)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or time.monotonic() - item[0] > self.ttl_sec:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,239 @@
+"""
+intervals.py
+
+시간 구간 연산 공용 모듈 (NumPy 벡터화)
+
+- 구간 집합은 start / end / label 배열 (start 기준 정렬)로 표현
+- union, intersection, complement, 시점별 활성 화자 수, 구간 쌍별 겹침 길이 행렬
+- 겹치는 구간 쌍 탐색(overlapping_pairs): 정렬 + 이분탐색, 회의 전체 규모에서도 쌍 수에 비례
+- 겹침 발화 검출(find_overlaps)과 처리 구간 분할(processing_regions)도 이 연산 위에 구현
+- 회의 전체(수천 개 구간) 재처리도 Python 루프 없이 배열 연산으로 처리
+"""
+
+import numpy as np
+
+
+def from_records(records, label_key: str = "speaker"):
+    """
+    [{ "start", "end", label_key }] -> (starts, ends, labels), start/end 순 정렬
+    """
+    starts = np.fromiter((r["start"] for r in records), dtype=np.float64, count=len(records))
+    ends = np.fromiter((r["end"] for r in records), dtype=np.float64, count=len(records))
+    labels = np.array([r.get(label_key) for r in records], dtype=object)
+    order = np.lexsort((ends, starts))
+    return starts[order], ends[order], labels[order]
+
+
+def union(starts, ends):
+    """
+    겹치거나 맞닿은 구간을 합침
+    :return: (starts, ends) 서로 떨어진 정렬 구간
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if len(starts) == 0:
+        return starts.copy(), ends.copy()
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # 이전까지의 최대 end 보다 뒤에서 시작하면 새 구간
+    first = np.flatnonzero(np.r_[True, starts[1:] > reach[:-1]])
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def _covered(starts, ends, points):
+    """
+    points 가 서로 떨어진 정렬 구간 [start, end) 안에 있는지
+    """
+    idx = np.searchsorted(starts, points, side="right") - 1
+    inside = idx >= 0
+    inside[inside] = points[inside] < ends[idx[inside]]
+    return inside
+
+
+def _elementary(*boundaries):
+    """
+    모든 경계 시점으로 나눈 기본 구간 (starts, ends)
+    기본 구간은 어떤 원래 구간에 통째로 포함되거나 완전히 벗어나므로, 시작 시점만으로 포함 여부를 판단
+    (중점은 아주 짧은 구간에서 부동소수 반올림으로 끝점과 같아질 수 있음)
+    """
+    edges = np.unique(np.concatenate([np.asarray(b, dtype=np.float64) for b in boundaries]))
+    return edges[:-1], edges[1:]
+
+
+def _runs(starts, ends, mask):
+    """
+    mask 가 True 인 기본 구간 중 맞닿은 것끼리 합침
+    """
+    starts, ends = starts[mask], ends[mask]
+    if len(starts) == 0:
+        return starts, ends
+    first = np.flatnonzero(np.r_[True, starts[1:] != ends[:-1]])
+    last = np.r_[first[1:] - 1, len(starts) - 1]
+    return starts[first], ends[last]
+
+
+def intersection(a_starts, a_ends, b_starts, b_ends):
+    """
+    두 구간 집합에 모두 포함되는 시간
+    :return: (starts, ends) 서로 떨어진 정렬 구간
+    """
+    a_starts, a_ends = union(a_starts, a_ends)
+    b_starts, b_ends = union(b_starts, b_ends)
+    if len(a_starts) == 0 or len(b_starts) == 0:
+        return np.zeros(0), np.zeros(0)
+
+    seg_starts, seg_ends = _elementary(a_starts, a_ends, b_starts, b_ends)
+    both = _covered(a_starts, a_ends, seg_starts) & _covered(b_starts, b_ends, seg_starts)
+    return _runs(seg_starts, seg_ends, both)
+
+
+def complement(starts, ends, lo: float, hi: float):
+    """
+    [lo, hi) 중 구간 집합에 포함되지 않는 시간
+    :return: (starts, ends) 서로 떨어진 정렬 구간
+    """
+    starts, ends = union(starts, ends)
+    gap_starts = np.r_[lo, ends]
+    gap_ends = np.r_[starts, hi]
+    gap_starts = np.clip(gap_starts, lo, hi)
+    gap_ends = np.clip(gap_ends, lo, hi)
+    keep = gap_ends > gap_starts
+    return gap_starts[keep], gap_ends[keep]
+
+
+def active_counts(starts, ends):
+    """
+    시점별 활성 구간 수
+    :return: (seg_starts, seg_ends, counts) 모든 경계로 나눈 기본 구간과 각 구간의 활성 수
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if len(starts) == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64)
+
+    seg_starts, seg_ends = _elementary(starts, ends)
+    counts = (
+        np.searchsorted(np.sort(starts), seg_starts, side="right")
+        - np.searchsorted(np.sort(ends), seg_starts, side="right")
+    )
+    return seg_starts, seg_ends, counts
+
+
+def active_labels(starts, ends, labels):
+    """
+    시점별 활성 label 행렬 (같은 label 의 구간끼리 겹쳐도 한 번만 셈)
+    :return: (seg_starts, seg_ends, names, active) active: (len(names), 기본 구간 수) bool
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    labels = np.asarray(labels, dtype=object)
+    names = list(dict.fromkeys(labels.tolist()))
+    if len(starts) == 0:
+        return np.zeros(0), np.zeros(0), names, np.zeros((0, 0), dtype=bool)
+
+    seg_starts, seg_ends = _elementary(starts, ends)
+    active = np.zeros((len(names), len(seg_starts)), dtype=bool)
+    for k, name in enumerate(names):
+        mask = labels == name
+        active[k] = _covered(*union(starts[mask], ends[mask]), seg_starts)
+    return seg_starts, seg_ends, names, active
+
+
+def overlap_matrix(a_starts, a_ends, b_starts, b_ends):
+    """
+    구간 쌍별 겹침 길이
+    :return: (len(a), len(b)) float64, 겹치지 않으면 0
+    """
+    a_starts = np.asarray(a_starts, dtype=np.float64)[:, None]
+    a_ends = np.asarray(a_ends, dtype=np.float64)[:, None]
+    b_starts = np.asarray(b_starts, dtype=np.float64)[None, :]
+    b_ends = np.asarray(b_ends, dtype=np.float64)[None, :]
+    return np.maximum(0.0, np.minimum(a_ends, b_ends) - np.maximum(a_starts, b_starts))
+
+
+def overlapping_pairs(a_starts, a_ends, b_starts, b_ends, piece: float = 30.0):
+    """
+    양의 길이로 겹치는 (a, b) 구간 쌍을 정렬/이분탐색으로 찾음 (행렬 없이, 결과 쌍 수에 비례)
+    긴 b 구간은 후보 탐색용으로만 piece 초 단위로 잘라 검색 창을 좁게 유지
+    :return: (ai, bj) int 배열, (ai, bj) 순 정렬, 중복 없음
+    """
+    a_starts = np.asarray(a_starts, dtype=np.float64)
+    a_ends = np.asarray(a_ends, dtype=np.float64)
+    b_starts = np.asarray(b_starts, dtype=np.float64)
+    b_ends = np.asarray(b_ends, dtype=np.float64)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(a_starts) == 0 or len(b_starts) == 0:
+        return empty, empty
+
+    # 1. b 를 piece 이하 조각으로 분할 (조각 -> 원래 b 인덱스)
+    lengths = np.maximum(b_ends - b_starts, 0.0)
+    n_pieces = np.maximum(1, np.ceil(lengths / piece).astype(np.int64))
+    owner = np.repeat(np.arange(len(b_starts)), n_pieces)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+    p_starts = b_starts[owner] + k * piece
+    # 다음 조각 시작을 그대로 끝으로 써서 조각 사이에 빈틈이 없게 함
+    p_ends = np.minimum(b_starts[owner] + (k + 1) * piece, b_ends[owner])
+
+    order = np.argsort(p_starts, kind="stable")
+    p_starts, p_ends, owner = p_starts[order], p_ends[order], owner[order]
+    reach = float(np.max(p_ends - p_starts))
+
+    # 2. a 마다 겹칠 수 있는 조각 범위: start 가 (a_start - reach, a_end) 안
+    lo = np.searchsorted(p_starts, a_starts - reach, side="right")
+    hi = np.searchsorted(p_starts, a_ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    ai = np.repeat(np.arange(len(a_starts)), counts)
+    pj = np.repeat(lo, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+    hit = np.minimum(a_ends[ai], p_ends[pj]) > np.maximum(a_starts[ai], p_starts[pj])
+    key = np.unique(ai[hit] * len(b_starts) + owner[pj[hit]])
+    return key // len(b_starts), key % len(b_starts)
+
+
+def find_overlaps(records, label_key: str = "speaker"):
+    """
+    2명 이상이 동시에 말하는 구간 (참여 화자가 같고 맞닿은 구간은 병합)
+    :return: [{ "start", "end", "speakers": [label] }] 시간순
+    """
+    if not records:
+        return []
+
+    starts, ends, labels = from_records(records, label_key)
+    seg_starts, seg_ends, names, active = active_labels(starts, ends, labels)
+    multi = active.sum(axis=0) > 1
+    if not multi.any():
+        return []
+
+    # 참여 화자 조합이 바뀌거나 시간이 끊기는 지점에서 새 겹침 구간 시작
+    idx = np.flatnonzero(multi)
+    changed = np.any(active[:, idx[1:]] != active[:, idx[:-1]], axis=0)
+    first = np.flatnonzero(np.r_[True, changed | (seg_starts[idx[1:]] != seg_ends[idx[:-1]])])
+    last = np.r_[first[1:] - 1, len(idx) - 1]
+
+    overlaps = []
+    for f, l in zip(idx[first], idx[last]):
+        overlaps.append({
+            "start": float(seg_starts[f]),
+            "end": float(seg_ends[l]),
+            "speakers": [names[k] for k in np.flatnonzero(active[:, f])],
+        })
+    return overlaps
+
+
+def processing_regions(duration: float, overlaps):
+    """
+    청크를 clean / overlap 구간으로 분할 (시간순)
+    :return: [{ "start", "end", "type": "clean" }, { "start", "end", "type": "overlap", "speakers" }]
+    """
+    regions = [
+        {"start": ov["start"], "end": ov["end"], "type": "overlap", "speakers": ov.get("speakers", [])}
+        for ov in overlaps
+    ]
+    starts = np.array([ov["start"] for ov in overlaps], dtype=np.float64)
+    ends = np.array([ov["end"] for ov in overlaps], dtype=np.float64)
+    for s, e in zip(*complement(starts, ends, 0.0, duration)):
+        regions.append({"start": float(s), "end": float(e), "type": "clean"})
+    regions.sort(key=lambda r: r["start"])
+    return regions
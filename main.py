@@ -1,5 +1,4 @@
 import json
-import queue
 import threading
 import os
 import asyncio
@@ -10,11 +9,21 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from websocket_manager import manager
 from config import (
-    INPUT_DIR, OUTPUT_DIR, CHUNK_SEC,
+    INPUT_DIR, OUTPUT_DIR, CHUNK_SEC, SAMPLE_RATE, PIPELINE_QUEUE_SIZE, SEPARATION_MODE,
+    VOICE_PROFILE_DIR, VOICE_PROFILE_THRESHOLD, RECLUSTER_AT_END, RECLUSTER_THRESHOLD,
+    CHUNK_DEADLINE_SEC, REFINE_TIMEOUT_SEC, REFINE_BATCH_MAX_CHUNKS,
 )
 from speaker_linker import SpeakerRegistry
 from engine import init_engine_manager
-from processor import process_chunk
+from processor import (
+    new_job, decode_stage, analyze_stage, refine_stage, refine_batch_stage, refine_batch_fits, commit_stage,
+    read_records, stream_diarizer, refiner,
+)
+from pipeline import ChunkPipeline, Stage
+from deferred import DeferredOverlapStore, run_deferred_separation
+from audio_io import ACCEPTED_FORMATS, PREFERRED_FORMAT, load_waveform
+from voice_profiles import VoiceProfileStore
+from reclustering import TurnEmbeddingLog, recluster, relabel_segments
 
 # ----------------------------
 # Environment & Paths
@@ -30,13 +39,23 @@ INPUT_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 PARTIAL_JSONL = OUTPUT_DIR / "partial_result.jsonl"
+PATCH_JSONL = OUTPUT_DIR / "refined_patches.jsonl"  # refined texts by segment ID (written after publication)
 FINAL_JSON = OUTPUT_DIR / "final_result.json"
+CHUNK_STATS_JSONL = OUTPUT_DIR / "chunk_stats.jsonl"  # per-chunk stage timings (written by processor)
 
 # ----------------------------
 # Global State
 # ----------------------------
-speaker_registry = SpeakerRegistry()
-task_queue = queue.Queue()
+voice_profiles = VoiceProfileStore(VOICE_PROFILE_DIR)  # persists across meetings
+
+
+def new_registry() -> SpeakerRegistry:
+    return SpeakerRegistry(profiles=voice_profiles, profile_threshold=VOICE_PROFILE_THRESHOLD)
+
+
+speaker_registry = new_registry()
+deferred_store = DeferredOverlapStore(OUTPUT_DIR / "overlaps")  # [v8] deferred separation
+turn_log = TurnEmbeddingLog()  # per-chunk speaker embeddings for re-clustering at /end
 meeting_ended = False
 loop = None
 
@@ -44,36 +63,44 @@ loop = None
 engine_mgr = init_engine_manager(HF_TOKEN)
 
 # ----------------------------
-# Worker Loop
+# Chunk Pipeline
 # ----------------------------
-def worker_loop():
-    while True:
-        task = task_queue.get()
-        if task is None:
-            break
-        
-        # Wait until engines are ready
-        while not engine_mgr.is_ready():
-            print("[Worker] Engines not ready. Waiting 2s...")
-            time.sleep(2)
-            
-        try:
-            print(f"[Worker] Processing chunk {task.get('chunk_index')}")
-            process_chunk(
-                diarizer=engine_mgr.get_diarizer(),
-                separator=engine_mgr.get_separator(),
-                speaker_registry=speaker_registry,
-                output_dir=OUTPUT_DIR,
-                partial_jsonl=PARTIAL_JSONL,
-                loop=loop,
-                **task
-            )
-        except Exception as e:
-            import traceback
-            print(f"[Worker] Error processing chunk: {str(e)}")
-            traceback.print_exc()
-        finally:
-            task_queue.task_done()
+def analyze(job):
+    # Wait until engines are ready
+    while not engine_mgr.is_ready():
+        print("[Worker] Engines not ready. Waiting 2s...")
+        time.sleep(2)
+
+    print(f"[Worker] Processing chunk {job['chunk_index']}")
+    analyze_stage(
+        job,
+        diarizer=engine_mgr.get_diarizer(),
+        separator=engine_mgr.get_separator(),
+        speaker_registry=speaker_registry,
+        deferred_store=deferred_store,
+        turn_log=turn_log,
+    )
+
+def build_pipeline() -> ChunkPipeline:
+    """
+    decode -> analyze(GPU) -> commit(원본 즉시 공개, 청크 순서) -> refine(LLM 패치)
+    refine 대기열은 무제한: LLM 이 느려도 앞 단계(공개)를 막지 않음
+    refine 이 밀리면 쌓인 청크를 토큰 예산 안에서 LLM 요청 1번으로 묶어 따라잡음
+    """
+    return ChunkPipeline(
+        [
+            Stage("decode", decode_stage, maxsize=0),
+            Stage("analyze", analyze, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage("commit", lambda job: commit_stage(job, OUTPUT_DIR, PARTIAL_JSONL, loop, speaker_registry),
+                  maxsize=PIPELINE_QUEUE_SIZE, ordered=True),
+            Stage("refine", lambda job: refine_stage(job, OUTPUT_DIR, PATCH_JSONL, loop), maxsize=0,
+                  batch_fn=lambda jobs: refine_batch_stage(jobs, OUTPUT_DIR, PATCH_JSONL, loop),
+                  batch_fits=refine_batch_fits),
+        ],
+        reorder_timeout=CHUNK_SEC,
+    )
+
+pipeline = build_pipeline()
 
 # ----------------------------
 # FastAPI Setup
@@ -88,8 +115,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-worker_thread = threading.Thread(target=worker_loop, daemon=True)
-
 @app.get("/")
 def read_root():
     """
@@ -102,6 +127,19 @@ def read_root():
         "engines_ready": engine_mgr.is_ready()
     }
 
+@app.get("/pipeline")
+def get_pipeline_stats():
+    """
+    Stage occupancy / queue depth (the stage with the highest occupancy is the bottleneck)
+    and the diarizer profile with its measured real-time factor
+    """
+    stats = pipeline.stats()
+    diarizer = engine_mgr.get_diarizer()
+    if diarizer is not None:
+        stats["diarizer"] = diarizer.profile()
+    stats["refiner"] = refiner.profile()
+    return stats
+
 @app.on_event("startup")
 def startup():
     global loop
@@ -110,10 +148,15 @@ def startup():
     # 1. Start background engine loading
     threading.Thread(target=engine_mgr.load_engines, args=(loop,), daemon=True).start()
     
-    # 2. Start worker
-    worker_thread.start()
+    # 2. Start chunk pipeline
+    pipeline.start()
     print("[Startup] API port 8000 opened. Engines loading in background...")
 
+@app.on_event("shutdown")
+async def close_refiner():
+    # Pooled LLM / search connections belong to the server loop
+    await refiner.aclose()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -127,12 +170,68 @@ async def websocket_endpoint(websocket: WebSocket):
 
 @app.get("/result")
 def get_result():
-    records = []
-    if PARTIAL_JSONL.exists():
-        with open(PARTIAL_JSONL, "r", encoding="utf-8") as f:
-            for line in f:
-                records.append(json.loads(line))
-    return records
+    return read_records(PARTIAL_JSONL, PATCH_JSONL)
+
+@app.get("/codecs")
+def get_codecs():
+    """
+    업로드 가능한 오디오 형식 안내 (WebM/Opus 권장: WAV 대비 약 1/10 대역폭)
+    """
+    return {
+        "preferred": PREFERRED_FORMAT,
+        "accepted": ACCEPTED_FORMATS,
+        "sample_rate": SAMPLE_RATE,
+    }
+
+@app.get("/profiles")
+def get_profiles():
+    """
+    등록된 voice profile 목록
+    """
+    return {"count": len(voice_profiles.profiles), "profiles": voice_profiles.list_profiles()}
+
+@app.post("/profiles/enroll")
+def enroll_profile(
+    name: str = Form(...),
+    file: UploadFile = File(...),
+    profileId: str = Form(None),
+):
+    """
+    음성 샘플로 화자 등록 (같은 profileId 로 다시 보내면 샘플 추가)
+    디코딩 / GPU embedding 이 event loop 를 막지 않도록 sync handler (threadpool 에서 실행)
+    """
+    if not engine_mgr.is_ready():
+        raise HTTPException(503, "Engines are still loading")
+
+    embedding = engine_mgr.get_diarizer().embed(load_waveform(file.file.read()))
+    if embedding is None:
+        raise HTTPException(400, "Could not extract a speaker embedding from the sample")
+    try:
+        profile_id = voice_profiles.enroll(name, embedding, profile_id=profileId)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "enrolled", "profileId": profile_id, "name": name}
+
+@app.post("/profiles/enroll_speaker")
+def enroll_meeting_speaker(speaker: str = Form(...), name: str = Form(...)):
+    """
+    현재 회의의 화자(예: SPK_0)를 그 centroid 로 등록
+    """
+    data = speaker_registry.speakers.get(speaker)
+    if data is None:
+        raise HTTPException(404, f"Unknown speaker {speaker}")
+    try:
+        profile = speaker_registry.profile_of.get(speaker)
+        profile_id = voice_profiles.enroll(name, data["embedding"], profile_id=profile and profile["profile_id"])
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "enrolled", "profileId": profile_id, "name": name, "speaker": speaker}
+
+@app.delete("/profiles/{profile_id}")
+def delete_profile(profile_id: str):
+    if not voice_profiles.delete(profile_id):
+        raise HTTPException(404, f"Unknown profile {profile_id}")
+    return {"status": "deleted", "profileId": profile_id}
 
 @app.post("/chunk")
 async def upload_chunk(
@@ -143,14 +242,8 @@ async def upload_chunk(
     if meeting_ended:
         raise HTTPException(400, "Meeting already ended")
 
-    ext = Path(file.filename).suffix.lower()
-    save_path = INPUT_DIR / f"chunk_{chunkIndex:05d}{ext}"
-    save_path.write_bytes(await file.read())
-
-    task_queue.put({
-        "chunk_index": chunkIndex,
-        "wav_path": save_path
-    })
+    # 압축 업로드를 디스크에 쓰지 않고 그대로 worker 로 전달 (PyAV in-process 디코딩)
+    pipeline.submit(new_job(chunkIndex, await file.read()))
 
     return {
         "status": "queued",
@@ -160,59 +253,93 @@ async def upload_chunk(
 
 @app.post("/reset")
 def reset_meeting():
-    global meeting_ended, worker_thread, speaker_registry, task_queue
+    global meeting_ended, speaker_registry, pipeline
     
-    # 1. Reset states
+    # 1. Drop pending chunks and wait for the running ones, so no old job writes into the new state
+    #    (stages run concurrently: the longest one bounds the wait - analyze deadline or a refine batch)
+    #    If a job is still running after that, keep the old state untouched (it could still write into it);
+    #    the pipeline stays cancelled, so calling /reset again just waits for the job once more
+    if not pipeline.cancel(timeout=max(CHUNK_DEADLINE_SEC, REFINE_TIMEOUT_SEC * REFINE_BATCH_MAX_CHUNKS)):
+        raise HTTPException(409, "Previous jobs still running, retry /reset")
+
+    # 2. Reset states and start a fresh pipeline
     meeting_ended = False
-    speaker_registry = SpeakerRegistry()
-    
-    # 2. Clear queue (should be empty anyway if ended)
-    while not task_queue.empty():
-        try:
-            task_queue.get_nowait()
-            task_queue.task_done()
-        except queue.Empty:
-            break
+    speaker_registry = new_registry()
+    stream_diarizer.reset()
+    turn_log.reset()
+    pipeline = build_pipeline().start()
             
     # 3. Cleanup files
     if PARTIAL_JSONL.exists():
         PARTIAL_JSONL.unlink()
+    if PATCH_JSONL.exists():
+        PATCH_JSONL.unlink()
     if FINAL_JSON.exists():
         FINAL_JSON.unlink()
+    if CHUNK_STATS_JSONL.exists():
+        CHUNK_STATS_JSONL.unlink()
+    deferred_store.clear()
     # Optional: Clear INPUT_DIR chunks? 
     # for f in INPUT_DIR.glob("chunk_*"): f.unlink()
 
-    # 4. Restart worker if dead
-    if not worker_thread.is_alive():
-        worker_thread = threading.Thread(target=worker_loop, daemon=True)
-        worker_thread.start()
-        print("[Reset] Worker thread restarted.")
-
     return {"status": "reset", "message": "Meeting state cleared, ready for new session."}
 
 @app.post("/end")
-def end_meeting():
-    global meeting_ended, worker_thread
+def end_meeting(recluster_speakers: bool = RECLUSTER_AT_END):
+    """
+    :param recluster_speakers: 회의 전체 embedding 으로 화자를 다시 묶고 라벨을 고침 (응답의 "reclustering" 에 변경 내역)
+    """
+    global meeting_ended
     if meeting_ended:
         return {"status": "already_ended"}
         
     meeting_ended = True
-    task_queue.put(None)
-    if worker_thread.is_alive():
-        worker_thread.join()
+    # Flush every queued chunk through all stages before building the final result
+    pipeline.close()
 
-    segments = []
-    if PARTIAL_JSONL.exists():
-        with open(PARTIAL_JSONL, "r", encoding="utf-8") as f:
-            for line in f:
-                segments.append(json.loads(line))
+    segments = read_records(PARTIAL_JSONL, PATCH_JSONL)
     segments.sort(key=lambda x: x["start"])
 
+    # [v8] Deferred Refinement: batch-separate the overlaps recorded during the meeting
+    deferred_report = None
+    if SEPARATION_MODE == "deferred":
+        segments, deferred_report = run_deferred_separation(
+            deferred_store,
+            separator=engine_mgr.get_separator(),
+            diarizer=engine_mgr.get_diarizer(),
+            speaker_registry=speaker_registry,
+            segments=segments,
+        )
+
+    # Global re-clustering: merge speakers the online matcher split, then rewrite labels
+    recluster_report = None
+    if recluster_speakers:
+        t0 = time.perf_counter()
+        mapping, recluster_report = recluster(
+            turn_log, threshold=RECLUSTER_THRESHOLD, preferred=speaker_registry.profile_of.keys()
+        )
+        recluster_report["relabelled_segments"] = relabel_segments(segments, mapping, recluster_report["merged"])
+        recluster_report["changes"] = [
+            {"chunk": chunk, "from": old, "to": new} for (chunk, old), new in sorted(mapping.items())
+        ]
+        recluster_report["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+        print(f"[Recluster] {recluster_report['speakers_before']} -> {recluster_report['speakers_after']} speakers, "
+              f"{recluster_report['relabelled_segments']} segments relabelled")
+
+    # Display labels after deferred separation / re-clustering changed the speaker IDs
+    for seg in segments:
+        seg["speaker_name"] = speaker_registry.display_name(seg["speaker"])
+
     final_result = {"segments": segments}
     with open(FINAL_JSON, "w", encoding="utf-8") as f:
         json.dump(final_result, f, ensure_ascii=False, indent=2)
 
-    return {"status": "ended", "segments": len(segments), "output": str(FINAL_JSON)}
+    response = {"status": "ended", "segments": len(segments), "output": str(FINAL_JSON)}
+    if deferred_report is not None:
+        response["deferred_separation"] = deferred_report
+    if recluster_report is not None:
+        response["reclustering"] = recluster_report
+    return response
 
 @app.post("/shutdown")
 def shutdown():
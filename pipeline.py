@@ -0,0 +1,287 @@
+"""
+pipeline.py
+
+청크 처리를 단계(stage)별 스레드로 나누고, 단계 사이를 bounded queue 로 연결하는 모듈
+
+- decode -> analyze(GPU) -> commit(원본 저장 + 방송) -> refine(LLM, 정제 결과 패치)
+- 청크 N 이 LLM 응답을 기다리는 동안 청크 N+1 이 GPU 단계를 진행
+- ordered 단계(기본: 마지막 단계)는 chunk_index 순서대로 실행 (빠진 청크는 reorder_timeout 후 건너뜀)
+- batch 단계(refine): 대기열이 밀려 있으면 쌓인 job 을 batch_fits 가 허용하는 만큼 묶어 batch_fn 한 번으로 처리
+- 단계별 점유율(busy 비율), 처리 건수, 대기열 길이를 stats() 로 노출
+"""
+
+import heapq
+import queue
+import threading
+import time
+import traceback
+
+_STOP = object()
+
+
+class Stage:
+    """
+    하나의 처리 단계: 전용 스레드 1개 + 입력 대기열
+    """
+
+    def __init__(self, name: str, fn, maxsize: int = 2, ordered: bool = False, batch_fn=None, batch_fits=None):
+        """
+        :param fn: fn(job) -> None, job dict 를 직접 갱신
+        :param maxsize: 입력 대기열 크기 (0 이면 무제한)
+        :param ordered: chunk_index 순서대로 실행 (파이프라인에 1개, 지정이 없으면 마지막 단계)
+        :param batch_fn: batch_fn(jobs) -> None, 대기열에 쌓인 job 여러 개를 한 번에 처리 (ordered 단계 제외)
+        :param batch_fits: batch_fits(jobs) -> bool, 묶을 job 목록이 예산 안인지 (없으면 제한 없음)
+        """
+        self.name = name
+        self.fn = fn
+        self.ordered = ordered
+        self.batch_fn = batch_fn
+        self.batch_fits = batch_fits
+        self.batches = 0  # 2개 이상 묶어 처리한 횟수
+        self.coalesced = 0  # 묶음으로 처리된 job 수
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.current = None
+        self.processed = 0
+        self.failed = 0
+        self.busy_sec = 0.0
+        self._busy_since = None
+        self._lock = threading.Lock()
+
+    def run(self, job: dict):
+        with self._lock:
+            self.current = job["chunk_index"]
+            self._busy_since = time.perf_counter()
+        try:
+            self.fn(job)
+        except Exception as e:
+            job["error"] = f"{self.name}: {e}"
+            self.failed += 1
+            print(f"[Pipeline] Stage '{self.name}' failed for chunk {job['chunk_index']}: {e}")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self.busy_sec += time.perf_counter() - self._busy_since
+                self._busy_since = None
+                self.current = None
+            self.processed += 1
+
+    def run_batch(self, jobs):
+        """
+        job 여러 개를 batch_fn 한 번으로 처리 (실패하면 묶인 job 모두 실패 처리)
+        """
+        if len(jobs) == 1:
+            self.run(jobs[0])
+            return
+        with self._lock:
+            self.current = jobs[0]["chunk_index"]
+            self._busy_since = time.perf_counter()
+        try:
+            self.batch_fn(jobs)
+        except Exception as e:
+            for job in jobs:
+                job["error"] = f"{self.name}: {e}"
+            self.failed += len(jobs)
+            print(f"[Pipeline] Stage '{self.name}' failed for chunks {[job['chunk_index'] for job in jobs]}: {e}")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self.busy_sec += time.perf_counter() - self._busy_since
+                self._busy_since = None
+                self.current = None
+            self.processed += len(jobs)
+            self.batches += 1
+            self.coalesced += len(jobs)
+
+    def stats(self, wall_sec: float) -> dict:
+        with self._lock:
+            busy = self.busy_sec
+            if self._busy_since is not None:
+                busy += time.perf_counter() - self._busy_since
+            current = self.current
+        return {
+            "stage": self.name,
+            "current_chunk": current,
+            "queued": self.inbox.qsize(),
+            "capacity": self.inbox.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_sec": round(busy, 3),
+            "occupancy": round(busy / wall_sec, 3) if wall_sec > 0 else 0.0,
+            "avg_sec": round(busy / self.processed, 3) if self.processed else None,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+        }
+
+
+class ChunkPipeline:
+    """
+    Stage 목록을 순서대로 연결한 청크 처리 파이프라인
+
+    - 첫 단계 대기열은 무제한 (업로드 API 가 막히지 않도록), 나머지는 bounded
+    - ordered 단계는 chunk_index 순서대로 실행, 이후 단계로도 그 순서대로 전달
+    - 앞 단계에서 실패한 job 은 이후 단계를 건너뛰고 순서만 소비
+    """
+
+    def __init__(self, stages, reorder_timeout: float = 30.0, first_index: int = 0):
+        self.stages = stages
+        ordered = [i for i, stage in enumerate(stages) if stage.ordered]
+        self.ordered_index = ordered[0] if ordered else len(stages) - 1
+        self.reorder_timeout = reorder_timeout
+        self.next_index = first_index
+        self.cancelled = False
+        self._threads = []
+        self._pending = []  # commit 대기 heap: (chunk_index, seq, arrived_at, job)
+        self._seq = 0
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        for i, stage in enumerate(self.stages):
+            target = self._run_ordered if i == self.ordered_index else self._run
+            t = threading.Thread(target=target, args=(i,), name=f"stage-{stage.name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, job: dict):
+        self.stages[0].inbox.put(job)
+
+    def backlog(self) -> int:
+        """
+        아직 commit 되지 않은 대기 job 수 (실행 중인 job 제외)
+        """
+        return sum(s.inbox.qsize() for s in self.stages) + len(self._pending)
+
+    def _forward(self, i: int, job):
+        if i + 1 < len(self.stages) and (job is _STOP or not self.cancelled):
+            self.stages[i + 1].inbox.put(job)
+
+    def _run(self, i: int):
+        stage = self.stages[i]
+        if stage.batch_fn is not None:
+            self._run_batched(i)
+            return
+        while True:
+            job = stage.inbox.get()
+            if job is not _STOP and not self.cancelled and "error" not in job:
+                stage.run(job)
+            self._forward(i, job)
+            if job is _STOP:
+                break
+
+    def _run_batched(self, i: int):
+        """
+        대기열에 이미 쌓인 job 을 batch_fits 가 허용하는 만큼 묶어 처리 (밀려 있지 않으면 1개씩)
+        예산을 넘는 job 은 다음 묶음의 첫 job 으로 넘김
+        """
+        stage = self.stages[i]
+        carry = None
+        while True:
+            job = carry if carry is not None else stage.inbox.get()
+            carry = None
+            if job is _STOP or self.cancelled or "error" in job:
+                self._forward(i, job)
+                if job is _STOP:
+                    break
+                continue
+
+            jobs = [job]
+            while True:
+                try:
+                    nxt = stage.inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP or "error" in nxt or (stage.batch_fits and not stage.batch_fits(jobs + [nxt])):
+                    carry = nxt
+                    break
+                jobs.append(nxt)
+
+            if not self.cancelled:
+                stage.run_batch(jobs)
+            for job in jobs:
+                self._forward(i, job)
+
+    def _run_ordered(self, i: int):
+        stage = self.stages[i]
+        stopping = False
+        while True:
+            try:
+                job = stage.inbox.get(timeout=1.0)
+            except queue.Empty:
+                job = None
+
+            if self.cancelled:
+                self._pending.clear()
+
+            if job is _STOP:
+                stopping = True
+            elif job is not None and not self.cancelled:
+                self._seq += 1
+                heapq.heappush(self._pending, (job["chunk_index"], self._seq, time.perf_counter(), job))
+
+            self._commit_ready(i, flush=stopping)
+            if stopping:
+                self._forward(i, _STOP)
+                break
+
+    def _commit_ready(self, i: int, flush: bool = False):
+        stage = self.stages[i]
+        while self._pending:
+            chunk_index, _, arrived_at, job = self._pending[0]
+            waited = time.perf_counter() - arrived_at
+            if chunk_index > self.next_index and not flush and waited < self.reorder_timeout:
+                # 앞 청크가 아직 도착하지 않음 -> 순서 보장을 위해 대기
+                return
+            if chunk_index > self.next_index:
+                print(f"[Pipeline] Chunks {self.next_index}..{chunk_index - 1} missing, committing {chunk_index}")
+            heapq.heappop(self._pending)
+            if "error" not in job:
+                stage.run(job)
+            self.next_index = max(self.next_index, chunk_index + 1)
+            if "error" not in job:
+                self._forward(i, job)
+
+    def close(self):
+        """
+        남은 job 을 모두 처리한 뒤 스레드 종료 (POST /end)
+        """
+        self.stages[0].inbox.put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def cancel(self, timeout: float = None) -> bool:
+        """
+        대기 중인 job 을 버리고, 실행 중인 job 이 끝나 스레드가 종료될 때까지 기다림 (POST /reset)
+        실행 중이던 job 은 다음 단계로 넘어가지 않음
+        :param timeout: 스레드 전체를 기다리는 최대 시간 (None 이면 끝날 때까지)
+        :return: 모든 스레드가 종료되었는지
+        """
+        self.cancelled = True
+        for stage in self.stages:
+            while True:
+                try:
+                    stage.inbox.get_nowait()
+                except queue.Empty:
+                    break
+        self.stages[0].inbox.put(_STOP)
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+        stopped = not any(t.is_alive() for t in self._threads)
+        if not stopped:
+            busy = [s.name for s in self.stages if s.current is not None]
+            print(f"[Pipeline] Cancel timed out after {timeout:.1f}s, still running: {busy}")
+        return stopped
+
+    def stats(self) -> dict:
+        wall = time.perf_counter() - self._started_at if self._started_at else 0.0
+        stages = [s.stats(wall) for s in self.stages]
+        busiest = max(stages, key=lambda s: s["occupancy"]) if stages else None
+        return {
+            "uptime_sec": round(wall, 1),
+            "next_commit_chunk": self.next_index,
+            "waiting_for_order": len(self._pending),
+            "bottleneck": busiest["stage"] if busiest and busiest["occupancy"] > 0 else None,
+            "stages": stages,
+        }
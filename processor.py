@@ -1,190 +1,617 @@
 import json
-import subprocess
+import time
 import asyncio
+import numpy as np
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from websocket_manager import manager
-from config import CHUNK_SEC
+from config import (
+    CHUNK_SEC, CHUNK_DEADLINE_SEC, SEPARATION_MODE, SEPARATION_MIN_SEC, SEPARATION_MAX_OVERLAPS,
+    REFINE_TIMEOUT_SEC, TRANSCRIBE_MODE, SEPARATION_PASS, STREAMING_DIARIZATION, STREAMING_LOOKBACK_SEC,
+    SPEAKER_COUNT_HINTS, SPEAKER_HINT_MARGIN, REFINE_BATCH_MAX_CHUNKS, REFINE_BATCH_TOKEN_BUDGET,
+)
 from refiner import Refiner
+from audio_io import load_waveform, slice_waveform, as_pyannote_input, duration_of
+from scheduler import ChunkDeadline, SeparationCostModel, plan_separation, skip_record
+from streaming import StreamingDiarizer, fold_stitched
+from intervals import processing_regions
 
 # 전역 Refiner 인스턴스 (맥락 유지를 위해 1개만 생성)
 refiner = Refiner()
 
-def convert_to_wav(input_path: Path) -> Path:
+# Diarization / STT 를 동시에 돌리기 위한 스레드 풀
+# (pyannote(torch) 와 CTranslate2 모두 GIL 을 놓고 GPU 연산을 수행)
+stage_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stage")
+
+# 분리 비용 추정 (청크 간 공유, 실제 소요 시간으로 계속 보정)
+separation_cost = SeparationCostModel()
+# Cross-chunk diarization state (STREAMING_DIARIZATION), cleared on /reset
+stream_diarizer = StreamingDiarizer(STREAMING_LOOKBACK_SEC)
+
+
+def _timed(fn, *args, **kwargs):
+    """
+    fn 실행 결과와 소요 시간(초)을 함께 반환
+    """
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def separate_tracks(separator, ov_audio: np.ndarray):
     """
-    Convert any audio to standard 16kHz Mono WAV for ML models.
+    Run the separator on an overlap slice. Returns one float32 track per separated speaker.
     """
-    output_path = input_path.with_name(f"{input_path.stem}_converted.wav")
-    cmd = [
-        "ffmpeg", "-y", "-i", str(input_path),
-        "-ar", "16000", "-ac", "1",
-        str(output_path)
+    # speech-separation-ami-1.0 returns (diarization, sources)
+    # sources.data: (num_samples, num_speakers)
+    _, sources = separator(as_pyannote_input(ov_audio))
+    return [
+        np.ascontiguousarray(sources.data[:, i], dtype=np.float32)
+        for i in range(sources.data.shape[1])
     ]
+
+
+def label_tracks(diarizer, speaker_registry, tracks, candidates):
+    """
+    Map separated tracks to global speakers (one-to-one, best cosine first).
+    Only the speakers active in the overlap (`candidates`) are considered.
+    Tracks that cannot be matched get None.
+    """
+    known = [spk for spk in candidates if spk in speaker_registry.ids]
+    embedded = []
+    for t, track in enumerate(tracks):
+        emb = diarizer.embed(track) if hasattr(diarizer, "embed") else None
+        if emb is not None:
+            embedded.append((t, emb))
+
+    scores = []
+    if embedded and known:
+        matrix = speaker_registry.scores([emb for _, emb in embedded], ids=known)
+        for (t, _), row in zip(embedded, matrix):
+            scores.extend((float(score), t, spk) for score, spk in zip(row, known))
+
+    labels = [None] * len(tracks)
+    used = set()
+    for _, t, spk in sorted(scores, reverse=True):
+        if labels[t] is None and spk not in used:
+            labels[t] = spk
+            used.add(spk)
+    return labels
+
+
+def separate_planned(separator, waveform, overlaps, deadline: ChunkDeadline, skipped: list):
+    """
+    Separate the longest overlaps that fit the chunk deadline.
+    Overlaps that are not separated are appended to `skipped` and keep the "(겹침 발화)" label.
+    :return: [(overlap, tracks, separation seconds)] in time order
+    """
+    planned, plan_skipped = plan_separation(
+        overlaps, deadline, separation_cost,
+        min_duration=SEPARATION_MIN_SEC, max_overlaps=SEPARATION_MAX_OVERLAPS,
+    )
+    skipped.extend(plan_skipped)
+
+    separated = []
+    for ov in planned:
+        ov_duration = ov["end"] - ov["start"]
+
+        # Estimates can be off: re-check right before starting the heavy model
+        if not deadline.allows(separation_cost.estimate(ov_duration)):
+            print(f"[Processor] [v8] Skipping separation {ov['start']}s ~ {ov['end']}s (deadline)")
+            skipped.append(skip_record(ov, "deadline"))
+            continue
+
+        print(f"[Processor] [v8] Immediate Separation for {ov['start']}s ~ {ov['end']}s")
+
+        # Zero-copy slice of the decoded chunk
+        ov_audio = slice_waveform(waveform, ov["start"], ov["end"])
+        t0 = time.perf_counter()
+        try:
+            separated.append((ov, separate_tracks(separator, ov_audio), time.perf_counter() - t0))
+        except Exception as ex:
+            print(f"[Processor] [v8] Separation failed: {ex}")
+            skipped.append(skip_record(ov, "error"))
+            separation_cost.observe(ov_duration, time.perf_counter() - t0)
+
+    return separated
+
+
+def separate_overlaps(separator, waveform, overlaps, transcribe_batch, deadline: ChunkDeadline, skipped: list):
+    """
+    Separate the longest overlaps that fit the chunk deadline, then transcribe the tracks
+    of all separated overlaps in one batched Whisper call.
+    Returned segments are in chunk time and marked with is_refined.
+    """
+    separated = separate_planned(separator, waveform, overlaps, deadline, skipped)
+    if not separated:
+        return []
+
+    # Transcribe all tracks as one batched request
+    tracks = [track for _, ov_tracks, _ in separated for track in ov_tracks]
+    print(f"  - Transcribing {len(tracks)} separated tracks in one batch...")
+    t0 = time.perf_counter()
     try:
-        print(f"[Processor] Converting {input_path.name} to 16kHz Mono WAV...")
-        subprocess.run(cmd, check=True, capture_output=True)
-        if input_path.suffix.lower() != ".wav":
-            input_path.unlink()
-        return output_path
-    except subprocess.CalledProcessError as e:
-        print(f"[Processor] Audio conversion failed: {e.stderr.decode()}")
-        return input_path 
+        track_segments = transcribe_batch(tracks)
+    except Exception as ex:
+        print(f"[Processor] [v8] Track transcription failed: {ex}")
+        skipped.extend(skip_record(ov, "error") for ov, _, _ in separated)
+        return []
+    asr_sec = time.perf_counter() - t0
 
+    refined = []
+    cursor = 0
+    total = sum(ov["end"] - ov["start"] for ov, _, _ in separated)
+    for ov, ov_tracks, sep_sec in separated:
+        for segs in track_segments[cursor:cursor + len(ov_tracks)]:
+            for rs in segs:
+                # Adjust time to global chunk time
+                rs["start"] += ov["start"]
+                rs["end"] += ov["start"]
+                # Mark as refined to skip or handle specially in assigner if needed
+                rs["is_refined"] = True
+                refined.append(rs)
+        cursor += len(ov_tracks)
 
-def get_processing_regions(duration, overlaps):
+        # Cost model sees separation + this overlap's share of the batched ASR time
+        ov_duration = ov["end"] - ov["start"]
+        separation_cost.observe(ov_duration, sep_sec + asr_sec * ov_duration / total)
+
+    return refined
+
+
+def chunk_pass_tracks(sources, columns: dict, overlaps, deadline: ChunkDeadline, skipped: list):
     """
-    Divide chunk into [start, end, type] segments based on overlaps.
+    [v8] Single-pass mode: cut per-overlap tracks out of the whole-chunk separation sources.
+    Only the (chunk-local) speakers active in each overlap are kept, so every track's speaker is known.
+    Cutting is free, but every track is transcribed again, so the overlaps are still chosen like
+    separate_planned: longest first, at most SEPARATION_MAX_OVERLAPS, within the chunk deadline.
+    :param sources: (time, speakers) float32
+    :param columns: { local speaker: source column } (see diarization.source_columns)
+    :return: ([(overlap, tracks, 0.0)], [[local speaker per track]])
     """
-    if not overlaps:
-        return [{"start": 0.0, "end": duration, "type": "clean"}]
+    columns = {spk: col for spk, col in columns.items() if col < sources.shape[1]}
 
-    regions = []
-    last_end = 0.0
-    
+    candidates = []
     for ov in overlaps:
-        # Pre-overlap clean region
-        if ov["start"] > last_end:
-            regions.append({"start": last_end, "end": ov["start"], "type": "clean"})
-        
-        # Overlap region
-        regions.append({
-            "start": ov["start"], 
-            "end": ov["end"], 
-            "type": "overlap", 
-            "speakers": ov.get("speakers", [])
-        })
-        last_end = ov["end"]
-    
-    # Final clean region
-    if last_end < duration:
-        regions.append({"start": last_end, "end": duration, "type": "clean"})
-        
-    return regions
+        if ov["end"] - ov["start"] < SEPARATION_MIN_SEC:
+            continue
+        if sum(spk in columns for spk in ov["speakers"]) < 2:
+            skipped.append(skip_record(ov, "no_source"))
+            continue
+        candidates.append(ov)
 
+    planned, plan_skipped = plan_separation(
+        candidates, deadline, separation_cost,
+        min_duration=SEPARATION_MIN_SEC, max_overlaps=SEPARATION_MAX_OVERLAPS,
+    )
+    skipped.extend(plan_skipped)
 
-def process_chunk(
-    diarizer, 
-    separator,
-    speaker_registry, 
-    chunk_index: int, 
-    wav_path: Path, 
-    output_dir: Path,
-    partial_jsonl: Path,
-    loop: asyncio.AbstractEventLoop = None
-):
+    separated, track_speakers = [], []
+    for ov in planned:
+        speakers = [spk for spk in ov["speakers"] if spk in columns]
+        block = slice_waveform(sources, ov["start"], ov["end"])
+        tracks = [np.ascontiguousarray(block[:, columns[spk]]) for spk in speakers]
+        separated.append((ov, tracks, 0.0))
+        track_speakers.append(speakers)
+    return separated, track_speakers
+
+
+def transcribe_regions(waveform, separated, track_labels, transcribe_batch, mixture: bool = True):
     """
-    Full audio processing pipeline for a single chunk (v8 Immediate Refinement).
+    Region-driven STT: clean regions are transcribed from the mixture and separated
+    overlap regions only from their tracks, all in one batched Whisper call.
+    With mixture=False only the tracks are transcribed.
+    :return: (mixture segments, track segments with speaker), both in chunk time
+    """
+    clean = []
+    if mixture:
+        regions = processing_regions(duration_of(waveform), [ov for ov, _, _ in separated])
+        clean = [r for r in regions if r["type"] == "clean" and r["end"] > r["start"]]
+
+    clips = [slice_waveform(waveform, r["start"], r["end"]) for r in clean]
+    clips += [track for _, ov_tracks, _ in separated for track in ov_tracks]
+    if not clips:
+        return [], []
+    results = transcribe_batch(clips)
+
+    mixture_segments = []
+    for region, segs in zip(clean, results[:len(clean)]):
+        for rs in segs:
+            rs["start"] += region["start"]
+            rs["end"] += region["start"]
+            mixture_segments.append(rs)
+
+    track_segments = []
+    cursor = len(clean)
+    for (ov, ov_tracks, _), labels in zip(separated, track_labels):
+        fallback = " & ".join(ov["speakers"]) + " (겹침 발화)"
+        for segs, label in zip(results[cursor:cursor + len(ov_tracks)], labels):
+            for rs in segs:
+                track_segments.append({
+                    "start": round(float(rs["start"] + ov["start"]), 2),
+                    "end": round(float(rs["end"] + ov["start"]), 2),
+                    "speaker": label or fallback,
+                    "text": rs["text"],
+                })
+        cursor += len(ov_tracks)
+
+    return mixture_segments, track_segments
+
+
+def new_job(chunk_index: int, audio) -> dict:
+    """
+    Per-chunk state passed between pipeline stages.
+    """
+    t_start = time.perf_counter()
+    return {
+        "chunk_index": chunk_index,
+        "audio": audio,
+        "timings": {},
+        "t_start": t_start,
+        # Time budget starts at upload, so queueing delay also counts against it
+        "deadline": ChunkDeadline(CHUNK_DEADLINE_SEC, start=t_start),
+        "skipped": [],
+    }
+
+
+def decode_stage(job: dict):
+    """
+    Stage 0: decode once. Every later stage works on views of this buffer.
+    """
+    print(f"[Processor] Decoding chunk {job['chunk_index']} to 16kHz Mono buffer...")
+    job["waveform"], job["timings"]["decode"] = _timed(load_waveform, job.pop("audio"))
+
+
+def link_speakers(diar_segments, overlaps, speaker_registry):
+    """
+    Map chunk-local diarization speakers to global IDs (turns and overlap speaker lists).
+    :return: { local speaker: global speaker }
+    """
+    # Streaming diarization already emits global IDs
+    pending = [d for d in diar_segments if "global_speaker" not in d]
+    if pending:
+        # One row per local speaker: turns of a speaker share its pooled embedding
+        # (Diarizer pools per local label), so the registry is matched/updated once per speaker
+        first = {}
+        for d in pending:
+            first.setdefault(d["speaker"], d)
+        linked = speaker_registry.link(
+            [d["embedding"] for d in first.values()],
+            list(first.keys()),
+        )
+        for d in pending:
+            d["global_speaker"] = linked[d["speaker"]][0]
+
+    # Overlap labels use global IDs as well, so "(겹침 발화)" labels stay consistent across chunks
+    local_to_global = {d["speaker"]: d["global_speaker"] for d in diar_segments}
+    for ov in overlaps:
+        ov["speakers"] = sorted({local_to_global.get(s, s) for s in ov["speakers"]})
+    return local_to_global
+
+
+def diarize_and_separate(job: dict, diarizer, separator, speaker_registry):
+    """
+    Diarization + overlap detection. With SEPARATION_PASS "chunk" the separation pipeline runs once
+    over the whole chunk and its diarization replaces the diarizer pass, so overlaps need no
+    further model calls. Otherwise, with STREAMING_DIARIZATION, turns come from stream_diarizer
+    with global IDs already assigned.
+    With SPEAKER_COUNT_HINTS, the registry's speaker count bounds the clustering (see SpeakerRegistry.count_hints).
+    :return: (diar_segments, overlaps, separated, track_speakers) - separated/track_speakers are
+        filled only in single-pass mode (see chunk_pass_tracks)
     """
     from diarization import diarize_audio
-    from transcribe_gpu import transcribe_chunk
-    from speaker_assigner import assign_speakers
 
-    wav_path = convert_to_wav(wav_path)
+    waveform = job["waveform"]
+    single_pass = separator is not None and SEPARATION_MODE == "immediate" and SEPARATION_PASS == "chunk"
+    hints = speaker_registry.count_hints(SPEAKER_HINT_MARGIN) if SPEAKER_COUNT_HINTS else {}
+    if hints:
+        job["speaker_hints"] = hints
 
-    # 1. Diarization
-    print(f"[Processor] Step 1: Diarizing {wav_path.name}...")
-    diar_segments = diarize_audio(wav_path, diarizer=diarizer)
+    if single_pass:
+        (diar_segments, sources, columns), job["timings"]["diarize"] = _timed(
+            diarizer.diarize_separate, waveform, separator, **hints
+        )
+    elif STREAMING_DIARIZATION:
+        diar_segments, job["timings"]["diarize"] = _timed(
+            stream_diarizer.process, diarizer, speaker_registry, job["chunk_index"], waveform, hints
+        )
+        # Turns crossing in from the previous chunk: commit_stage stitches their records to it
+        job["continued"] = {d["global_speaker"]: d["end"] for d in diar_segments if d.get("continued")}
+    else:
+        diar_segments, job["timings"]["diarize"] = _timed(diarize_audio, waveform, diarizer=diarizer, **hints)
 
-    # [v8] Overlap Detection & Immediate Refinement
+    # [v8] Overlap Detection
     overlaps = []
     if hasattr(diarizer, "get_overlapping_segments"):
         overlaps = diarizer.get_overlapping_segments(diar_segments)
 
-    # 2. Transcription (STT) 
-    print(f"[Processor] Step 2: Transcribing baseline {wav_path.name}...")
-    stt_segments = transcribe_chunk(wav_path)
+    separated, track_speakers = [], []
+    if single_pass:
+        separated, track_speakers = chunk_pass_tracks(sources, columns, overlaps, job["deadline"], job["skipped"])
+    return diar_segments, overlaps, separated, track_speakers
+
+
+def analyze_stage(job: dict, diarizer, separator, speaker_registry, deferred_store=None, turn_log=None):
+    """
+    GPU stage: diarize || STT -> separation -> speaker linking -> assignment.
+    In deferred mode, overlap audio is handed to `deferred_store` instead of being separated.
+    Linked speaker embeddings are appended to `turn_log` for the re-clustering pass at POST /end.
+    With TRANSCRIBE_MODE "regions" (immediate separation only), see analyze_regions.
+    """
+    from transcribe_gpu import transcribe_chunk, transcribe_batch
+    from speaker_assigner import assign_speakers
+
+    if separator and SEPARATION_MODE == "immediate" and TRANSCRIBE_MODE == "regions":
+        return analyze_regions(job, diarizer, separator, speaker_registry, turn_log, transcribe_batch)
+
+    chunk_index = job["chunk_index"]
+    waveform = job["waveform"]
+    timings = job["timings"]
+
+    # 1 & 2. Diarization and baseline STT are independent -> run concurrently
+    print(f"[Processor] Step 1/2: Diarizing + transcribing chunk {chunk_index} concurrently...")
+    diar_future = stage_executor.submit(diarize_and_separate, job, diarizer, separator, speaker_registry)
+    stt_future = stage_executor.submit(_timed, transcribe_chunk, waveform)
 
-    # [v8] Speech Separation for Significant Overlaps
-    if separator and overlaps:
-        overlap_dir = output_dir / "overlaps"
-        overlap_dir.mkdir(parents=True, exist_ok=True)
-        
-        for ov in overlaps:
+    diar_segments, overlaps, separated, track_speakers = diar_future.result()
+
+    # [v8] Immediate Refinement: separation only needs diarization, so it overlaps with the running STT
+    refined_segments, track_segments = [], []
+    if separated:
+        # Single pass: tracks are already cut from the chunk sources and their speakers are known
+        local_to_global = link_speakers(diar_segments, overlaps, speaker_registry)
+        track_labels = [[local_to_global.get(spk) for spk in speakers] for speakers in track_speakers]
+        (_, track_segments), timings["separate"] = _timed(
+            transcribe_regions, waveform, separated, track_labels, transcribe_batch, mixture=False
+        )
+        # In this mode the per-overlap cost is the track transcription: keep the cost model calibrated
+        total = sum(ov["end"] - ov["start"] for ov, _, _ in separated)
+        for ov, _, _ in separated:
             ov_duration = ov["end"] - ov["start"]
-            if ov_duration >= 2.0:
-                print(f"[Processor] [v8] Immediate Separation for {ov['start']}s ~ {ov['end']}s")
-                
-                # Slicing for separation
-                ov_slice = overlap_dir / f"temp_ov_{chunk_index}_{ov['start']:.2f}.wav"
-                slice_cmd = ["ffmpeg", "-y", "-i", str(wav_path), "-ss", str(ov["start"]), "-to", str(ov["end"]), str(ov_slice)]
-                subprocess.run(slice_cmd, check=True, capture_output=True)
-
-                try:
-                    # 1. Separate
-                    print(f"  - Running Separation model...")
-                    # separator(ov_slice) returns a Multi-track Audios
-                    # Note: separator expects filepath or waveform
-                    res = separator(str(ov_slice))
-                    
-                    # 2. Transcribe Each Track
-                    print(f"  - Transcribing separated tracks...")
-                    for i, (track_name, track_audio) in enumerate(res.items()):
-                        # Save track to temp wav
-                        track_path = overlap_dir / f"temp_track_{i}.wav"
-                        # pyannote.audio Result has .export() or similar if using specific pipelines
-                        # But AMI-1.0 typically returns a Map of Audio
-                        track_audio.write_audio(str(track_path))
-                        
-                        # Transcribe the single-speaker track
-                        refined_segs = transcribe_chunk(track_path)
-                        for rs in refined_segs:
-                            # Adjust time to global chunk time
-                            rs["start"] += ov["start"]
-                            rs["end"] += ov["start"]
-                            # Mark as refined to skip or handle specially in assigner if needed
-                            rs["is_refined"] = True
-                            stt_segments.append(rs)
-                        
-                        track_path.unlink(missing_ok=True)
-                except Exception as ex:
-                    print(f"[Processor] [v8] Separation/Refinement failed: {ex}")
-                finally:
-                    ov_slice.unlink(missing_ok=True)
+            separation_cost.observe(ov_duration, timings["separate"] * ov_duration / total)
+    elif separator and overlaps and SEPARATION_MODE == "immediate" and SEPARATION_PASS == "overlap":
+        refined_segments, timings["separate"] = _timed(
+            separate_overlaps, separator, waveform, overlaps, transcribe_batch,
+            job["deadline"], job["skipped"],
+        )
+
+    stt_segments, timings["asr"] = stt_future.result()
+    stt_segments.extend(refined_segments)
 
     # 3. Speaker Linking
-    for d in diar_segments:
-        spk_id, _ = speaker_registry.match_or_create(d["embedding"])
-        d["global_speaker"] = spk_id
+    if not separated:
+        link_speakers(diar_segments, overlaps, speaker_registry)
+    if turn_log is not None:
+        turn_log.record(chunk_index, diar_segments)
+
+    # [v8] Deferred Refinement: keep the overlap audio for the batch job at POST /end
+    if separator and overlaps and SEPARATION_MODE == "deferred" and deferred_store is not None:
+        deferred_store.record(chunk_index, waveform, overlaps)
 
     # 4. Speaker Assignment
     print(f"[Processor] Step 3: Assigning speakers...")
-    assigned_segments = assign_speakers(
+    assigned = assign_speakers(
         diar_segments=diar_segments,
         stt_segments=stt_segments,
         min_overlap_ratio=0.5,
         overlaps=overlaps
     )
+    job["segments"] = sorted(assigned + track_segments, key=lambda x: x["start"]) if track_segments else assigned
+
+    # The waveform is no longer needed; free it before the job waits on the LLM
+    job.pop("waveform", None)
+
+
+def analyze_regions(job: dict, diarizer, separator, speaker_registry, turn_log=None, transcribe_batch=None):
+    """
+    Region-driven GPU stage (TRANSCRIBE_MODE "regions"):
+    diarize -> link -> separate -> one batched STT over clean regions + separated tracks.
+    Overlap audio is transcribed once (from its tracks), so segments are not duplicated.
+    Trade-off: STT waits for diarization instead of running concurrently with it.
+    :param transcribe_batch: batched Whisper call (default: transcribe_gpu.transcribe_batch)
+    """
+    if transcribe_batch is None:
+        from transcribe_gpu import transcribe_batch
+    from speaker_assigner import assign_speakers
+
+    chunk_index = job["chunk_index"]
+    waveform = job["waveform"]
+    timings = job["timings"]
+
+    # 1. Diarization + linking (track labels need global speakers)
+    print(f"[Processor] Step 1: Diarizing chunk {chunk_index}...")
+    diar_segments, overlaps, separated, track_speakers = diarize_and_separate(job, diarizer, separator, speaker_registry)
+    local_to_global = link_speakers(diar_segments, overlaps, speaker_registry)
+    if turn_log is not None:
+        turn_log.record(chunk_index, diar_segments)
+
+    if SEPARATION_PASS == "chunk":
+        track_labels = [[local_to_global.get(spk) for spk in speakers] for speakers in track_speakers]
+    else:
+        # 2. Separation of the overlaps that fit the deadline
+        separated, timings["separate"] = _timed(
+            separate_planned, separator, waveform, overlaps, job["deadline"], job["skipped"]
+        )
+        track_labels = [
+            label_tracks(diarizer, speaker_registry, ov_tracks, ov["speakers"])
+            for ov, ov_tracks, _ in separated
+        ]
+        for ov, _, sep_sec in separated:
+            separation_cost.observe(ov["end"] - ov["start"], sep_sec)
+
+    # 3. One batched STT call: clean regions from the mixture, overlaps from their tracks
+    print(f"[Processor] Step 2: Transcribing regions of chunk {chunk_index}...")
+    (mixture_segments, track_segments), timings["asr"] = _timed(
+        transcribe_regions, waveform, separated, track_labels, transcribe_batch
+    )
+
+    # 4. Speaker Assignment for mixture segments; separated overlaps no longer count as overlaps
+    separated_ids = {id(ov) for ov, _, _ in separated}
+    print(f"[Processor] Step 3: Assigning speakers...")
+    assigned = assign_speakers(
+        diar_segments=diar_segments,
+        stt_segments=mixture_segments,
+        min_overlap_ratio=0.5,
+        overlaps=[ov for ov in overlaps if id(ov) not in separated_ids]
+    )
+    job["segments"] = sorted(assigned + track_segments, key=lambda x: x["start"])
+
+    job.pop("waveform", None)
+
+
+def refine_stage(job: dict, output_dir: Path, patch_jsonl: Path, loop: asyncio.AbstractEventLoop = None):
+    """
+    LLM stage, after commit_stage: refine the already published segments (v8) off the critical path.
+    Changed texts are appended to `patch_jsonl` by segment ID and broadcast as "segments_refined".
+    On timeout or failure the raw records simply stay as published.
+    """
+    refine_batch_stage([job], output_dir, patch_jsonl, loop)
+
+
+def refine_batch_fits(jobs) -> bool:
+    """
+    Whether these queued refine jobs may share one LLM request (REFINE_BATCH_MAX_CHUNKS / REFINE_BATCH_TOKEN_BUDGET).
+    """
+    if len(jobs) > REFINE_BATCH_MAX_CHUNKS:
+        return False
+    return sum(Refiner.estimate_tokens(job["segments"]) for job in jobs) <= REFINE_BATCH_TOKEN_BUDGET
+
 
-    # 4.5 LLM Refinement (v8 추가)
-    print(f"[Processor] [v8] Step 3.5: Refining segments with LLM...")
+def refine_batch_stage(jobs, output_dir: Path, patch_jsonl: Path, loop: asyncio.AbstractEventLoop = None):
+    """
+    refine_stage for several consecutive chunks at once (the pipeline coalesces them when the refine queue backs up).
+    The refiner sends them as one request and splits the result back per chunk;
+    patches, stats lines and "segments_refined" events stay per chunk.
+    """
+    indices = [job["chunk_index"] for job in jobs]
+    skipped = []
+    # Each chunk gets the sequential budget it would have had, since one response now carries all of them
+    timeout = REFINE_TIMEOUT_SEC * len(jobs)
+
+    label = indices[0] if len(jobs) == 1 else f"{indices[0]}..{indices[-1]} ({len(jobs)} coalesced)"
+    print(f"[Processor] [v8] Refining chunk {label} with LLM (timeout {timeout:.1f}s)...")
+    t0 = time.perf_counter()
+    # The refiner edits texts in place, so it works on copies of the published segments.
+    # Local glossary fixes need no network: apply them first, so a timeout/error only loses the LLM edits
+    batch = [(job["chunk_index"], [dict(seg) for seg in job["segments"]]) for job in jobs]
+    suspects = refiner.correct_batch(batch)
+    corrected = [[dict(seg) for seg in segments] for _, segments in batch]
+    refined = [segments for _, segments in batch]
+    future = None
     try:
-        # 동기 환경에서 비동기 호출을 처리하기 위해 event loop 활용 (또는 refiner를 동기로 변경 가능하나 확장성 위해 유지)
+        # Refiner 는 비동기 클라이언트만 쓰므로 서버 event loop 에서 실행해도 loop 를 막지 않음
         if loop and loop.is_running():
-            future = asyncio.run_coroutine_threadsafe(refiner.refine(assigned_segments, chunk_index), loop)
-            assigned_segments = future.result(timeout=10) # 10초 타임아웃
+            future = asyncio.run_coroutine_threadsafe(refiner.refine_batch(batch, suspects), loop)
+            refined = future.result(timeout=timeout)
         else:
             # 루프가 없으면 새 루프로 실행 (Worker 스레드 상황 대응)
             new_loop = asyncio.new_event_loop()
-            assigned_segments = new_loop.run_until_complete(refiner.refine(assigned_segments, chunk_index))
-            new_loop.close()
+            try:
+                refined = new_loop.run_until_complete(
+                    asyncio.wait_for(refiner.refine_batch(batch, suspects), timeout)
+                )
+            finally:
+                new_loop.run_until_complete(refiner.aclose())
+                new_loop.close()
+    except TimeoutError:
+        print(f"[Processor] [v8] Refinement timed out after {timeout:.1f}s, keeping glossary-corrected segments")
+        if future is not None:
+            future.cancel()
+        skipped.append({"step": "refine", "reason": "timeout"})
+        refined = corrected
     except Exception as e:
-        print(f"[Processor] [v8] Refinement failed, using raw segments: {e}")
+        print(f"[Processor] [v8] Refinement failed, keeping glossary-corrected segments: {e}")
+        skipped.append({"step": "refine", "reason": "error"})
+        refined = corrected
+    elapsed = time.perf_counter() - t0
+
+    for job, chunk_refined in zip(jobs, refined):
+        chunk_index = job["chunk_index"]
+        segments = job["segments"]
+        job["timings"]["refine"] = elapsed
+        job["skipped"].extend(skipped)
+
+        # Patch records by stable segment ID (only texts the glossary or the LLM changed)
+        changed = [
+            {"id": seg["id"], "text": new["text"]}
+            for seg, new in zip(segments, chunk_refined)
+            if new.get("text", seg["text"]) != seg["text"]
+        ]
+        if changed:
+            with open(patch_jsonl, "a", encoding="utf-8") as f:
+                for patch in changed:
+                    f.write(json.dumps({"chunk": chunk_index, **patch}, ensure_ascii=False) + "\n")
+        with open(output_dir / "chunk_stats.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "chunk": chunk_index,
+                "phase": "refine",
+                "timings": {"refine": round(elapsed, 3)},
+                "batch": indices,
+                "skipped": skipped,
+            }) + "\n")
+
+        if loop:
+            asyncio.run_coroutine_threadsafe(
+                manager.broadcast({
+                    "type": "segments_refined",
+                    "chunkIndex": chunk_index,
+                    "segments": changed,
+                    "skipped": skipped,
+                }),
+                loop
+            )
+
+
+def commit_stage(job: dict, output_dir: Path, partial_jsonl: Path, loop: asyncio.AbstractEventLoop = None,
+                 speaker_registry=None):
+    """
+    Publish stage (chunk order): persist raw records with stable segment IDs, timings and broadcast,
+    right after speaker assignment. refine_stage patches the texts later by ID.
+    "speaker" stays the global ID; "speaker_name" is the display label (enrolled names, see
+    SpeakerRegistry.display_name).
+    With streaming diarization, records that continue the previous chunk's boundary turn carry
+    "merged_into" (see StreamingDiarizer.stitch); read_records folds them into that record.
+    """
+    chunk_index = job["chunk_index"]
 
     # 5. Save Results
     print(f"[Processor] Step 4: Saving results to {partial_jsonl.name}...")
     records = []
+    for i, seg in enumerate(job["segments"]):
+        seg["id"] = f"{chunk_index}-{i}"
+        records.append({
+            "id": seg["id"],
+            "chunk": chunk_index,
+            "speaker": seg["speaker"],
+            "speaker_name": speaker_registry.display_name(seg["speaker"]) if speaker_registry else seg["speaker"],
+            "start": round(chunk_index * CHUNK_SEC + seg["start"], 2),
+            "end": round(chunk_index * CHUNK_SEC + seg["end"], 2),
+            "text": seg["text"]
+        })
+
+    # Streaming diarization: records continuing the previous chunk's last turn are merged into it
+    if STREAMING_DIARIZATION:
+        continued = {spk: round(chunk_index * CHUNK_SEC + end, 2) for spk, end in job.get("continued", {}).items()}
+        stitched = stream_diarizer.stitch(chunk_index, records, continued)
+        if stitched:
+            print(f"[Processor] Stitched {stitched} boundary segment(s) of chunk {chunk_index} to chunk {chunk_index - 1}")
+
     with open(partial_jsonl, "a", encoding="utf-8") as f:
-        for seg in assigned_segments:
-            global_start = round(chunk_index * CHUNK_SEC + seg["start"], 2)
-            global_end = round(chunk_index * CHUNK_SEC + seg["end"], 2)
-            record = {
-                "chunk": chunk_index,
-                "speaker": seg["speaker"],
-                "start": global_start,
-                "end": global_end,
-                "text": seg["text"]
-            }
+        for record in records:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
-            records.append(record)
+
+    # 5.5 Per-stage timings up to publication (diarize || asr -> critical path = max, not sum)
+    timings = dict(job["timings"])
+    timings["total"] = time.perf_counter() - job["t_start"]
+    timings = {k: round(v, 3) for k, v in timings.items()}
+    print(f"[Processor] Chunk {chunk_index} timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+    if job["skipped"]:
+        print(f"[Processor] Chunk {chunk_index} degraded: {job['skipped']}")
+    with open(output_dir / "chunk_stats.jsonl", "a", encoding="utf-8") as f:
+        stats = {"chunk": chunk_index, "phase": "publish", "timings": timings, "skipped": job["skipped"]}
+        if "speaker_hints" in job:
+            stats["speaker_hints"] = job["speaker_hints"]
+        f.write(json.dumps(stats) + "\n")
 
     # 6. WebSocket Broadcasting
     if loop:
@@ -192,7 +619,55 @@ def process_chunk(
             manager.broadcast({
                 "type": "new_segments",
                 "chunkIndex": chunk_index,
-                "segments": records
+                "segments": records,
+                "skipped": list(job["skipped"])
             }),
             loop
         )
+
+
+def read_records(partial_jsonl: Path, patch_jsonl: Path = None):
+    """
+    Published records with refined texts applied (latest patch per segment ID wins).
+    Records stitched across a chunk boundary (merged_into) are folded into the record they continue.
+    :return: records in publication order, patched ones marked "refined": True
+    """
+    records = []
+    if partial_jsonl.exists():
+        with open(partial_jsonl, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+    patches = {}
+    if patch_jsonl is not None and patch_jsonl.exists():
+        with open(patch_jsonl, "r", encoding="utf-8") as f:
+            for line in f:
+                patch = json.loads(line)
+                patches[patch["id"]] = patch["text"]
+
+    for record in records:
+        if record.get("id") in patches:
+            record["text"] = patches[record["id"]]
+            record["refined"] = True
+    return fold_stitched(records)
+
+
+def process_chunk(
+    diarizer, 
+    separator,
+    speaker_registry, 
+    chunk_index: int, 
+    audio, 
+    output_dir: Path,
+    partial_jsonl: Path,
+    loop: asyncio.AbstractEventLoop = None
+):
+    """
+    Full audio processing pipeline for a single chunk (v8 Immediate Refinement).
+    Runs every stage back to back; main.py runs the same stages pipelined (see pipeline.py).
+    :param audio: raw upload bytes (WebM/Opus, OGG, WAV ...) or an audio file path
+    """
+    job = new_job(chunk_index, audio)
+    decode_stage(job)
+    analyze_stage(job, diarizer, separator, speaker_registry)
+    commit_stage(job, output_dir, partial_jsonl, loop)
+    refine_stage(job, output_dir, partial_jsonl.with_name("refined_patches.jsonl"), loop)
@@ -0,0 +1,249 @@
+"""
+reclustering.py
+
+회의 종료 시 전역 화자 재클러스터링
+
+- 회의 중: 청크별 (전역 화자) 발화 embedding 을 연속 float32 배열 하나에 누적 (TurnEmbeddingLog)
+  * turn embedding 은 청크 안에서 local 화자 단위로 pooling 되어 있으므로 (청크, 화자) 당 1행, 발화 길이를 가중치로 보관
+- POST /end: 온라인 EMA 매칭(고정 threshold)으로 쪼개진 화자를 회의 전체 기준으로 다시 묶음 (recluster)
+  1. 현재 라벨별 가중 centroid 계산 (np.add.at)
+  2. 가장 가까운 centroid 쌍을 threshold 이상이면 병합
+     (같은 청크에 함께 등장한 화자, 서로 다른 등록 화자끼리는 병합하지 않음)
+  3. 모든 행을 가장 가까운 centroid 로 재배정 (행렬곱 1회), 같은 청크 안에서 두 행이 한 화자로 모이는 이동은 취소
+  4. 배정이 바뀌지 않을 때까지 2-3 반복
+- 수천 행 기준 수 ms (centroid 수만큼의 작은 행렬 연산만 반복)
+- 최종 결과의 speaker 라벨을 (청크, 이전 라벨) -> 새 라벨로 다시 씀 (relabel_segments)
+  (그 청크에 embedding 이 없는 라벨은 병합된 라벨 기준)
+"""
+
+import threading
+
+import numpy as np
+
+from deferred import OVERLAP_MARK
+
+RECLUSTER_MAX_ITERATIONS = 10
+
+
+def _normalize(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
+class TurnEmbeddingLog:
+    """
+    회의 중 (청크, 전역 화자) 별 embedding 누적 (용량 2배씩 늘어나는 연속 배열)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._matrix = None  # (capacity, dim) float32, 정규화된 embedding
+        self._weights = np.zeros(0, dtype=np.float32)  # 발화 길이 합 (초)
+        self._chunks = np.zeros(0, dtype=np.int64)
+        self.labels = []  # 행 -> 전역 화자 ID
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:self.count]
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self._weights[:self.count]
+
+    @property
+    def chunks(self) -> np.ndarray:
+        return self._chunks[:self.count]
+
+    def _grow(self, dim: int, needed: int):
+        if self._matrix is None:
+            capacity = max(256, needed)
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        elif needed > len(self._matrix):
+            capacity = max(needed, 2 * len(self._matrix))
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[:self.count] = self._matrix[:self.count]
+            self._matrix = grown
+        else:
+            return
+        self._weights = np.resize(self._weights, len(self._matrix))
+        self._chunks = np.resize(self._chunks, len(self._matrix))
+
+    def record(self, chunk_index: int, diar_segments):
+        """
+        link_speakers 이후의 turn 목록을 전역 화자별로 모아 1행씩 추가 (길이 가중 평균 embedding)
+        """
+        sums, weights = {}, {}
+        for d in diar_segments:
+            embedding = d.get("embedding")
+            spk = d.get("global_speaker")
+            if embedding is None or spk is None:
+                continue
+            embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            if not np.all(np.isfinite(embedding)):
+                continue
+            w = max(d["end"] - d["start"], 1e-3)
+            sums[spk] = sums.get(spk, 0.0) + w * embedding
+            weights[spk] = weights.get(spk, 0.0) + w
+        if not sums:
+            return
+
+        rows = _normalize(np.stack(list(sums.values())))
+        with self._lock:
+            if self._matrix is not None and rows.shape[1] != self._matrix.shape[1]:
+                print(f"[Recluster] Skipping chunk {chunk_index}: embedding dim {rows.shape[1]} != {self._matrix.shape[1]}")
+                return
+            n = self.count
+            self._grow(rows.shape[1], n + len(rows))
+            self._matrix[n:n + len(rows)] = rows
+            self._weights[n:n + len(rows)] = list(weights.values())
+            self._chunks[n:n + len(rows)] = chunk_index
+            self.labels.extend(sums.keys())
+            self.count += len(rows)
+
+    def snapshot(self):
+        """
+        :return: (embeddings, weights, chunks, labels) 복사본
+        """
+        with self._lock:
+            return self.embeddings.copy(), self.weights.copy(), self.chunks.copy(), list(self.labels)
+
+
+def recluster(log: TurnEmbeddingLog, threshold: float = 0.7, preferred=()):
+    """
+    회의 전체 embedding 으로 전역 화자를 다시 묶음
+
+    :param threshold: centroid 병합 기준 cosine similarity
+    :param preferred: 병합 시 우선 유지할 라벨 (등록 화자 ID 등), 서로 다른 preferred 라벨끼리는 병합하지 않음
+    :return: (mapping { (chunk, 이전 라벨): 새 라벨 } - 바뀐 것만, report)
+    """
+    embeddings, weights, chunks, labels = log.snapshot()
+    names = list(dict.fromkeys(labels))
+    report = {"rows": len(labels), "speakers_before": len(names), "speakers_after": len(names), "merged": {}, "moved": 0}
+    if len(names) < 2:
+        return {}, report
+
+    preferred = set(preferred)
+    assign = _codes(labels, names)
+    chunk_ids, chunk_idx = np.unique(chunks, return_inverse=True)
+    weighted = embeddings * weights[:, None]
+
+    alive = np.ones(len(names), dtype=bool)
+    for _ in range(RECLUSTER_MAX_ITERATIONS):
+        # 1. 클러스터별 가중 합 / 청크 공동 등장
+        sums = np.zeros((len(names), embeddings.shape[1]), dtype=np.float32)
+        np.add.at(sums, assign, weighted)
+        mass = np.bincount(assign, weights=weights, minlength=len(names))
+        presence = np.zeros((len(names), len(chunk_ids)), dtype=bool)
+        presence[assign, chunk_idx] = True
+
+        # 2. 병합: 가장 가까운 허용 쌍부터 threshold 이상인 동안 (병합마다 두 클러스터 행만 갱신)
+        alive &= mass > 0
+        centroids = _normalize(sums)
+        sim = centroids @ centroids.T
+        blocked = (presence.astype(np.int32) @ presence.T.astype(np.int32)) > 0
+        is_pref = np.array([name in preferred for name in names])
+        blocked |= is_pref[:, None] & is_pref[None, :]
+        blocked |= ~alive[:, None] | ~alive[None, :]
+        sim[blocked] = -np.inf
+
+        target = np.arange(len(names))
+        while True:
+            i, j = np.unravel_index(int(np.argmax(sim)), sim.shape)
+            if sim[i, j] < threshold:
+                break
+            keep, drop = (i, j) if _keeps(names[i], names[j], i, j, preferred) else (j, i)
+            target[target == drop] = keep
+            sums[keep] += sums[drop]
+            mass[keep] += mass[drop]
+            presence[keep] |= presence[drop]
+            is_pref[keep] |= is_pref[drop]
+            alive[drop] = False
+
+            centroids[keep] = _normalize(sums[keep])
+            row = centroids @ centroids[keep]
+            row[presence[keep] @ presence.T] = -np.inf  # 공동 등장 (자기 자신 포함)
+            row[is_pref[keep] & is_pref] = -np.inf
+            row[~alive] = -np.inf
+            sim[keep], sim[:, keep] = row, row
+            sim[drop], sim[:, drop] = -np.inf, -np.inf
+        merged_assign = target[assign]
+
+        # 3. 재배정: 가장 가까운 살아있는 centroid, 같은 청크 안 충돌은 이동 취소 (머문 행 우선)
+        scores = embeddings @ centroids.T
+        scores[:, ~alive] = -np.inf
+        proposed = scores.argmax(axis=1)
+        while True:
+            key = chunk_idx * len(names) + proposed
+            _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+            clash = (counts[inverse] > 1) & (proposed != merged_assign)
+            if not clash.any():
+                break
+            proposed[clash] = merged_assign[clash]
+
+        changed = proposed != assign
+        assign = proposed
+        if not changed.any():
+            break
+
+    # 4. 최종 라벨 및 보고
+    new_labels = [names[k] for k in assign]
+    mapping = {}
+    for chunk, old, new in zip(chunks.tolist(), labels, new_labels):
+        if old != new:
+            mapping[(chunk, old)] = new
+
+    final = set(new_labels)
+    for name in names:
+        if name not in final:
+            # 이 라벨의 행이 가장 많이 옮겨간 라벨
+            moved_to = [new for old, new in zip(labels, new_labels) if old == name]
+            report["merged"][name] = max(set(moved_to), key=moved_to.count)
+    report["speakers_after"] = len(final)
+    report["moved"] = len(mapping)
+    return mapping, report
+
+
+def _codes(labels, names):
+    position = {name: i for i, name in enumerate(names)}
+    return np.fromiter((position[label] for label in labels), dtype=np.int64, count=len(labels))
+
+
+def _keeps(a: str, b: str, order_a: int, order_b: int, preferred) -> bool:
+    """
+    병합 시 a 라벨을 유지할지 (등록 화자 이름 우선, 다음은 회의에 먼저 등장한 라벨)
+    """
+    if (a in preferred) != (b in preferred):
+        return a in preferred
+    return order_a < order_b
+
+
+def relabel_segments(segments, mapping: dict, merged: dict = None) -> int:
+    """
+    최종 segments 의 speaker 라벨을 (청크, 이전 라벨) -> 새 라벨로 교체 ("A & B (겹침 발화)" 포함)
+    :param merged: { 없어진 라벨: 새 라벨 } - 그 청크의 embedding 이 없는 라벨(분리 트랙 등)에 사용
+    :return: 바뀐 segment 수
+    """
+    merged = merged or {}
+    if not mapping and not merged:
+        return 0
+
+    changed = 0
+    for seg in segments:
+        label = seg["speaker"]
+        overlap = OVERLAP_MARK in label
+        names = label.replace(OVERLAP_MARK, "").strip().split(" & ") if overlap else [label]
+        new_names = [mapping.get((seg.get("chunk"), name), merged.get(name, name)) for name in names]
+        if new_names == names:
+            continue
+
+        unique = sorted(set(new_names))
+        # 겹침 화자가 한 사람으로 합쳐지면 일반 라벨
+        seg["speaker"] = " & ".join(unique) + f" {OVERLAP_MARK}" if overlap and len(unique) > 1 else unique[0]
+        changed += 1
+    return changed
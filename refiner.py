@@ -1,75 +1,247 @@
 import os
 import json
-from typing import List, Dict
-from openai import AzureOpenAI
-from azure.search.documents import SearchClient
+import asyncio
+from typing import List, Dict, Tuple
+import httpx
+from openai import AsyncAzureOpenAI
+from azure.search.documents.aio import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from dotenv import load_dotenv
+from config import (
+    REFINE_TIMEOUT_SEC, REFINE_MAX_CONCURRENCY, REFINE_MAX_CONNECTIONS,
+    GLOSSARY_PATH, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SEC, REFINE_LLM_POLICY,
+)
+from glossary import Glossary, TtlLruCache, query_terms
 
 load_dotenv()
 
 class Refiner:
-    def __init__(self):
+    """
+    LLM 정제기 (비동기)
+    - AsyncAzureOpenAI + 공유 httpx.AsyncClient (connection pool, keep-alive) 로 event loop 를 막지 않음
+    - Azure AI Search 도 aio 클라이언트 사용
+    - 동시 요청 수는 semaphore 로 제한 (REFINE_MAX_CONCURRENCY)
+    - 도메인 지식: 로컬 용어집(매 청크, 메모리 조회) + 원격 검색(핵심 용어 기준 LRU/TTL 캐시, 미스일 때만 호출)
+    - 용어집 fast path: 확실한 오인식은 로컬에서 바로 교정하고, 확인이 필요한 표기(suspects)가 남은 청크만 LLM 호출
+      (용어집이 비어 있으면 fast path 없이 모든 청크를 LLM 으로)
+    - 대기열이 밀리면 연속된 여러 청크를 요청 1번으로 정제 (refine_batch, 프롬프트 / 맥락 반복 절감)
+    - 클라이언트는 처음 사용하는 event loop 에 묶이므로 loop 가 바뀌면 다시 생성
+    """
+
+    def __init__(
+        self,
+        endpoint: str = None,
+        api_key: str = None,
+        api_version: str = None,
+        deployment_name: str = None,
+        max_concurrency: int = REFINE_MAX_CONCURRENCY,
+        max_connections: int = REFINE_MAX_CONNECTIONS,
+        glossary: Glossary = None,
+    ):
+        """
+        인자를 생략하면 환경 변수(AZURE_OPENAI_*) 사용 (테스트에서는 로컬 stub endpoint 지정)
+        :param glossary: 로컬 용어집 (기본: GLOSSARY_PATH 파일을 한 번 읽음)
+        """
         # Azure OpenAI Setup
-        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
-        
-        self.client = AzureOpenAI(
-            api_key=self.api_key,
-            api_version=self.api_version,
-            azure_endpoint=self.endpoint
-        )
+        self.api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        self.api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION")
+        self.endpoint = endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.deployment_name = deployment_name or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
 
         # Azure AI Search Setup
         self.search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
         self.search_key = os.getenv("AZURE_SEARCH_API_KEY")
         self.index_name = os.getenv("AZURE_SEARCH_INDEX_NAME")
-        
+
+        # 로컬 용어집 (시작 시 1회 로드) + 원격 검색 결과 캐시
+        self.glossary = Glossary.load(GLOSSARY_PATH) if glossary is None else glossary
+        self.search_cache = TtlLruCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SEC)
+
+        # loop 별 클라이언트 (_bind 에서 생성)
+        self._loop = None
+        self._http = None
+        self._semaphore = None
+        self.client = None
         self.search_client = None
-        if self.search_endpoint and self.search_key and self.index_name:
-            self.search_client = SearchClient(
-                self.search_endpoint, 
-                self.index_name, 
-                AzureKeyCredential(self.search_key)
-            )
 
         # Context History (맥락 유지용)
         self.history = []
         self.max_history = 5
         self.domain_terms = ""
+        self.remote_terms = ""
+        self.counters = {"chunks": 0, "llm_calls": 0, "fast_path": 0, "local_fixes": 0, "coalesced_chunks": 0}
+
+    def _bind(self):
+        """
+        현재 event loop 에 묶인 클라이언트 준비 (같은 loop 면 재사용)
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # 다른 loop 에서 만든 클라이언트는 그 loop 에서만 닫을 수 있으므로 버림
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            timeout=httpx.Timeout(REFINE_TIMEOUT_SEC, connect=5.0),
+        )
+        self.client = AsyncAzureOpenAI(
+            api_key=self.api_key,
+            api_version=self.api_version,
+            azure_endpoint=self.endpoint,
+            http_client=self._http,
+            max_retries=1,  # 청크 예산 안에서 끝나야 하므로 재시도는 1회만
+        )
+        self.search_client = None
+        if self.search_endpoint and self.search_key and self.index_name:
+            self.search_client = SearchClient(
+                self.search_endpoint,
+                self.index_name,
+                AzureKeyCredential(self.search_key)
+            )
+
+    async def aclose(self):
+        """
+        현재 loop 의 클라이언트 연결 정리 (서버 종료 / 임시 loop 종료 전 호출)
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self.search_client is not None:
+            await self.search_client.close()
+        if self.client is not None:
+            await self.client.close()
+        self._loop = self._http = self._semaphore = self.client = self.search_client = None
 
-    def _get_domain_knowledge(self, query: str):
-        """RAG를 통해 도메인 지식(전문 용어 등)을 추출합니다."""
+    async def _get_domain_knowledge(self, query: str):
+        """RAG를 통해 도메인 지식(전문 용어 등)을 추출합니다. 같은 핵심 용어의 결과는 캐시에서 재사용합니다."""
         if not self.search_client:
             return ""
-        
+
+        key = query_terms(query)
+        if not key:
+            return ""
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
-            # 단순 텍스트 검색으로 용어 추출 (필요시 임베딩 추가 가능하나 성능 위해 일단 텍스트 처리)
-            results = self.search_client.search(
-                search_text=query,
+            # 핵심 용어로 텍스트 검색 (캐시 키와 같은 질의 -> 결과가 키로 결정됨)
+            results = await self.search_client.search(
+                search_text=" ".join(key),
                 top=3,
                 select=["content"]
             )
-            terms = "\n".join([r["content"] for r in results])
-            return terms[:1000] # 토큰 절약
+            terms = "\n".join([r["content"] async for r in results])[:1000] # 토큰 절약
+            self.search_cache.put(key, terms)
+            return terms
         except Exception as e:
             print(f"[Refiner] RAG Search failed: {e}")
             return ""
 
+    def profile(self) -> dict:
+        """
+        LLM 호출 / fast path 건수와 원격 검색 캐시 상태
+        """
+        return {**self.counters, "search_cache": self.search_cache.stats(), "glossary_terms": len(self.glossary)}
+
+    @staticmethod
+    def estimate_tokens(segments: List[Dict]) -> int:
+        """
+        세그먼트 텍스트의 대략적인 토큰 수 (한글 1글자 ~1토큰, ASCII ~4글자 1토큰) + 세그먼트당 JSON 필드 오버헤드
+        """
+        total = 0
+        for seg in segments:
+            text = seg.get("text", "")
+            ascii_chars = sum(ch.isascii() for ch in text)
+            total += (len(text) - ascii_chars) + ascii_chars // 4 + 30
+        return total
+
+    def _remember(self, segments: List[Dict]):
+        # 히스토리 업데이트 (최신 5개 제한)
+        current_summary = " ".join([seg["text"] for seg in segments])
+        self.history.append(current_summary)
+        if len(self.history) > self.max_history:
+            self.history.pop(0)
+
+    def _correct(self, segments: List[Dict], chunk_index: int):
+        """
+        로컬 용어 교정 (Aho-Corasick): 확실한 오인식은 바로 고치고, 확인이 필요한 표기 목록을 돌려줌
+        """
+        fixes, suspects = [], []
+        for seg in segments:
+            seg["text"], seg_fixes, seg_suspects = self.glossary.correct(seg["text"])
+            fixes.extend(seg_fixes)
+            suspects.extend(seg_suspects)
+        self.counters["local_fixes"] += len(fixes)
+        if fixes:
+            print(f"[Refiner] Chunk {chunk_index}: glossary fixes " + ", ".join(f"{a} -> {b}" for a, b in fixes))
+        return suspects
+
     async def refine(self, segments: List[Dict], chunk_index: int) -> List[Dict]:
         """STT 세그먼트들을 LLM을 통해 정제합니다."""
-        if not segments:
-            return []
+        return (await self.refine_batch([(chunk_index, segments)]))[0]
+
+    def correct_batch(self, chunks: List[Tuple[int, List[Dict]]]) -> List[List]:
+        """
+        로컬 용어 교정만 수행 (네트워크 없음, 입력 목록을 직접 갱신)
+        LLM 정제가 시간 초과/실패해도 이 교정은 남도록 호출 측에서 먼저 실행할 수 있음
+        :return: 청크별 확인 필요 표기 목록 (refine_batch 의 suspects 로 전달)
+        """
+        return [self._correct(segments, chunk_index) if segments else [] for chunk_index, segments in chunks]
+
+    async def refine_batch(self, chunks: List[Tuple[int, List[Dict]]], suspects: List[List] = None) -> List[List[Dict]]:
+        """
+        연속된 여러 청크를 LLM 요청 1번으로 정제 (대기열이 밀렸을 때 시스템 프롬프트 / 맥락 / 참조 지식 반복을 줄임)
+        세그먼트를 이어 붙여 보내고, 응답은 청크별 세그먼트 수대로 다시 나눔
+        :param chunks: [(chunk_index, segments)] 청크 순서
+        :param suspects: correct_batch 결과 (이미 로컬 교정한 경우), None 이면 여기서 교정
+        :return: 청크별 정제된 segments (입력 목록을 직접 갱신)
+        """
+        if suspects is None:
+            suspects = self.correct_batch(chunks)
+        pending = []  # LLM 으로 보낼 (chunk_index, segments)
+        batch_suspects = []
+        for (chunk_index, segments), chunk_suspects in zip(chunks, suspects):
+            if not segments:
+                continue
+            self.counters["chunks"] += 1
+            # 0. 로컬 용어 교정 결과: 확인이 필요한 표기가 없는 청크는 LLM 을 건너뜀
+            #    (용어집이 비어 있으면 판단 근거가 없으므로 항상 LLM)
+            if REFINE_LLM_POLICY == "suspects" and len(self.glossary) and not chunk_suspects:
+                self.counters["fast_path"] += 1
+                print(f"[Refiner] Chunk {chunk_index}: no suspect terms, LLM skipped")
+                self._remember(segments)
+                continue
+            pending.append((chunk_index, segments))
+            batch_suspects.extend(chunk_suspects)
 
+        if pending:
+            await self._refine_with_llm(pending, batch_suspects)
+        return [segments for _, segments in chunks]
+
+    async def _refine_with_llm(self, chunks: List[Tuple[int, List[Dict]]], suspects):
+        """
+        청크 묶음의 세그먼트를 한 요청으로 정제, 실패 시 원본 유지
+        """
+        self._bind()
+        indices = [chunk_index for chunk_index, _ in chunks]
+        segments = [seg for _, chunk_segments in chunks for seg in chunk_segments]
+        label = f"{indices[0]}" if len(indices) == 1 else f"{indices[0]}..{indices[-1]} (x{len(indices)})"
         raw_text = " ".join([seg["text"] for seg in segments])
-        
-        # 1. 도메인 지식 업데이트 (첫 청크이거나 중요 키워드 있을 때만 수행 권장이나 일단 매번 시도)
-        if chunk_index % 5 == 0 or not self.domain_terms:
-            self.domain_terms = self._get_domain_knowledge(raw_text)
+
+        # 1. 도메인 지식 업데이트: 로컬 용어집은 매 청크 (메모리 조회), 원격 검색은 5청크마다 (캐시 우선)
+        local_terms = self.glossary.lookup(raw_text)
+        if any(i % 5 == 0 for i in indices) or not self.remote_terms:
+            self.remote_terms = await self._get_domain_knowledge(raw_text)
+        self.domain_terms = "\n".join(t for t in (local_terms, self.remote_terms) if t)[:1000]
 
         # 2. 프롬프트 구성
+        suspect_lines = "\n".join(f"{surface} -> {term}" for surface, term in dict.fromkeys(suspects)) or "(없음)"
         context_history = "\n".join(self.history[-2:]) # 직전 2개 청크만 맥락으로 제공
         
         system_prompt = f"""당신은 전문 회의 속기사입니다. 회사 [이음]의 회의 전사 내용을 정제하세요.
@@ -79,26 +251,35 @@ class Refiner:
 2. 완전한 문장 보존: 의미가 명확하고 올바른 단어로 구성된 문장은 절대 건드리지 마세요.
 3. 단어/어순 유지: 불필요한 미사여구를 추가하거나 문장 표현을 미화하지 마세요.
 4. 출력 형식: 추가 설명(예: "이 문장은~") 없이 오직 JSON 배열만 반환하세요.
+5. 입력 세그먼트 수와 순서를 그대로 유지하세요 (합치거나 나누지 마세요).
 
 [참조 지식]
 {self.domain_terms}
 
 [직전 대화 맥락]
 {context_history}
+
+[확인 필요 표기 (오인식일 수 있음: 표기 -> 후보 용어)]
+{suspect_lines}
 """
 
         user_content = json.dumps(segments, ensure_ascii=False)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+            # 동시 요청 수 제한 (대기 중에도 event loop 는 다른 작업 처리)
+            self.counters["llm_calls"] += 1
+            if len(chunks) > 1:
+                self.counters["coalesced_chunks"] += len(chunks)
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model=self.deployment_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
             
             refined_data = json.loads(response.choices[0].message.content)
             # JSON 형태가 {"segments": [...]} 인지 [...] 인지 체크
@@ -111,8 +292,15 @@ class Refiner:
                 val = list(refined_data.values())[0]
                 refined_list = val if isinstance(val, list) else segments
 
+            if len(chunks) > 1 and len(refined_list) != len(segments):
+                # 묶음 응답의 세그먼트 수가 다르면 청크 경계를 알 수 없으므로 원본 유지
+                print(f"[Refiner] Chunks {label}: expected {len(segments)} segments, got {len(refined_list)}, keeping raw")
+                for _, chunk_segments in chunks:
+                    self._remember(chunk_segments)
+                return
+
             # 결과 업데이트 및 비교 로그 출력
-            print(f"\n✨ [Refinement Log - Chunk {chunk_index}]")
+            print(f"\n✨ [Refinement Log - Chunk {label}]")
             for i, seg in enumerate(segments):
                 raw_text = seg["text"]
                 if i < len(refined_list):
@@ -123,14 +311,8 @@ class Refiner:
                         print(f"    - To:   {refined_text}")
                     seg["text"] = refined_text
             
-            # 히스토리 업데이트 (최신 5개 제한)
-            current_summary = " ".join([seg["text"] for seg in segments])
-            self.history.append(current_summary)
-            if len(self.history) > self.max_history:
-                self.history.pop(0)
-
-            return segments
+            for _, chunk_segments in chunks:
+                self._remember(chunk_segments)
 
         except Exception as e:
-            print(f"[Refiner] Refinement failed: {e}")
-            return segments # 실패 시 원본 반환
+            print(f"[Refiner] Refinement failed: {e}") # 실패 시 원본 유지
@@ -0,0 +1,103 @@
+"""
+scheduler.py
+
+청크별 처리 시간 예산(deadline)을 관리하고, 예산 안에서 speech separation 작업을 계획하는 모듈
+
+- 청크 업로드 시점부터 CHUNK_DEADLINE_SEC (기본 25초) 예산
+- 겹침 구간은 길이 순으로 최대 SEPARATION_MAX_OVERLAPS 개까지만 분리
+- 실제 분리 비용(초/겹침 초)을 EMA 로 학습하여, 예산을 넘길 작업은 미리 건너뜀
+- 건너뛴 구간은 assign_speakers 의 "A & B (겹침 발화)" 라벨로 대체됨
+"""
+
+import threading
+import time
+
+
+class ChunkDeadline:
+    """
+    청크 하나의 처리 시간 예산
+    """
+
+    def __init__(self, budget_sec: float, start: float = None):
+        self.budget_sec = budget_sec
+        self.start = time.perf_counter() if start is None else start
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> float:
+        return self.budget_sec - self.elapsed()
+
+    def allows(self, cost_sec: float) -> bool:
+        """
+        cost_sec 짜리 작업을 지금 시작해도 예산 안에 끝나는지
+        """
+        return cost_sec <= self.remaining()
+
+
+class SeparationCostModel:
+    """
+    겹침 1초당 분리 + 트랙 전사 비용(초)을 EMA 로 추정
+    """
+
+    def __init__(self, sec_per_sec: float = 1.0, overhead_sec: float = 0.5, alpha: float = 0.3):
+        """
+        :param sec_per_sec: 초기 추정치 (겹침 1초를 처리하는 데 걸리는 시간)
+        :param overhead_sec: 겹침 구간당 고정 비용 (모델 호출, 전사 준비 등)
+        :param alpha: EMA 반영 비율
+        """
+        self.sec_per_sec = sec_per_sec
+        self.overhead_sec = overhead_sec
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def estimate(self, duration: float) -> float:
+        return self.overhead_sec + self.sec_per_sec * duration
+
+    def observe(self, duration: float, cost_sec: float):
+        if duration <= 0:
+            return
+        rate = max(0.0, cost_sec - self.overhead_sec) / duration
+        with self._lock:
+            self.sec_per_sec = (1.0 - self.alpha) * self.sec_per_sec + self.alpha * rate
+
+
+def plan_separation(overlaps, deadline: ChunkDeadline, cost_model: SeparationCostModel,
+                    min_duration: float = 2.0, max_overlaps: int = 3):
+    """
+    분리할 겹침 구간 선택 (긴 구간 우선, 개수 상한 + 남은 예산 고려)
+
+    :return: (planned, skipped)
+        planned: 분리할 구간 (시간순)
+        skipped: [{ "step": "separation", "start", "end", "reason" }]
+    """
+    candidates = [ov for ov in overlaps if ov["end"] - ov["start"] >= min_duration]
+    candidates.sort(key=lambda ov: ov["end"] - ov["start"], reverse=True)
+
+    planned, skipped = [], []
+    budget = deadline.remaining()
+
+    for ov in candidates:
+        cost = cost_model.estimate(ov["end"] - ov["start"])
+        if len(planned) >= max_overlaps:
+            skipped.append(skip_record(ov, "overlap_cap"))
+        elif cost > budget:
+            skipped.append(skip_record(ov, "deadline"))
+        else:
+            planned.append(ov)
+            budget -= cost
+
+    planned.sort(key=lambda ov: ov["start"])
+    return planned, skipped
+
+
+def skip_record(ov, reason: str) -> dict:
+    """
+    건너뛴 분리 작업 기록 (청크 기록에 남김)
+    """
+    return {
+        "step": "separation",
+        "start": ov["start"],
+        "end": ov["end"],
+        "reason": reason,
+    }
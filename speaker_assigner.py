@@ -5,11 +5,9 @@ STT segment에 diarization + speaker_linker 결과를 기반으로
 최종 speaker를 할당하는 모듈
 """
 
-def _overlap(a_start, a_end, b_start, b_end):
-    """
-    두 시간 구간의 겹치는 길이 계산
-    """
-    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+import numpy as np
+
+from intervals import overlapping_pairs
 
 
 def assign_speakers(
@@ -40,57 +38,67 @@ def assign_speakers(
     ]
     """
 
-    results = []
+    if not stt_segments:
+        return []
+
+    seg_starts = np.array([seg["start"] for seg in stt_segments], dtype=np.float64)
+    seg_ends = np.array([seg["end"] for seg in stt_segments], dtype=np.float64)
+    seg_lens = seg_ends - seg_starts
+    n = len(stt_segments)
+
+    # 1. 겹침 발화(Overlap) 여부: STT 구간과 겹침 구간의 교집합이 2초 이상이거나 구간의 50% 이상
+    #    조건을 만족하는 첫 번째 겹침 구간 (겹치는 쌍만 인덱스로 찾음)
+    involved = np.full(n, -1)
+    if overlaps:
+        ov_starts = np.array([ov["start"] for ov in overlaps], dtype=np.float64)
+        ov_ends = np.array([ov["end"] for ov in overlaps], dtype=np.float64)
+        i, o = overlapping_pairs(seg_starts, seg_ends, ov_starts, ov_ends)
+        ov_len = np.minimum(seg_ends[i], ov_ends[o]) - np.maximum(seg_starts[i], ov_starts[o])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hit = (ov_len >= 2.0) | (ov_len / seg_lens[i] >= 0.5)
+        first_ov = np.full(n, len(overlaps))
+        np.minimum.at(first_ov, i[hit], o[hit])
+        involved = np.where(first_ov < len(overlaps), first_ov, -1)
+
+    # 2. 일반적인 화자 매칭: 화자별 겹침 길이 합 (화자 순서 = diarization 첫 등장 순서)
+    speakers = list(dict.fromkeys(d["global_speaker"] for d in diar_segments))
+    totals = np.zeros((n, len(speakers)))
+    # 동점일 때는 먼저 겹친 diarization 구간의 화자 우선 (기존 dict 삽입 순서와 동일)
+    first_hit = np.full((n, len(speakers)), len(diar_segments))
+    if diar_segments:
+        d_starts = np.array([d["start"] for d in diar_segments], dtype=np.float64)
+        d_ends = np.array([d["end"] for d in diar_segments], dtype=np.float64)
+        column = {spk: k for k, spk in enumerate(speakers)}
+        d_cols = np.array([column[d["global_speaker"]] for d in diar_segments])
+
+        # 쌍은 (STT, diarization) 순으로 정렬되어 있고 np.add.at 은 순서대로 누적하므로
+        # 부동소수 합산 순서가 기존 구현과 같음
+        i, j = overlapping_pairs(seg_starts, seg_ends, d_starts, d_ends)
+        inter = np.minimum(seg_ends[i], d_ends[j]) - np.maximum(seg_starts[i], d_starts[j])
+        np.add.at(totals, (i, d_cols[j]), inter)
+        np.minimum.at(first_hit, (i, d_cols[j]), j)
+
+    # 3. 최고 점유 화자 (동점이면 먼저 겹친 화자), 비율 기준 미달이면 UNKNOWN
+    best = np.full(n, -1)
+    if speakers:
+        best_total = totals.max(axis=1)
+        tied_first = np.where(totals == best_total[:, None], first_hit, len(diar_segments) + 1)
+        candidate = tied_first.argmin(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            accepted = (best_total > 0) & (best_total / seg_lens >= min_overlap_ratio)
+        best = np.where(accepted, candidate, -1)
 
-    for seg in stt_segments:
-        seg_len = seg["end"] - seg["start"]
-        overlap_map = {}
-
-        # 1. 겹침 발화(Overlap) 여부 먼저 확인
-        involved_in_overlap = []
-        if overlaps:
-            for ov in overlaps:
-                # STT 구간과 겹침 구간의 교지합이 2초 이상이거나 구간의 50% 이상이면 겹침으로 간주
-                ov_len = _overlap(seg["start"], seg["end"], ov["start"], ov["end"])
-                if ov_len >= 2.0 or (ov_len / seg_len >= 0.5):
-                    involved_in_overlap = ov["speakers"]
-                    break
-
-        # 2. 일반적인 화자 매칭 (가장 높은 점유율)
-        for d in diar_segments:
-            ov = _overlap(
-                seg["start"], seg["end"],
-                d["start"], d["end"]
-            )
-
-            if ov <= 0:
-                continue
-
-            spk = d["global_speaker"]
-            overlap_map[spk] = overlap_map.get(spk, 0.0) + ov
-
-        if involved_in_overlap:
+    results = []
+    for i, seg in enumerate(stt_segments):
+        if involved[i] >= 0 and overlaps[involved[i]]["speakers"]:
             # v8: 여러 화자가 동시에 말하는 것으로 표시
-            # 화자들을 정렬하여 일관성 유지
-            sorted_spk = sorted(list(set(involved_in_overlap)))
-            speaker = " & ".join(sorted_spk)
-            
-            # 2초 이상의 유의미한 겹침일 경우 마커 추가
-            # involved_in_overlap이 설정되었다는 것은 이미 내부 루프에서 임계값을 넘었다는 뜻
-            # 여기서는 명시적으로 '(겹침 발화)' 문구 추가
-            speaker += " (겹침 발화)"
-        elif not overlap_map:
-            speaker = "UNKNOWN"
+            # 화자들을 정렬하여 일관성 유지, 유의미한 겹침이므로 '(겹침 발화)' 문구 추가
+            sorted_spk = sorted(set(overlaps[involved[i]]["speakers"]))
+            speaker = " & ".join(sorted_spk) + " (겹침 발화)"
+        elif best[i] >= 0:
+            speaker = speakers[best[i]]
         else:
-            best_speaker, best_overlap = max(
-                overlap_map.items(),
-                key=lambda x: x[1]
-            )
-
-            if best_overlap / seg_len >= min_overlap_ratio:
-                speaker = best_speaker
-            else:
-                speaker = "UNKNOWN"
+            speaker = "UNKNOWN"
 
         results.append({
             "start": round(float(seg["start"]), 2),
@@ -5,13 +5,23 @@ speaker_linker.py
 전역 speaker ID로 통합하는 모듈
 
 - sklearn 의존성 제거
-- NumPy 기반 cosine similarity
+- 전역 화자 centroid 를 정규화된 float32 행렬 하나로 보관 (화자 수만큼 연속 메모리)
+- 청크의 모든 turn 을 한 번의 행렬곱으로 점수화
+- local 화자 <-> 전역 화자 1:1 할당 (Hungarian, scipy.optimize.linear_sum_assignment)
 - EMA 방식 embedding 업데이트
-- 6인 회의 기준 안정 설계
+- 지금까지 들린 화자 수로 다음 청크 diarization 의 화자 수 범위 힌트 제공 (count_hints)
+- 신규 화자는 등록된 voice profile 저장소(voice_profiles.py)를 먼저 조회하여 식별
+  (전역 ID 는 "PROFILE_<profile_id>", 이름은 표시용 메타데이터로만 사용: display_name)
+- 6인 회의 기준 안정 설계, 수십 명 규모 웨비나까지 확장
 """
 
+import re
+from types import MappingProxyType
+
 import numpy as np
 
+_PROFILE_ID = re.compile(r"PROFILE_\w+")
+
 
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     """
@@ -22,55 +32,144 @@ def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     )
 
 
+def _normalize(x) -> np.ndarray:
+    """
+    행 단위 L2 정규화 (float32)
+    """
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
 class SpeakerRegistry:
-    def __init__(self, similarity_threshold=0.75, ema_alpha=0.8):
+    def __init__(self, similarity_threshold=0.75, ema_alpha=0.8, profiles=None, profile_threshold=None):
         """
         :param similarity_threshold: 같은 화자로 판단할 cosine similarity 기준
         :param ema_alpha: embedding EMA 업데이트 비율
+        :param profiles: VoiceProfileStore (선택) - 신규 화자 등록 시 조회
+        :param profile_threshold: 등록 화자로 식별할 cosine similarity 기준 (기본: similarity_threshold)
         """
-        self.speakers = {}  # { "SPK_0": {"embedding": np.ndarray, "count": int} }
         self.similarity_threshold = similarity_threshold
         self.ema_alpha = ema_alpha
+        self.profiles = profiles
+        self.profile_threshold = similarity_threshold if profile_threshold is None else profile_threshold
+        self.profile_of = {}  # 전역 ID -> {"profile_id", "name"} (등록 화자로 식별된 경우)
+        self.ids = []  # 행 번호 -> "SPK_0", ...
+        self._rows = {}  # "SPK_0" -> 행 번호
+        self._matrix = None  # (capacity, dim) float32, 정규화된 centroid (앞 len(ids) 행만 유효)
+        self._counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """
+        (화자 수, dim) 정규화된 centroid 행렬 (복사 없는 view)
+        """
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[:len(self.ids)]
+
+    @property
+    def speakers(self):
+        """
+        { "SPK_0": {"embedding": np.ndarray, "count": int} } 읽기 전용 snapshot
+        centroid 행렬에서 매번 새로 만들므로, 수정하면 조용히 사라지지 않고 바로 오류가 나도록 막아 둠
+        (변경은 register / update 로)
+        """
+        centroids = self.centroids
+        speakers = {}
+        for row, spk_id in enumerate(self.ids):
+            embedding = centroids[row]
+            embedding.flags.writeable = False  # view 만 잠금 (centroid 행렬은 그대로)
+            speakers[spk_id] = MappingProxyType({"embedding": embedding, "count": int(self._counts[row])})
+        return MappingProxyType(speakers)
+
+    def scores(self, embeddings, ids=None) -> np.ndarray:
+        """
+        embedding 여러 개와 전역 화자들의 cosine similarity (행렬곱 1회)
+        :param ids: 비교할 화자 ID 목록 (None 이면 전체)
+        :return: (len(embeddings), 화자 수)
+        """
+        centroids = self.centroids
+        if ids is not None:
+            centroids = centroids[[self._rows[spk_id] for spk_id in ids]]
+        embeddings = _normalize(np.atleast_2d(embeddings))
+        if len(centroids) == 0:
+            return np.zeros((len(embeddings), 0), dtype=np.float32)
+        return embeddings @ centroids.T
+
+    def count_hints(self, margin: int = 2) -> dict:
+        """
+        다음 청크 diarization 의 min_speakers / max_speakers 힌트 (pyannote clustering 탐색 범위 축소)
+
+        - 아직 들린 화자가 없으면 힌트 없음 (전체 탐색)
+        - max = 지금까지 들린 화자 수 + margin: 새 화자가 한 청크에 margin 명까지 등장할 수 있음
+          (넘는 경우 기존 화자에 묶이지만, 다음 청크부터 상한이 다시 늘어남)
+        - min = 1: 한 청크에는 한 명만 말할 수도 있으므로 하한은 두지 않음
+        """
+        if not self.ids or margin is None:
+            return {}
+        return {"min_speakers": 1, "max_speakers": len(self.ids) + max(0, int(margin))}
 
     def match(self, embedding: np.ndarray):
         """
         기존 speaker 중 가장 유사한 speaker 찾기
         """
-        best_id = None
-        best_score = 0.0
+        if not self.ids:
+            return None, 0.0
 
-        for spk_id, data in self.speakers.items():
-            score = cosine_sim(embedding, data["embedding"])
-            if score > best_score:
-                best_score = score
-                best_id = spk_id
+        scores = self.scores(embedding)[0]
+        best = int(scores.argmax())
+        best_score = max(0.0, float(scores[best]))
 
         if best_score >= self.similarity_threshold:
-            return best_id, best_score
+            return self.ids[best], best_score
 
         return None, best_score
 
     def register(self, embedding: np.ndarray):
         """
-        신규 speaker 등록
+        신규 speaker 등록 (voice profile 에 있는 사람이면 "PROFILE_<profile_id>" 를 ID 로 사용)
+        자동 ID(SPK_n)와 이름공간이 달라 겹치지 않고, 이름이 같은 두 profile 도 따로 식별됨
         """
-        new_id = f"SPK_{len(self.speakers)}"
-        self.speakers[new_id] = {
-            "embedding": embedding,
-            "count": 1
-        }
+        row = _normalize(np.asarray(embedding).reshape(-1))
+        hit = self.profiles.identify(row, self.profile_threshold) if self.profiles is not None else None
+        n = len(self.ids)
+        if self._matrix is None:
+            self._matrix = np.zeros((8, row.shape[0]), dtype=np.float32)
+        elif n == len(self._matrix):
+            # 용량 2배로 확장 (행렬은 계속 연속 메모리)
+            grown = np.zeros((2 * n, self._matrix.shape[1]), dtype=np.float32)
+            grown[:n] = self._matrix[:n]
+            self._matrix = grown
+
+        new_id = f"SPK_{n}"
+        if hit is not None and f"PROFILE_{hit[0]}" not in self._rows:
+            new_id = f"PROFILE_{hit[0]}"
+            self.profile_of[new_id] = {"profile_id": hit[0], "name": hit[1]}
+            print(f"[Registry] Identified enrolled speaker '{hit[1]}' as {new_id} (score={hit[2]:.2f})")
+        self._matrix[n] = row
+        self._counts = np.append(self._counts, 1)
+        self._rows[new_id] = n
+        self.ids.append(new_id)
         return new_id
 
+    def display_name(self, label: str) -> str:
+        """
+        표시용 라벨: 등록 화자 ID 를 이름으로 바꿈 ("PROFILE_x & SPK_1 (겹침 발화)" 포함)
+        """
+        return _PROFILE_ID.sub(
+            lambda m: self.profile_of[m.group()]["name"] if m.group() in self.profile_of else m.group(), label
+        )
+
     def update(self, spk_id: str, new_embedding: np.ndarray):
         """
-        기존 speaker embedding을 EMA 방식으로 업데이트
+        기존 speaker embedding을 EMA 방식으로 업데이트 (정규화된 공간에서, 결과도 정규화)
         """
-        old = self.speakers[spk_id]["embedding"]
+        row = self._rows[spk_id]
         alpha = self.ema_alpha
 
-        updated = alpha * old + (1.0 - alpha) * new_embedding
-        self.speakers[spk_id]["embedding"] = updated
-        self.speakers[spk_id]["count"] += 1
+        updated = alpha * self._matrix[row] + (1.0 - alpha) * _normalize(np.asarray(new_embedding).reshape(-1))
+        self._matrix[row] = _normalize(updated)
+        self._counts[row] += 1
 
     def match_or_create(self, embedding: np.ndarray, update: bool = True):
         """
@@ -86,3 +185,77 @@ class SpeakerRegistry:
         new_id = self.register(embedding)
         return new_id, None
 
+    def link(self, embeddings, labels, weights=None, update: bool = True, exclude=()):
+        """
+        청크의 turn embedding 을 local 화자 단위로 전역 화자에 1:1 할당
+
+        - 모든 turn 을 전역 centroid 와 한 번의 행렬곱으로 점수화
+        - local 화자 점수 = 그 화자 turn 점수의 가중 평균 (기본 가중치: 1)
+        - local x 전역 점수 행렬에서 Hungarian 할당, threshold 미만은 신규 화자로 등록
+        - 서로 다른 local 화자가 같은 전역 화자로 묶이지 않음
+
+        :param embeddings: (turn 수, dim)
+        :param labels: turn 별 local 화자 라벨
+        :param weights: turn 별 가중치 (예: turn 길이)
+        :param exclude: 이번 청크에서 이미 다른 local 화자가 차지한 전역 ID
+        :return: { local 라벨: (전역 ID, score 또는 None(신규)) }
+        """
+        if len(labels) == 0:
+            return {}
+
+        embeddings = _normalize(np.atleast_2d(embeddings))
+        locals_ = list(dict.fromkeys(labels))
+        position = {label: i for i, label in enumerate(locals_)}
+        index = np.array([position[label] for label in labels])
+        weights = np.ones(len(labels), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        weights = np.maximum(weights, 1e-6)
+        total = np.zeros(len(locals_), dtype=np.float32)
+        np.add.at(total, index, weights)
+
+        # local 화자별 가중 평균 embedding (등록/갱신용)
+        means = np.zeros((len(locals_), embeddings.shape[1]), dtype=np.float32)
+        np.add.at(means, index, embeddings * weights[:, None])
+        means = _normalize(means / total[:, None])
+
+        exclude = set(exclude)
+        candidates = [row for row, spk_id in enumerate(self.ids) if spk_id not in exclude]
+        assigned = {}
+        if candidates:
+            turn_scores = embeddings @ self.centroids[candidates].T  # (turn 수, 후보 수)
+            scores = np.zeros((len(locals_), len(candidates)), dtype=np.float32)
+            np.add.at(scores, index, turn_scores * weights[:, None])
+            scores /= total[:, None]
+
+            for i, j in _assign(scores):
+                if scores[i, j] >= self.similarity_threshold:
+                    assigned[locals_[i]] = (self.ids[candidates[j]], float(scores[i, j]))
+
+        result = {}
+        for i, label in enumerate(locals_):
+            if label in assigned:
+                spk_id, score = assigned[label]
+                if update:
+                    self.update(spk_id, means[i])
+                result[label] = (spk_id, score)
+            else:
+                result[label] = (self.register(means[i]), None)
+        return result
+
+
+def _assign(scores: np.ndarray):
+    """
+    점수 합이 최대가 되는 1:1 할당 [(행, 열)]
+    한쪽이 1개뿐이면 argmax 로 충분하므로 scipy 를 부르지 않음
+    """
+    rows, cols = scores.shape
+    if rows == 0 or cols == 0:
+        return []
+    if rows == 1:
+        return [(0, int(scores[0].argmax()))]
+    if cols == 1:
+        return [(int(scores[:, 0].argmax()), 0)]
+
+    from scipy.optimize import linear_sum_assignment
+
+    row_idx, col_idx = linear_sum_assignment(scores, maximize=True)
+    return list(zip(row_idx.tolist(), col_idx.tolist()))
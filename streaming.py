@@ -0,0 +1,202 @@
+"""
+streaming.py
+
+청크를 처음부터 따로 diarization 하지 않고, 청크 경계를 이어가는 streaming diarization
+
+- 직전 청크 끝 lookback 구간(기본 5초)을 새 청크 앞에 붙여서 diarization (segmentation 문맥 유지)
+- lookback 구간에서 직전 청크의 turn 과 겹치는 local 화자는 그 전역 ID 를 그대로 이어받음
+- 나머지 local 화자는 turn embedding 을 길이 가중 평균하여 SpeakerRegistry 와 화자당 1회 매칭
+  (lookback 안에서 끝난 turn 만 있는 화자는 이미 내보낸 오디오이므로 매칭하지 않음)
+- 청크 경계를 넘는 turn 은 lookback 오디오까지 포함한 하나의 turn/embedding 으로 내보냄 (continued=True)
+- 순서가 어긋난 청크(누락/지연)는 lookback 없이 단독 처리
+- 공개(commit) 시 경계를 넘은 turn 의 앞부분 record 는 직전 청크 마지막 record 에 이어 붙임 (stitch)
+  * 직전 청크는 이미 공개되었으므로 새 record 에 merged_into=이전 record ID 를 표시 (패치와 같은 방식)
+  * read_records / 클라이언트는 fold_stitched 처럼 하나의 record 로 합침 (텍스트 이어 붙이기, end 연장)
+"""
+
+import threading
+
+import numpy as np
+
+from audio_io import duration_of, slice_waveform
+
+
+class StreamingDiarizer:
+    """
+    청크 사이에 lookback 오디오와 경계 turn 을 보관하는 diarization 상태
+    """
+
+    def __init__(self, lookback_sec: float = 5.0, min_carry_ratio: float = 0.5):
+        """
+        :param lookback_sec: 새 청크 앞에 붙이는 직전 청크 꼬리 길이 (초)
+        :param min_carry_ratio: lookback 구간 발화 중 직전 화자와 겹쳐야 하는 최소 비율 (ID 이어받기 기준)
+        """
+        self.lookback_sec = lookback_sec
+        self.min_carry_ratio = min_carry_ratio
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.last_index = None
+        self.tail = None  # 직전 청크 끝 lookback 오디오
+        self.tail_turns = []  # 직전 청크 turn 중 lookback 구간에 걸친 것 (tail 기준 시간, 전역 ID)
+        self.last_record = None  # 직전에 공개된 청크의 마지막 record (stitch 용)
+
+    def process(self, diarizer, speaker_registry, chunk_index: int, waveform: np.ndarray, count_hints: dict = None):
+        """
+        :param count_hints: diarizer.diarize 에 넘길 min_speakers / max_speakers (SpeakerRegistry.count_hints)
+        :return: diarize() 와 같은 형식의 turn 목록 (청크 기준 시간)
+            speaker / global_speaker 모두 전역 ID, 경계를 넘는 turn 은 continued=True
+        """
+        with self._lock:
+            contiguous = self.tail is not None and chunk_index == self.last_index + 1
+            offset = duration_of(self.tail) if contiguous else 0.0
+            audio = np.concatenate([self.tail, waveform]) if contiguous else waveform
+
+            turns = diarizer.diarize(audio, **(count_hints or {}))
+
+            mapping = self._carry_over(turns, offset) if contiguous else {}
+            self._match_new(turns, mapping, speaker_registry, offset)
+            results = self._emit(turns, mapping, offset)
+
+            # 늦게 도착한 청크는 상태를 되돌리지 않음
+            if self.last_index is None or chunk_index > self.last_index:
+                self._keep_tail(chunk_index, waveform, results)
+            return results
+
+    def _carry_over(self, turns, offset: float):
+        """
+        lookback 구간에서 직전 청크 화자와 충분히 겹치는 local 화자 -> 전역 ID (1:1, 겹침 큰 순)
+        """
+        speech, shared = {}, {}
+        for d in turns:
+            s, e = d["start"], min(d["end"], offset)
+            if e <= s:
+                continue
+            speech[d["speaker"]] = speech.get(d["speaker"], 0.0) + (e - s)
+            for t in self.tail_turns:
+                inter = min(e, t["end"]) - max(s, t["start"])
+                if inter > 0:
+                    key = (d["speaker"], t["global_speaker"])
+                    shared[key] = shared.get(key, 0.0) + inter
+
+        mapping, used = {}, set()
+        for (local, spk), inter in sorted(shared.items(), key=lambda x: x[1], reverse=True):
+            if local in mapping or spk in used or inter < self.min_carry_ratio * speech[local]:
+                continue
+            mapping[local] = spk
+            used.add(spk)
+        return mapping
+
+    def _match_new(self, turns, mapping: dict, speaker_registry, offset: float = 0.0):
+        """
+        local 화자별 길이 가중 평균 embedding 으로 SpeakerRegistry 1:1 매칭 (화자당 1회)
+        이어받은 화자는 같은 embedding 으로 centroid 만 갱신
+        lookback 안에서 끝난 turn 은 직전 청크에서 이미 매칭/갱신했으므로 제외 (offset 이후 길이로 가중)
+        """
+        sums, weights = {}, {}
+        for d in turns:
+            if d["end"] <= offset:
+                continue
+            w = d["end"] - max(d["start"], offset)
+            emb = np.asarray(d["embedding"], dtype=np.float32).reshape(-1)
+            sums[d["speaker"]] = sums.get(d["speaker"], 0.0) + w * emb
+            weights[d["speaker"]] = weights.get(d["speaker"], 0.0) + w
+
+        new = []
+        for local, total in sums.items():
+            embedding = total / max(weights[local], 1e-6)
+            if local in mapping:
+                speaker_registry.update(mapping[local], embedding)
+            else:
+                new.append((local, embedding))
+
+        # 이어받은 전역 ID 는 제외하고, 나머지 local 화자끼리 같은 전역 ID 를 갖지 않게 할당
+        if new:
+            linked = speaker_registry.link(
+                [embedding for _, embedding in new], [local for local, _ in new],
+                exclude=mapping.values(),
+            )
+            for local, (spk_id, _) in linked.items():
+                mapping[local] = spk_id
+
+    def _emit(self, turns, mapping: dict, offset: float):
+        """
+        lookback 안에서 끝난 turn 은 직전 청크에서 이미 내보냈으므로 제외, 나머지는 청크 시간으로 이동
+        """
+        results = []
+        for d in turns:
+            if d["end"] <= offset:
+                continue
+            spk = mapping[d["speaker"]]
+            results.append({
+                "start": round(max(0.0, d["start"] - offset), 2),
+                "end": round(d["end"] - offset, 2),
+                "speaker": spk,
+                "global_speaker": spk,
+                "embedding": d["embedding"],
+                "continued": d["start"] < offset,
+            })
+        return results
+
+    def _keep_tail(self, chunk_index: int, waveform: np.ndarray, results):
+        duration = duration_of(waveform)
+        tail_start = max(0.0, duration - self.lookback_sec)
+
+        self.last_index = chunk_index
+        self.tail = slice_waveform(waveform, tail_start, duration).copy()
+        self.tail_turns = [
+            {
+                "start": max(0.0, d["start"] - tail_start),
+                "end": d["end"] - tail_start,
+                "global_speaker": d["global_speaker"],
+            }
+            for d in results
+            if d["end"] > tail_start
+        ]
+
+    def stitch(self, chunk_index: int, records, continued: dict) -> int:
+        """
+        공개 순서(commit_stage)로 호출: 경계를 넘은 turn 에 속한 앞부분 record 에 merged_into 표시
+        직전 청크 마지막 record 와 화자가 같고, 이어진 turn 이 끝나기 전에 시작한 record 만 (처음 다른 것에서 멈춤)
+        :param records: 이 청크의 공개 record (시작 순, 전역 시간)
+        :param continued: { 전역 화자: 이어진 turn 의 끝 (전역 시간) }
+        :return: 이어 붙인 record 수
+        """
+        with self._lock:
+            previous = self.last_record
+            stitched = 0
+            if previous is not None and previous["chunk"] == chunk_index - 1:
+                target = previous.get("merged_into", previous["id"])
+                for record in records:
+                    end = continued.get(record["speaker"])
+                    if record["speaker"] != previous["speaker"] or end is None or record["start"] >= end:
+                        break
+                    record["merged_into"] = target
+                    stitched += 1
+            self.last_record = dict(records[-1]) if records else None
+            return stitched
+
+
+def fold_stitched(records):
+    """
+    merged_into 가 있는 record 를 대상 record 에 합침 (텍스트 이어 붙이기, end 연장)
+    :param records: 공개 순서의 record (정제 패치 적용 후)
+    :return: 합쳐진 record 목록
+    """
+    by_id = {}
+    folded = []
+    for record in records:
+        target = by_id.get(record.get("merged_into"))
+        if target is None:
+            record.pop("merged_into", None)
+            folded.append(record)
+            if "id" in record:
+                by_id[record["id"]] = record
+            continue
+        target["text"] = f"{target['text'].rstrip()} {record['text'].lstrip()}".strip()
+        target["end"] = max(target["end"], record["end"])
+        if record.get("refined"):
+            target["refined"] = True
+        by_id[record["id"]] = target
+    return folded
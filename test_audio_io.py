@@ -0,0 +1,62 @@
+import io
+import sys
+import wave
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from audio_io import PcmDecoder, slice_waveform
+
+
+def make_wav(rate=44100, secs=2.0, freq=440.0):
+    """
+    테스트용 사인파 WAV bytes 생성
+    """
+    t = np.arange(int(rate * secs)) / rate
+    pcm = (0.5 * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def test_decoder_reuse():
+    # 같은 디코더(리샘플러 재사용)로 여러 번 디코딩해도 샘플 정렬이 유지되어야 함
+    # (최초 디코딩은 swr 초기 상태 때문에 앞 몇 샘플만 다를 수 있음)
+    data = make_wav()
+    decoder = PcmDecoder()
+    first = decoder.decode(data)
+    second = decoder.decode(data)
+    third = decoder.decode(data)
+
+    t = np.arange(len(first)) / 16000
+    ref = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+
+    print(f"Decoded: {len(first)} samples, dtype={first.dtype}")
+    success = (
+        first.dtype == np.float32
+        and len(first) == 32000
+        and np.abs(first[100:-100] - ref[100:-100]).max() < 1e-2
+        and np.allclose(first[100:], second[100:], atol=1e-6)
+        and np.array_equal(second, third)
+    )
+
+    # slice 는 복사 없는 view 여야 함
+    view = slice_waveform(first, 0.5, 1.0)
+    success = success and np.shares_memory(view, first) and len(view) == 8000
+
+    if success:
+        print("\n✅ In-process decoding verified!")
+    else:
+        print("\n❌ In-process decoding failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_decoder_reuse()
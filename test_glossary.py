@@ -0,0 +1,105 @@
+import sys
+import time
+from pathlib import Path
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from glossary import Glossary, TtlLruCache, query_terms
+
+
+def test_glossary_lookup():
+    glossary = Glossary([
+        {"term": "이음", "description": "회사명"},
+        {"term": "Azure AI Search", "description": "검색 서비스", "aliases": ["애저 서치"]},
+        {"term": "pyannote", "description": "화자 분리 라이브러리"},
+    ])
+    for i in range(5000):
+        glossary.add(f"용어{i}", f"설명{i}")
+
+    text = "이음은 이번 분기에 애저 서치를 도입하고, Azure AI Search 인덱스를 PYANNOTE 결과와 연결합니다. 용어42 도 확인."
+    t0 = time.perf_counter()
+    for _ in range(100):
+        found = glossary.lookup(text)
+    per_call_ms = (time.perf_counter() - t0) * 1000 / 100
+
+    print(found)
+    print(f"lookup: {per_call_ms:.3f}ms per call over {len(glossary)} terms")
+
+    success = (
+        found.splitlines() == ["이음: 회사명", "Azure AI Search: 검색 서비스", "pyannote: 화자 분리 라이브러리", "용어42: 설명42"]
+        and glossary.lookup("search 는 단독으로 나오면 매칭 안 됨") == ""
+        and per_call_ms < 1.0
+    )
+
+    if success:
+        print("\n✅ Glossary lookup verified!")
+    else:
+        print("\n❌ Glossary lookup failed.")
+    assert success
+
+
+def test_search_cache():
+    cache = TtlLruCache(maxsize=2, ttl_sec=0.05)
+    a = query_terms("배포 일정 배포 일정 검토")
+    b = query_terms("검토, 일정; 배포!")
+    cache.put(a, "remote A")
+    hit = cache.get(b)  # 순서/문장부호가 달라도 같은 키
+
+    cache.put(("x",), "X")
+    cache.put(("y",), "Y")  # maxsize 2 -> 가장 오래된 a 제거
+    evicted = cache.get(a)
+    time.sleep(0.06)
+    expired = cache.get(("y",))
+
+    print("key:", a, "stats:", cache.stats())
+    success = a == b and hit == "remote A" and evicted is None and expired is None
+
+    if success:
+        print("\n✅ Search cache verified!")
+    else:
+        print("\n❌ Search cache failed.")
+    assert success
+
+
+def test_glossary_correct():
+    glossary = Glossary([
+        {"term": "이음", "description": "회사명", "mishearings": ["이윰", "e음"], "suspects": ["이름"]},
+        {"term": "Kubernetes", "mishearings": ["쿠버 네티스", "kubernetis"]},
+        {"term": "k8s", "mishearings": ["k8"]},
+    ])
+
+    fixed, fixes, suspects = glossary.correct("이윰은 kubernetis 에 쿠버 네티스를 올리고 k8s 와 k8 를 비교")
+    clean, clean_fixes, clean_suspects = glossary.correct("e음 팀이 Kubernetes 로 이전합니다")
+    _, _, ambiguous = glossary.correct("이름을 적어 주세요")
+    # 한국어 표기가 더 긴 단어의 앞부분이면 고치지 않음 (mishearing 은 확인 대상으로 낮춤, suspect 는 무시)
+    api = Glossary([{"term": "API", "mishearings": ["에이피"]}, {"term": "이음", "suspects": ["이름"]}])
+    partial, partial_fixes, partial_suspects = api.correct("이름다운 에이피아이 문서")
+    particle, _, _ = api.correct("에이피에서는 이름으로도")
+
+    print("fixed:", fixed, fixes)
+    print("clean:", clean, clean_fixes, clean_suspects)
+    print("ambiguous:", ambiguous)
+    print("partial:", partial, partial_fixes, partial_suspects, "| particle:", particle)
+
+    success = (
+        fixed == "이음은 Kubernetes 에 Kubernetes를 올리고 k8s 와 k8s 를 비교"
+        and suspects == []
+        and clean == "이음 팀이 Kubernetes 로 이전합니다" and clean_suspects == []
+        and ambiguous == [("이름", "이음")]
+        and partial == "이름다운 에이피아이 문서" and partial_fixes == []
+        and partial_suspects == [("에이피", "API")]
+        and particle == "API에서는 이름으로도"
+    )
+
+    if success:
+        print("\n✅ Glossary corrections verified!")
+    else:
+        print("\n❌ Glossary corrections failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_glossary_lookup()
+    test_glossary_correct()
+    test_search_cache()
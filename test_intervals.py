@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from intervals import union, intersection, complement, active_counts, overlap_matrix, processing_regions
+
+
+def test_interval_algebra():
+    starts, ends = np.array([5.0, 0.0, 1.0]), np.array([6.0, 2.0, 3.0])
+
+    u = union(starts, ends)
+    i = intersection(starts, ends, [2.5], [5.5])
+    c = complement(starts, ends, 0.0, 10.0)
+    seg_starts, seg_ends, counts = active_counts(starts, ends)
+    m = overlap_matrix([0.0, 4.0], [2.0, 6.0], [1.0, 5.0], [3.0, 9.0])
+    regions = processing_regions(10.0, [{"start": 2.0, "end": 4.0, "speakers": ["A", "B"]}])
+
+    print("union:", u)
+    print("intersection:", i)
+    print("complement:", c)
+    print("active:", list(zip(seg_starts, seg_ends, counts)))
+    print("regions:", [(r["start"], r["end"], r["type"]) for r in regions])
+
+    success = (
+        u[0].tolist() == [0.0, 5.0] and u[1].tolist() == [3.0, 6.0]
+        and i[0].tolist() == [2.5, 5.0] and i[1].tolist() == [3.0, 5.5]
+        and c[0].tolist() == [3.0, 6.0] and c[1].tolist() == [5.0, 10.0]
+        and counts.tolist() == [1, 2, 1, 0, 1]
+        and m.tolist() == [[1.0, 0.0], [0.0, 1.0]]
+        and [(r["start"], r["end"], r["type"]) for r in regions] == [
+            (0.0, 2.0, "clean"), (2.0, 4.0, "overlap"), (4.0, 10.0, "clean")
+        ]
+    )
+
+    if success:
+        print("\n✅ Interval algebra verified!")
+    else:
+        print("\n❌ Interval algebra failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_interval_algebra()
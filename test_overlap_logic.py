@@ -1,49 +1,10 @@
-def get_overlapping_segments(diar_results):
-    """
-    [Logic Copy from diarization.py]
-    """
-    if not diar_results:
-        return []
+import sys
+from pathlib import Path
 
-    events = []
-    for d in diar_results:
-        events.append((d["start"], 1, d["speaker"]))
-        events.append((d["end"], -1, d["speaker"]))
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
 
-    events.sort()
-
-    overlaps = []
-    active_speakers = set()
-    last_time = events[0][0]
-
-    for time, kind, speaker in events:
-        if len(active_speakers) > 1 and time > last_time:
-            overlaps.append({
-                "start": last_time,
-                "end": time,
-                "speakers": list(active_speakers)
-            })
-        
-        if kind == 1:
-            active_speakers.add(speaker)
-        else:
-            active_speakers.discard(speaker)
-        
-        last_time = time
-
-    merged = []
-    if overlaps:
-        curr = overlaps[0]
-        for i in range(1, len(overlaps)):
-            nxt = overlaps[i]
-            if nxt["start"] == curr["end"] and set(nxt["speakers"]) == set(curr["speakers"]):
-                curr["end"] = nxt["end"]
-            else:
-                merged.append(curr)
-                curr = nxt
-        merged.append(curr)
-
-    return merged
+from intervals import find_overlaps as get_overlapping_segments
 
 def run_test():
     mock_results = [
@@ -0,0 +1,163 @@
+import sys
+import time
+import threading
+from pathlib import Path
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from pipeline import ChunkPipeline, Stage
+
+
+def test_pipeline_order():
+    # 느린 LLM 단계가 있어도 commit 은 chunk_index 순서여야 하고,
+    # 실패한 청크는 순서만 소비하고 commit 되지 않아야 함
+    committed = []
+
+    def analyze(job):
+        if job["chunk_index"] == 2:
+            raise RuntimeError("boom")
+        time.sleep(0.01)
+
+    def refine(job):
+        time.sleep(0.05)
+
+    pipeline = ChunkPipeline(
+        [
+            Stage("decode", lambda job: None, maxsize=0),
+            Stage("analyze", analyze),
+            Stage("refine", refine),
+            Stage("commit", lambda job: committed.append(job["chunk_index"])),
+        ],
+        reorder_timeout=5.0,
+    ).start()
+
+    # 업로드 순서가 뒤바뀐 경우 (1 이 0 보다 먼저 도착)
+    for idx in [1, 0, 2, 3, 4]:
+        pipeline.submit({"chunk_index": idx})
+    pipeline.close()
+
+    stats = pipeline.stats()
+    print(f"Committed: {committed}")
+    print(f"Bottleneck: {stats['bottleneck']}")
+    for s in stats["stages"]:
+        print(f"  {s['stage']}: processed={s['processed']} failed={s['failed']} occupancy={s['occupancy']}")
+
+    success = committed == [0, 1, 3, 4] and stats["bottleneck"] == "refine"
+
+    if success:
+        print("\n✅ Pipeline ordering verified!")
+    else:
+        print("\n❌ Pipeline ordering failed.")
+    assert success
+
+
+def test_ordered_middle_stage():
+    # commit 이 중간 단계여도 순서대로 실행되고, 뒤 단계(refine)도 그 순서로 받아야 함
+    committed, refined = [], []
+
+    pipeline = ChunkPipeline(
+        [
+            Stage("decode", lambda job: time.sleep(0.02 if job["chunk_index"] == 0 else 0.0), maxsize=0),
+            Stage("commit", lambda job: committed.append(job["chunk_index"]), ordered=True),
+            Stage("refine", lambda job: refined.append(job["chunk_index"]), maxsize=0),
+        ],
+        reorder_timeout=5.0,
+    ).start()
+
+    for idx in [2, 1, 0, 3]:
+        pipeline.submit({"chunk_index": idx})
+    pipeline.close()
+
+    print(f"Committed: {committed}, refined: {refined}")
+    success = committed == [0, 1, 2, 3] and refined == [0, 1, 2, 3]
+
+    if success:
+        print("\n✅ Ordered middle stage verified!")
+    else:
+        print("\n❌ Ordered middle stage failed.")
+    assert success
+
+
+def test_batched_stage_coalesces_backlog():
+    # refine 이 밀리면 쌓인 job 을 예산(최대 3개) 안에서 묶어 처리하고, 순서와 실패 전달은 그대로여야 함
+    batches = []
+    gate = threading.Event()
+
+    def refine_batch(jobs):
+        gate.wait()  # 첫 job 이 처리 중인 동안 나머지가 대기열에 쌓이도록
+        batches.append([job["chunk_index"] for job in jobs])
+
+    pipeline = ChunkPipeline(
+        [
+            Stage("commit", lambda job: None, maxsize=0, ordered=True),
+            Stage("refine", lambda job: refine_batch([job]), maxsize=0, batch_fn=refine_batch,
+                  batch_fits=lambda jobs: len(jobs) <= 3),
+        ],
+        reorder_timeout=5.0,
+    ).start()
+
+    pipeline.submit({"chunk_index": 0})
+    time.sleep(0.1)  # 0 은 혼자 처리 중 (막혀 있음)
+    for idx in range(1, 8):
+        pipeline.submit({"chunk_index": idx})
+    time.sleep(0.1)
+    backlog = pipeline.backlog()
+    gate.set()
+    pipeline.close()
+
+    refine_stats = pipeline.stats()["stages"][1]
+    print(f"Batches: {batches}, backlog while blocked: {backlog}, stats: {refine_stats}")
+    success = (
+        batches == [[0], [1, 2, 3], [4, 5, 6], [7]]
+        and backlog == 7
+        and refine_stats["processed"] == 8
+        and refine_stats["batches"] == 2 and refine_stats["coalesced"] == 6
+    )
+
+    if success:
+        print("\n✅ Backlog coalescing verified!")
+    else:
+        print("\n❌ Backlog coalescing failed.")
+    assert success
+
+
+def test_cancel_waits_for_running_job():
+    # /reset: cancel 이 돌아온 뒤에는 실행 중이던 job 이 끝나 있어야 하고, 다음 단계로 넘어가면 안 됨
+    started, finished, committed = threading.Event(), [], []
+
+    def analyze(job):
+        started.set()
+        time.sleep(0.2)
+        finished.append(job["chunk_index"])
+
+    pipeline = ChunkPipeline(
+        [
+            Stage("analyze", analyze, maxsize=0),
+            Stage("commit", lambda job: committed.append(job["chunk_index"])),
+        ],
+        reorder_timeout=5.0,
+    ).start()
+
+    for idx in range(3):
+        pipeline.submit({"chunk_index": idx})
+    started.wait(1.0)
+    # 시간 안에 못 끝나면 False (/reset 은 409) -> 다시 부르면 남은 job 을 마저 기다림
+    early = pipeline.cancel(timeout=0.05)
+    stopped = pipeline.cancel(timeout=2.0)
+
+    print(f"early={early} stopped={stopped} finished={finished} committed={committed}")
+    success = not early and stopped and finished == [0] and committed == []
+
+    if success:
+        print("\n✅ Cancel waits for the running job!")
+    else:
+        print("\n❌ Cancel returned too early.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_pipeline_order()
+    test_ordered_middle_stage()
+    test_batched_stage_coalesces_backlog()
+    test_cancel_waits_for_running_job()
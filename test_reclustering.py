@@ -0,0 +1,88 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from reclustering import TurnEmbeddingLog, recluster, relabel_segments
+
+
+def fragmented_meeting(chunks=600, speakers=6, dim=192, seed=0):
+    """
+    온라인 매칭이 화자마다 중간에 새 ID 로 쪼개진 회의 (화자 k 는 회의 후반 SPK_{speakers + k})
+    """
+    rng = np.random.default_rng(seed)
+    voices = rng.normal(size=(speakers, dim))
+    log = TurnEmbeddingLog()
+    for c in range(chunks):
+        turns = []
+        for k in rng.choice(speakers, size=3, replace=False):
+            label = f"SPK_{k}" if c < chunks // 2 else f"SPK_{speakers + k}"
+            emb = voices[k] + 0.6 * rng.normal(size=dim)
+            turns.append({"start": 0.0, "end": float(rng.uniform(2, 10)), "global_speaker": label, "embedding": emb})
+        log.record(c, turns)
+    return log
+
+
+def test_recluster_merges_fragments():
+    log = fragmented_meeting()
+
+    t0 = time.perf_counter()
+    mapping, report = recluster(log, threshold=0.7)
+    elapsed = time.perf_counter() - t0
+
+    segments = [
+        {"chunk": 400, "speaker": "SPK_6", "start": 0.0, "end": 1.0, "text": "a"},
+        {"chunk": 400, "speaker": "SPK_6 & SPK_0 (겹침 발화)", "start": 0.0, "end": 1.0, "text": "b"},
+        {"chunk": 10, "speaker": "SPK_0", "start": 0.0, "end": 1.0, "text": "c"},
+    ]
+    relabelled = relabel_segments(segments, mapping, report["merged"])
+
+    print(f"rows={report['rows']} {report['speakers_before']} -> {report['speakers_after']} speakers in {elapsed * 1000:.1f}ms")
+    print("merged:", report["merged"])
+    print("segments:", [s["speaker"] for s in segments])
+
+    success = (
+        report["rows"] == 1800
+        and report["speakers_after"] == 6
+        and all(report["merged"][f"SPK_{6 + k}"] == f"SPK_{k}" for k in range(6))
+        and relabelled == 2
+        and [s["speaker"] for s in segments] == ["SPK_0", "SPK_0", "SPK_0"]
+        and elapsed < 1.0
+    )
+
+    if success:
+        print("\n✅ Re-clustering verified!")
+    else:
+        print("\n❌ Re-clustering failed.")
+    assert success
+
+
+def test_recluster_keeps_distinct_speakers():
+    # 같은 청크에 함께 말한 화자는 embedding 이 비슷해도 병합하지 않음
+    rng = np.random.default_rng(1)
+    voice = rng.normal(size=64)
+    log = TurnEmbeddingLog()
+    for c in range(20):
+        log.record(c, [
+            {"start": 0.0, "end": 3.0, "global_speaker": "SPK_0", "embedding": voice + 0.1 * rng.normal(size=64)},
+            {"start": 3.0, "end": 6.0, "global_speaker": "SPK_1", "embedding": voice + 0.1 * rng.normal(size=64)},
+        ])
+
+    mapping, report = recluster(log, threshold=0.7)
+    print("distinct:", report)
+
+    success = mapping == {} and report["speakers_after"] == 2
+    if success:
+        print("\n✅ Co-occurring speakers kept apart!")
+    else:
+        print("\n❌ Co-occurring speakers merged.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_recluster_merges_fragments()
+    test_recluster_keeps_distinct_speakers()
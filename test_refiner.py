@@ -0,0 +1,233 @@
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from refiner import Refiner
+from glossary import Glossary
+
+
+class StubState:
+    lock = threading.Lock()
+    inflight = 0
+    max_inflight = 0
+    requests = 0
+    connections = set()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Azure OpenAI chat completions 를 흉내내는 로컬 stub (0.3초 지연, keep-alive)
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with StubState.lock:
+            StubState.inflight += 1
+            StubState.requests += 1
+            StubState.max_inflight = max(StubState.max_inflight, StubState.inflight)
+            StubState.connections.add(self.client_address)
+        time.sleep(0.3)
+
+        segments = json.loads(body["messages"][1]["content"])
+        content = json.dumps({"segments": [{"text": seg["text"] + "."} for seg in segments]}, ensure_ascii=False)
+        payload = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        }).encode()
+        with StubState.lock:
+            StubState.inflight -= 1
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+async def refine_while_ticking(refiner, jobs):
+    """
+    refine 을 동시에 실행하면서 10ms ticker 가 계속 도는지 (event loop 가 막히지 않는지) 확인
+    """
+    ticks = 0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tick_task = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(refiner.refine(segs, i + 1) for i, segs in enumerate(jobs)))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await tick_task
+
+    # 확인 필요 표기가 없는 청크는 로컬 교정만 하고 LLM 을 부르지 않음
+    fast = await refiner.refine([{"speaker": "SPK_0", "text": "이윰 회의", "start": 0.0, "end": 1.0}], 7)
+
+    # 밀린 청크 묶음: LLM 이 필요한 청크 8, 10 은 요청 1번, 청크 9 는 fast path, 결과는 청크별로 나뉨
+    batch = await refiner.refine_batch([
+        (8, [{"speaker": "SPK_0", "text": "문장 8a", "start": 0.0, "end": 1.0},
+             {"speaker": "SPK_1", "text": "문장 8b", "start": 1.0, "end": 2.0}]),
+        (9, [{"speaker": "SPK_0", "text": "이윰 9", "start": 0.0, "end": 1.0}]),
+        (10, [{"speaker": "SPK_1", "text": "문장 10", "start": 0.0, "end": 1.0}]),
+    ])
+    await refiner.aclose()
+    return results + [fast], batch, ticks, elapsed
+
+
+def test_refiner_against_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        refiner = Refiner(
+            endpoint=f"http://127.0.0.1:{server.server_port}",
+            api_key="stub",
+            api_version="2024-06-01",
+            deployment_name="stub",
+            max_concurrency=2,
+            # "문장" 은 오인식일 수 있는 표기 -> 모든 job 이 LLM(stub) 으로 감
+            glossary=Glossary([
+                {"term": "문정", "suspects": ["문장"]},
+                {"term": "이음", "mishearings": ["이윰"]},
+            ]),
+        )
+        jobs = [[{"speaker": "SPK_0", "text": f"문장 {i}", "start": 0.0, "end": 1.0}] for i in range(6)]
+        results, batch, ticks, elapsed = asyncio.run(refine_while_ticking(refiner, jobs))
+    finally:
+        server.shutdown()
+
+    texts = [segs[0]["text"] for segs in results]
+    batch_texts = [[seg["text"] for seg in segs] for segs in batch]
+    print("texts:", texts)
+    print("batch:", batch_texts, refiner.profile())
+    print(f"elapsed={elapsed:.2f}s ticks={ticks} max_inflight={StubState.max_inflight} "
+          f"requests={StubState.requests} connections={len(StubState.connections)}")
+
+    # 6 requests x 0.3s with 2 in flight -> ~0.9s; the loop keeps ticking meanwhile
+    success = (
+        texts == [f"문장 {i}." for i in range(6)] + ["이음 회의"]
+        and batch_texts == [["문장 8a.", "문장 8b."], ["이음 9"], ["문장 10."]]
+        and refiner.counters["fast_path"] == 2 and refiner.counters["llm_calls"] == 7
+        and refiner.counters["coalesced_chunks"] == 2
+        and StubState.requests == 7
+        and StubState.max_inflight == 2
+        and len(StubState.connections) <= 2
+        and ticks >= 0.5 * elapsed / 0.01
+    )
+
+    if success:
+        print("\n✅ Async refiner verified!")
+    else:
+        print("\n❌ Async refiner failed.")
+    assert success
+
+
+def test_refiner_without_glossary():
+    # 용어집이 배포되지 않은 경우 (빈 용어집): fast path 없이 모든 청크가 LLM 으로 가야 함
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    requests_before = StubState.requests
+    try:
+        refiner = Refiner(
+            endpoint=f"http://127.0.0.1:{server.server_port}",
+            api_key="stub",
+            api_version="2024-06-01",
+            deployment_name="stub",
+            glossary=Glossary.load(Path(__file__).parent / "missing_glossary.json"),
+        )
+
+        async def run():
+            single = await refiner.refine([{"speaker": "SPK_0", "text": "회의 시작", "start": 0.0, "end": 1.0}], 1)
+            batch = await refiner.refine_batch([
+                (2, [{"speaker": "SPK_0", "text": "안건 하나", "start": 0.0, "end": 1.0}]),
+                (3, [{"speaker": "SPK_1", "text": "안건 둘", "start": 0.0, "end": 1.0}]),
+            ])
+            await refiner.aclose()
+            return [single] + batch
+
+        results = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    texts = [[seg["text"] for seg in segs] for segs in results]
+    print("texts:", texts, refiner.profile())
+    success = (
+        len(refiner.glossary) == 0
+        and texts == [["회의 시작."], ["안건 하나."], ["안건 둘."]]
+        and refiner.counters["fast_path"] == 0 and refiner.counters["llm_calls"] == 2
+        and StubState.requests - requests_before == 2
+    )
+
+    if success:
+        print("\n✅ Empty glossary falls back to the LLM!")
+    else:
+        print("\n❌ Empty glossary skipped the LLM.")
+    assert success
+
+
+def test_refine_timeout_keeps_glossary_fixes():
+    # LLM 정제가 시간 초과되어도 로컬 용어 교정(네트워크 불필요)은 패치로 남아야 함
+    import processor
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    real = (processor.refiner, processor.REFINE_TIMEOUT_SEC)
+    processor.refiner = Refiner(
+        endpoint=f"http://127.0.0.1:{server.server_port}",
+        api_key="stub",
+        api_version="2024-06-01",
+        deployment_name="stub",
+        # "문장" 은 확인 필요 표기 -> LLM 으로 가지만 stub 지연(0.3초)이 timeout 보다 김
+        glossary=Glossary([
+            {"term": "문정", "suspects": ["문장"]},
+            {"term": "이음", "mishearings": ["이윰"]},
+        ]),
+    )
+    processor.REFINE_TIMEOUT_SEC = 0.05
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            patch_jsonl = Path(tmp) / "patch.jsonl"
+            segments = [
+                {"id": "4-0", "speaker": "SPK_0", "text": "이윰 문장", "start": 0.0, "end": 1.0},
+                {"id": "4-1", "speaker": "SPK_1", "text": "그대로", "start": 1.0, "end": 2.0},
+            ]
+            job = {"chunk_index": 4, "segments": segments, "timings": {}, "skipped": []}
+            processor.refine_batch_stage([job], Path(tmp), patch_jsonl)
+            patches = [json.loads(line) for line in patch_jsonl.read_text(encoding="utf-8").splitlines()]
+    finally:
+        processor.refiner, processor.REFINE_TIMEOUT_SEC = real
+        server.shutdown()
+
+    print("patches:", patches, "skipped:", job["skipped"])
+    success = (
+        patches == [{"chunk": 4, "id": "4-0", "text": "이음 문장"}]
+        and job["skipped"] == [{"step": "refine", "reason": "timeout"}]
+        and segments[0]["text"] == "이윰 문장"  # 공개된 원본은 패치로만 바뀜
+    )
+
+    if success:
+        print("\n✅ Glossary fixes survive a refine timeout!")
+    else:
+        print("\n❌ Refine timeout dropped the glossary fixes.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_refiner_against_stub()
+    test_refiner_without_glossary()
+    test_refine_timeout_keeps_glossary_fixes()
@@ -0,0 +1,157 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+import processor
+import speaker_assigner
+from processor import analyze_regions, new_job, transcribe_regions
+from speaker_linker import SpeakerRegistry
+
+SR = 16000
+
+
+class StubTranscriber:
+    """
+    transcribe_batch 대체: 클립마다 0.1 ~ (길이 - 0.1)초 segment 1개, 텍스트는 호출 순서 번호
+    (segments 를 지정하면 클립 순서대로 그대로 돌려줌)
+    """
+
+    def __init__(self, segments=None):
+        self.segments = segments
+        self.clip_sec = []
+
+    def __call__(self, clips):
+        self.clip_sec = [round(len(clip) / SR, 2) for clip in clips]
+        if self.segments is not None:
+            return [[dict(seg) for seg in segs] for segs in self.segments]
+        return [
+            [{"start": 0.1, "end": round(sec - 0.1, 2), "text": f"clip{i}"}]
+            for i, sec in enumerate(self.clip_sec)
+        ]
+
+
+class StubDiarizer:
+    """
+    label_tracks 용 embed: 트랙 순서대로 미리 정한 embedding
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = list(embeddings)
+
+    def embed(self, track):
+        return self.embeddings.pop(0)
+
+
+def test_transcribe_regions():
+    waveform = np.zeros(10 * SR, dtype=np.float32)
+    track = np.zeros(SR, dtype=np.float32)
+    separated = [
+        ({"start": 2.0, "end": 4.0, "speakers": ["SPK_0", "SPK_1"]}, [track, track], 0.0),
+        ({"start": 6.0, "end": 7.0, "speakers": ["SPK_0", "SPK_2"]}, [track, track], 0.0),
+    ]
+    # 두 번째 겹침의 두 번째 트랙은 화자를 못 찾음 -> 겹침 라벨로 대체
+    track_labels = [["SPK_0", "SPK_1"], ["SPK_2", None]]
+    transcribe = StubTranscriber()
+
+    mixture, tracks = transcribe_regions(waveform, separated, track_labels, transcribe)
+    only_tracks, _ = transcribe_regions(waveform, separated, track_labels, StubTranscriber(), mixture=False)
+
+    print("clips:", transcribe.clip_sec)
+    print("mixture:", [(s["start"], s["end"], s["text"]) for s in mixture])
+    print("tracks:", [(s["start"], s["speaker"], s["text"]) for s in tracks])
+
+    success = (
+        # clean 구간 (0-2, 4-6, 7-10) 다음에 트랙 4개, 한 번의 batch 호출
+        transcribe.clip_sec == [2.0, 2.0, 3.0, 1.0, 1.0, 1.0, 1.0]
+        and [(s["start"], s["end"], s["text"]) for s in mixture] == [
+            (0.1, 1.9, "clip0"), (4.1, 5.9, "clip1"), (7.1, 9.9, "clip2"),
+        ]
+        and [(s["start"], s["end"], s["speaker"], s["text"]) for s in tracks] == [
+            (2.1, 2.9, "SPK_0", "clip3"),
+            (2.1, 2.9, "SPK_1", "clip4"),
+            (6.1, 6.9, "SPK_2", "clip5"),
+            (6.1, 6.9, "SPK_0 & SPK_2 (겹침 발화)", "clip6"),
+        ]
+        and only_tracks == []
+    )
+
+    if success:
+        print("\n✅ Region transcription verified!")
+    else:
+        print("\n❌ Region transcription failed.")
+    assert success
+
+
+def test_analyze_regions_skips_separated_overlaps():
+    # 겹침 2개 중 2-4s 만 분리됨 -> 혼합 음성 배정에는 6-7.5s 겹침만 넘어가야 함
+    e0, e1 = np.eye(2, dtype=np.float32)
+    diar_segments = [
+        {"start": 0.0, "end": 4.0, "speaker": "SPEAKER_00", "embedding": e0},
+        {"start": 2.0, "end": 7.5, "speaker": "SPEAKER_01", "embedding": e1},
+        {"start": 6.0, "end": 10.0, "speaker": "SPEAKER_00", "embedding": e0},
+    ]
+    overlaps = [
+        {"start": 2.0, "end": 4.0, "speakers": ["SPEAKER_00", "SPEAKER_01"]},
+        {"start": 6.0, "end": 7.5, "speakers": ["SPEAKER_00", "SPEAKER_01"]},
+    ]
+    track = np.zeros(2 * SR, dtype=np.float32)
+
+    seen = {}
+    real = (processor.diarize_and_separate, processor.separate_planned, processor.SEPARATION_PASS,
+            speaker_assigner.assign_speakers)
+
+    def assign_spy(**kwargs):
+        seen["overlaps"] = kwargs["overlaps"]
+        return real[3](**kwargs)
+
+    processor.diarize_and_separate = lambda job, *args: (diar_segments, overlaps, [], [])
+    processor.separate_planned = lambda separator, waveform, ovs, deadline, skipped: [(ovs[0], [track, track], 0.5)]
+    processor.SEPARATION_PASS = "overlap"
+    speaker_assigner.assign_speakers = assign_spy
+    try:
+        job = new_job(0, None)
+        job["waveform"] = np.zeros(10 * SR, dtype=np.float32)
+        transcribe = StubTranscriber([
+            [{"start": 0.2, "end": 1.8, "text": "A 혼자"}],  # clean 0-2
+            [{"start": 0.2, "end": 1.5, "text": "B 혼자"}, {"start": 2.0, "end": 3.5, "text": "둘이 동시에"}],  # clean 4-10
+            [{"start": 0.0, "end": 1.5, "text": "트랙 1"}],
+            [{"start": 0.1, "end": 1.9, "text": "트랙 2"}],
+        ])
+        # 분리 트랙은 B, A 순서로 나옴 -> 트랙 라벨도 그 순서
+        analyze_regions(job, diarizer=StubDiarizer([e1, e0]), separator=object(), speaker_registry=SpeakerRegistry(),
+                        transcribe_batch=transcribe)
+    finally:
+        (processor.diarize_and_separate, processor.separate_planned, processor.SEPARATION_PASS,
+         speaker_assigner.assign_speakers) = real
+
+    segments = [(s["start"], s["speaker"], s["text"]) for s in job["segments"]]
+    print("clips:", transcribe.clip_sec)
+    print("assigner overlaps:", seen["overlaps"])
+    for seg in segments:
+        print(" ", seg)
+
+    success = (
+        transcribe.clip_sec == [2.0, 6.0, 2.0, 2.0]
+        and [(ov["start"], ov["end"]) for ov in seen["overlaps"]] == [(6.0, 7.5)]
+        and segments[0] == (0.2, "SPK_0", "A 혼자")
+        # 분리 트랙은 겹침 구간 시간으로, 화자는 트랙 embedding 기준
+        and segments[1] == (2.0, "SPK_1", "트랙 1") and segments[2] == (2.1, "SPK_0", "트랙 2")
+        and segments[3] == (4.2, "SPK_1", "B 혼자")
+        and segments[4] == (6.0, "SPK_0 & SPK_1 (겹침 발화)", "둘이 동시에")
+        and "waveform" not in job
+    )
+
+    if success:
+        print("\n✅ Region analysis verified!")
+    else:
+        print("\n❌ Region analysis failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_transcribe_regions()
+    test_analyze_regions_skips_separated_overlaps()
@@ -7,7 +7,7 @@ test_run.py
 from pathlib import Path
 import json
 
-from main import process_chunk
+from processor import process_chunk
 from config import INPUT_DIR, OUTPUT_DIR
 
 # ----------------------------
@@ -34,7 +34,7 @@ def run_test():
         print(f"[INFO] processing chunk {idx}: {wav_path.name}")
         process_chunk(
             chunk_index=idx,
-            wav_path=wav_path
+            audio=wav_path
         )
 
     print("[INFO] all chunks processed")
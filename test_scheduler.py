@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from scheduler import ChunkDeadline, SeparationCostModel, plan_separation
+
+
+def test_plan_separation():
+    # 겹침 5개: 1.5s(최소 길이 미달), 6s, 4s, 3s, 2.5s
+    overlaps = [
+        {"start": 0.0, "end": 1.5, "speakers": ["A", "B"]},
+        {"start": 2.0, "end": 8.0, "speakers": ["A", "B"]},
+        {"start": 10.0, "end": 14.0, "speakers": ["B", "C"]},
+        {"start": 15.0, "end": 18.0, "speakers": ["A", "C"]},
+        {"start": 20.0, "end": 22.5, "speakers": ["A", "B"]},
+    ]
+    # 겹침 1초당 1초 + 구간당 0.5초 -> 남은 예산 12초
+    cost = SeparationCostModel(sec_per_sec=1.0, overhead_sec=0.5)
+    deadline = ChunkDeadline(budget_sec=12.0)
+
+    planned, skipped = plan_separation(overlaps, deadline, cost, min_duration=2.0, max_overlaps=3)
+
+    print("--- Planned ---")
+    for ov in planned:
+        print(f"{ov['start']}s ~ {ov['end']}s")
+    print("\n--- Skipped ---")
+    for sk in skipped:
+        print(f"{sk['start']}s ~ {sk['end']}s ({sk['reason']})")
+
+    # 6s(6.5) + 4s(4.5) = 11.0 -> 3s(3.5) 는 예산 초과, 2.5s 는 개수 상한 이전에 예산 초과
+    success = (
+        [ov["start"] for ov in planned] == [2.0, 10.0]
+        and [(sk["start"], sk["reason"]) for sk in skipped] == [(15.0, "deadline"), (20.0, "deadline")]
+    )
+
+    # 예산이 충분하면 개수 상한(3개)이 적용되어야 함
+    planned, skipped = plan_separation(overlaps, ChunkDeadline(budget_sec=100.0), cost, max_overlaps=3)
+    success = success and len(planned) == 3 and [sk["reason"] for sk in skipped] == ["overlap_cap"]
+
+    if success:
+        print("\n✅ Separation planning verified!")
+    else:
+        print("\n❌ Separation planning failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_plan_separation()
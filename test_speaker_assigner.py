@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from speaker_assigner import assign_speakers
+from bench_assign_speakers import assign_speakers_loop, synthetic_meeting
+
+
+def test_assign_speakers_matches_loop():
+    success = True
+    for seed in range(5):
+        stt, diar, overlaps = synthetic_meeting(minutes=10.0, seed=seed)
+        if assign_speakers(stt, diar, 0.5, overlaps) != assign_speakers_loop(stt, diar, 0.5, overlaps):
+            print(f"Mismatch with seed {seed}")
+            success = False
+
+    # 동점: 먼저 겹친 turn 의 화자 (B) 가 선택되어야 함
+    diar = [
+        {"start": 20.0, "end": 21.0, "global_speaker": "A"},
+        {"start": 0.0, "end": 1.0, "global_speaker": "B"},
+        {"start": 1.0, "end": 2.0, "global_speaker": "A"},
+    ]
+    stt = [{"start": 0.0, "end": 2.0, "text": "tie"}]
+    success = success and assign_speakers(stt, diar) == assign_speakers_loop(stt, diar)
+    success = success and assign_speakers(stt, diar)[0]["speaker"] == "B"
+
+    if success:
+        print("\n✅ Indexed speaker assignment verified!")
+    else:
+        print("\n❌ Indexed speaker assignment failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_assign_speakers_matches_loop()
@@ -0,0 +1,96 @@
+import sys
+import operator
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from speaker_linker import SpeakerRegistry
+
+
+def test_link_is_one_to_one():
+    registry = SpeakerRegistry(similarity_threshold=0.75)
+    spk_a, _ = registry.match_or_create(np.array([1.0, 0.0, 0.0]))
+
+    # 두 local 화자가 모두 A 와 비슷함 -> 더 비슷한 쪽만 A, 나머지는 신규 화자
+    embeddings = np.array([
+        [0.9, 0.3, 0.0],   # SPEAKER_00 turn 1
+        [1.0, 0.1, 0.0],   # SPEAKER_01
+        [0.9, 0.3, 0.05],  # SPEAKER_00 turn 2
+    ])
+    linked = registry.link(embeddings, ["SPEAKER_00", "SPEAKER_01", "SPEAKER_00"], weights=[2.0, 3.0, 1.0])
+
+    print("--- Linked ---")
+    for local, (spk_id, score) in linked.items():
+        print(f"{local} -> {spk_id} (score={score})")
+
+    centroids = registry.centroids
+    success = (
+        linked["SPEAKER_01"][0] == spk_a
+        and linked["SPEAKER_00"][1] is None
+        and linked["SPEAKER_00"][0] != spk_a
+        and centroids.dtype == np.float32
+        and centroids.flags["C_CONTIGUOUS"]
+        and np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+        and registry.scores(embeddings).shape == (3, 2)
+    )
+
+    # 이미 다른 local 화자가 차지한 ID 는 제외
+    linked = registry.link(np.array([[1.0, 0.0, 0.0]]), ["SPEAKER_02"], exclude=[spk_a])
+    success = success and linked["SPEAKER_02"][0] != spk_a
+
+    if success:
+        print("\n✅ One-to-one speaker linking verified!")
+    else:
+        print("\n❌ One-to-one speaker linking failed.")
+    assert success
+
+
+def test_count_hints():
+    registry = SpeakerRegistry()
+    empty = registry.count_hints(margin=2)
+    registry.register(np.array([1.0, 0.0, 0.0]))
+    registry.register(np.array([0.0, 1.0, 0.0]))
+    hints = registry.count_hints(margin=2)
+    print("hints:", empty, hints)
+
+    success = empty == {} and hints == {"min_speakers": 1, "max_speakers": 4}
+    if success:
+        print("\n✅ Speaker-count hints verified!")
+    else:
+        print("\n❌ Speaker-count hints failed.")
+    assert success
+
+
+def test_speakers_view_is_read_only():
+    # speakers 는 centroid 행렬에서 매번 만드는 snapshot: 수정 시도는 조용히 사라지지 않고 실패해야 함
+    registry = SpeakerRegistry()
+    spk_id = registry.register(np.array([1.0, 0.0, 0.0]))
+    view = registry.speakers
+
+    failures = 0
+    for mutate in (
+        lambda: operator.setitem(view, "SPK_9", {}),
+        lambda: operator.setitem(view[spk_id], "count", 10),
+        lambda: operator.setitem(view[spk_id]["embedding"], 0, 0.0),
+    ):
+        try:
+            mutate()
+        except (TypeError, ValueError):
+            failures += 1
+
+    print("read-only failures:", failures, "centroid:", registry.centroids[0])
+    success = failures == 3 and registry.centroids[0][0] > 0.99 and registry.centroids.flags.writeable
+    if success:
+        print("\n✅ Speakers view is read-only!")
+    else:
+        print("\n❌ Speakers view accepted a mutation.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_link_is_one_to_one()
+    test_count_hints()
+    test_speakers_view_is_read_only()
@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+from speaker_linker import SpeakerRegistry
+from streaming import StreamingDiarizer, fold_stitched
+
+
+class ScriptedDiarizer:
+    """
+    호출 순서대로 미리 정해 둔 turn 을 돌려주는 diarizer (입력 길이만 기록)
+    """
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.durations = []
+
+    def diarize(self, audio):
+        self.durations.append(len(audio) / 16000)
+        return self.outputs.pop(0)
+
+
+def test_streaming_stitches_boundary_turn():
+    e_a, e_b, e_c = np.eye(3, dtype=np.float32)
+    diarizer = ScriptedDiarizer([
+        # 청크 0 (30s): A 가 경계까지 말함
+        [
+            {"start": 2.0, "end": 12.0, "speaker": "SPEAKER_00", "embedding": e_b},
+            {"start": 22.0, "end": 30.0, "speaker": "SPEAKER_01", "embedding": e_a},
+        ],
+        # 청크 1 (5s lookback + 30s): local 라벨이 바뀌고 embedding 도 달라도 lookback 겹침으로 A 를 이어받아야 함
+        [
+            {"start": 0.0, "end": 8.0, "speaker": "SPEAKER_00", "embedding": e_c},
+            {"start": 15.0, "end": 20.0, "speaker": "SPEAKER_01", "embedding": e_b},
+        ],
+    ])
+    registry = SpeakerRegistry()
+    stream = StreamingDiarizer(lookback_sec=5.0)
+
+    first = stream.process(diarizer, registry, 0, np.zeros(30 * 16000, dtype=np.float32))
+    second = stream.process(diarizer, registry, 1, np.zeros(30 * 16000, dtype=np.float32))
+
+    print("--- Chunk 0 ---")
+    for d in first:
+        print(f"{d['speaker']}: {d['start']} ~ {d['end']}")
+    print("\n--- Chunk 1 ---")
+    for d in second:
+        print(f"{d['speaker']}: {d['start']} ~ {d['end']} (continued={d['continued']})")
+
+    speaker_a = first[1]["speaker"]
+    success = (
+        diarizer.durations == [30.0, 35.0]
+        and [(d["start"], d["end"], d["speaker"], d["continued"]) for d in second] == [
+            (0.0, 3.0, speaker_a, True),
+            (10.0, 15.0, first[0]["speaker"], False),
+        ]
+        and len(registry.speakers) == 2
+    )
+
+    # 순서가 어긋난 청크는 lookback 없이 단독 처리
+    diarizer.outputs.append([{"start": 1.0, "end": 4.0, "speaker": "SPEAKER_00", "embedding": e_c}])
+    late = stream.process(diarizer, registry, 5, np.zeros(30 * 16000, dtype=np.float32))
+    success = success and diarizer.durations[-1] == 30.0 and late[0]["continued"] is False
+
+    if success:
+        print("\n✅ Streaming diarization verified!")
+    else:
+        print("\n❌ Streaming diarization failed.")
+    assert success
+
+
+def test_lookback_only_speakers_not_matched():
+    # lookback 안에서 끝난 turn 만 있는 local 화자는 새 전역 ID 를 만들거나 centroid 를 다시 갱신하면 안 됨
+    e_a, e_b, e_c = np.eye(3, dtype=np.float32)
+    diarizer = ScriptedDiarizer([
+        [{"start": 20.0, "end": 27.0, "speaker": "SPEAKER_00", "embedding": e_a}],
+        [
+            {"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00", "embedding": e_a},  # 이어받음, 이미 내보낸 구간
+            {"start": 2.5, "end": 4.5, "speaker": "SPEAKER_01", "embedding": e_c},  # lookback 에만 있는 화자
+            {"start": 10.0, "end": 20.0, "speaker": "SPEAKER_02", "embedding": e_b},
+        ],
+    ])
+    registry = SpeakerRegistry()
+    stream = StreamingDiarizer(lookback_sec=5.0)
+
+    first = stream.process(diarizer, registry, 0, np.zeros(30 * 16000, dtype=np.float32))
+    second = stream.process(diarizer, registry, 1, np.zeros(30 * 16000, dtype=np.float32))
+    speaker_a = first[0]["speaker"]
+    speakers = registry.speakers
+
+    print("chunk 1:", [(d["speaker"], d["start"], d["end"]) for d in second])
+    print("registry:", {spk: info["count"] for spk, info in speakers.items()})
+    success = (
+        [(d["start"], d["end"]) for d in second] == [(5.0, 15.0)]
+        and len(speakers) == 2 and second[0]["speaker"] != speaker_a
+        and speakers[speaker_a]["count"] == 1
+    )
+
+    if success:
+        print("\n✅ Lookback-only speakers skipped!")
+    else:
+        print("\n❌ Lookback-only speakers were matched.")
+    assert success
+
+
+def test_stitch_boundary_records():
+    # 청크 0 마지막 발화(A)가 청크 1 앞부분으로 이어짐 -> 청크 1 첫 record 는 청크 0 record 에 합쳐져야 함
+    stream = StreamingDiarizer(lookback_sec=5.0)
+    chunk0 = [
+        {"id": "0-0", "chunk": 0, "speaker": "SPK_1", "start": 2.0, "end": 12.0, "text": "첫 발화"},
+        {"id": "0-1", "chunk": 0, "speaker": "SPK_0", "start": 22.0, "end": 30.0, "text": "경계를 넘는 "},
+    ]
+    chunk1 = [
+        {"id": "1-0", "chunk": 1, "speaker": "SPK_0", "start": 30.0, "end": 32.5, "text": "문장입니다"},
+        {"id": "1-1", "chunk": 1, "speaker": "SPK_1", "start": 40.0, "end": 45.0, "text": "다음 발화"},
+        {"id": "1-2", "chunk": 1, "speaker": "SPK_0", "start": 55.0, "end": 60.0, "text": "다시 A"},
+    ]
+    chunk2 = [{"id": "2-0", "chunk": 2, "speaker": "SPK_0", "start": 60.0, "end": 61.0, "text": "계속"}]
+    chunk4 = [{"id": "4-0", "chunk": 4, "speaker": "SPK_0", "start": 120.0, "end": 121.0, "text": "누락 뒤"}]
+
+    counts = [
+        stream.stitch(0, chunk0, {}),
+        stream.stitch(1, chunk1, {"SPK_0": 33.0}),
+        stream.stitch(2, chunk2, {"SPK_0": 62.0}),
+        stream.stitch(4, chunk4, {"SPK_0": 122.0}),  # 청크 3 누락: 이어 붙이지 않음
+    ]
+    folded = fold_stitched([dict(r) for r in chunk0 + chunk1 + chunk2 + chunk4])
+
+    print("stitched:", counts)
+    for r in folded:
+        print(f"  {r['id']} {r['speaker']}: {r['start']} ~ {r['end']} {r['text']}")
+
+    success = (
+        counts == [0, 1, 1, 0]
+        and chunk1[0]["merged_into"] == "0-1" and chunk2[0]["merged_into"] == "1-2"
+        and [(r["id"], r["end"], r["text"]) for r in folded] == [
+            ("0-0", 12.0, "첫 발화"),
+            ("0-1", 32.5, "경계를 넘는 문장입니다"),
+            ("1-1", 45.0, "다음 발화"),
+            ("1-2", 61.0, "다시 A 계속"),
+            ("4-0", 121.0, "누락 뒤"),
+        ]
+    )
+
+    if success:
+        print("\n✅ Boundary records stitched!")
+    else:
+        print("\n❌ Boundary stitching failed.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_streaming_stitches_boundary_turn()
+    test_lookback_only_speakers_not_matched()
+    test_stitch_boundary_records()
@@ -0,0 +1,183 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# 프로젝트 경로 추가
+sys.path.append(str(Path(__file__).parent))
+
+import voice_profiles
+from voice_profiles import VoiceProfileStore
+from speaker_linker import SpeakerRegistry
+
+
+def test_enroll_search_persist():
+    rng = np.random.default_rng(0)
+    alice, bob = rng.normal(size=192), rng.normal(size=192)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VoiceProfileStore(tmp)
+        alice_id = store.enroll("Alice", alice)
+        bob_id = store.enroll("Bob", bob)
+        store.enroll("Alice", alice + 0.1 * rng.normal(size=192), profile_id=alice_id)
+
+        hit = store.identify(alice + 0.2 * rng.normal(size=192), threshold=0.75)
+        miss = store.identify(rng.normal(size=192), threshold=0.75)
+
+        # 다시 열어도 같은 결과, 삭제는 tombstone 으로 유지
+        store.delete(bob_id)
+        reopened = VoiceProfileStore(tmp)
+        bob_after = reopened.identify(bob, threshold=0.75)
+
+        # 등록된 사람은 새 화자 등록 시 이름으로 식별
+        registry = SpeakerRegistry(profiles=reopened)
+        first = registry.register(alice)
+        second = registry.register(rng.normal(size=192))
+
+        print("hit:", hit, "miss:", miss, "bob after delete:", bob_after)
+        print("registry ids:", registry.ids)
+
+        success = (
+            hit is not None and hit[0] == alice_id and hit[1] == "Alice"
+            and miss is None
+            and bob_after is None
+            and len(reopened.profiles[alice_id]["rows"]) == 2
+            and first == f"PROFILE_{alice_id}"
+            and registry.profile_of == {first: {"profile_id": alice_id, "name": "Alice"}}
+            and registry.display_name(f"{first} & {second} (겹침 발화)") == f"Alice & {second} (겹침 발화)"
+            and second == "SPK_1"
+        )
+
+    if success:
+        print("\n✅ Voice profile store verified!")
+    else:
+        print("\n❌ Voice profile store failed.")
+    assert success
+
+
+def test_ivf_index():
+    rng = np.random.default_rng(1)
+    n = voice_profiles.IVF_MIN_ROWS + 100
+    people = rng.normal(size=(n, 64)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VoiceProfileStore(tmp)
+        ids = [store.enroll(f"P{i}", people[i]) for i in range(n)]
+
+        queries = rng.choice(n, size=50, replace=False)
+        found = [store.search(people[q] + 0.1 * rng.normal(size=64), k=1) for q in queries]
+        recall = np.mean([bool(f) and f[0][0] == ids[q] for f, q in zip(found, queries)])
+
+        reopened = VoiceProfileStore(tmp)
+        indexed = reopened.index is not None and reopened.index.size >= voice_profiles.IVF_MIN_ROWS
+
+    print(f"IVF recall@1: {recall:.2f}, index reloaded: {indexed}")
+    success = indexed and recall >= 0.9
+
+    if success:
+        print("\n✅ IVF index verified!")
+    else:
+        print("\n❌ IVF index failed.")
+    assert success
+
+
+def test_reenrolled_id_keeps_tombstone():
+    # 삭제된 profile_id 로 다시 등록해도 (enroll_speaker 의 profile_of 재사용), 재시작 후 옛 목소리가 되살아나면 안 됨
+    rng = np.random.default_rng(2)
+    old_voice, new_voice = rng.normal(size=192), rng.normal(size=192)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VoiceProfileStore(tmp)
+        profile_id = store.enroll("Alice", old_voice)
+        store.delete(profile_id)
+        store.enroll("Alice", new_voice, profile_id=profile_id)
+        live_old = store.identify(old_voice, threshold=0.75)
+
+        reopened = VoiceProfileStore(tmp)
+        reopened_old = reopened.identify(old_voice, threshold=0.75)
+        reopened_new = reopened.identify(new_voice, threshold=0.75)
+
+    print("old voice:", live_old, reopened_old, "new voice:", reopened_new)
+    success = (
+        live_old is None and reopened_old is None
+        and reopened_new is not None and reopened_new[0] == profile_id
+        and len(reopened.profiles[profile_id]["rows"]) == 1
+    )
+
+    if success:
+        print("\n✅ Tombstones survive re-enrollment!")
+    else:
+        print("\n❌ Deleted voice came back.")
+    assert success
+
+
+def test_orphan_row_after_crash():
+    # 벡터/count 는 기록됐지만 profiles.jsonl 레코드가 없는 행 (등록 도중 종료) -> 재시작 후 검색이 깨지면 안 됨
+    rng = np.random.default_rng(3)
+    alice, orphan = rng.normal(size=192), rng.normal(size=192)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VoiceProfileStore(tmp)
+        alice_id = store.enroll("Alice", alice)
+        store._vectors[store.count] = voice_profiles._normalize(orphan)
+        store._vectors.flush()
+        store.count += 1
+        store._write_meta()
+
+        reopened = VoiceProfileStore(tmp)
+        orphan_hit = reopened.identify(orphan, threshold=0.75)
+        bob_id = reopened.enroll("Bob", orphan)  # 주인 없는 행 자리를 다시 사용
+        bob_hit = reopened.identify(orphan, threshold=0.75)
+        alice_hit = reopened.identify(alice, threshold=0.75)
+
+    print("orphan:", orphan_hit, "bob:", bob_hit, "alice:", alice_hit, "count:", reopened.count)
+    success = (
+        orphan_hit is None
+        and bob_hit is not None and bob_hit[0] == bob_id
+        and alice_hit is not None and alice_hit[0] == alice_id
+        and reopened.count == len(reopened.row_owner) == 2
+    )
+
+    if success:
+        print("\n✅ Orphan rows ignored after restart!")
+    else:
+        print("\n❌ Orphan row broke search.")
+    assert success
+
+
+def test_profile_ids_do_not_collide():
+    # 이름이 자동 ID 와 같거나 (SPK_1), 두 profile 의 이름이 같아도 전역 화자는 따로 유지되어야 함
+    rng = np.random.default_rng(4)
+    fake_auto, kim_a, kim_b, stranger = (rng.normal(size=192) for _ in range(4))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VoiceProfileStore(tmp)
+        fake_id = store.enroll("SPK_1", fake_auto)
+        kim_a_id = store.enroll("김민수", kim_a)
+        kim_b_id = store.enroll("김민수", kim_b)
+
+        registry = SpeakerRegistry(profiles=store)
+        ids = [registry.register(v) for v in (fake_auto, stranger, kim_a, kim_b)]
+        matched = [registry.match(v)[0] for v in (fake_auto, stranger, kim_a, kim_b)]
+
+    print("registry ids:", ids, "names:", [registry.display_name(spk) for spk in ids])
+    success = (
+        ids == [f"PROFILE_{fake_id}", "SPK_1", f"PROFILE_{kim_a_id}", f"PROFILE_{kim_b_id}"]
+        and matched == ids
+        and [registry.display_name(spk) for spk in ids] == ["SPK_1", "SPK_1", "김민수", "김민수"]
+    )
+
+    if success:
+        print("\n✅ Profile IDs kept apart from auto IDs and names!")
+    else:
+        print("\n❌ Profile IDs collided.")
+    assert success
+
+
+if __name__ == "__main__":
+    test_enroll_search_persist()
+    test_ivf_index()
+    test_reenrolled_id_keeps_tombstone()
+    test_orphan_row_after_crash()
+    test_profile_ids_do_not_collide()
@@ -1,7 +1,14 @@
 from faster_whisper import WhisperModel, BatchedInferencePipeline
+from faster_whisper.vad import VadOptions, get_speech_timestamps
 from pathlib import Path
 import json
-from config import MODEL_NAME, DEVICE, LANGUAGE
+import numpy as np
+from config import MODEL_NAME, DEVICE, LANGUAGE, SAMPLE_RATE, CPU_THREADS
+
+# Whisper 입력 한 덩어리 최대 길이 (초)
+MAX_CLIP_SEC = 30
+# 여러 클립을 한 번에 보낼 때의 배치 크기
+CLIP_BATCH_SIZE = 16
 
 print(f"Whisper device = {DEVICE}")
 
@@ -21,6 +28,7 @@ def get_whisper_pipeline():
             MODEL_NAME,
             device=DEVICE,
             compute_type="float16" if DEVICE == "cuda" else "int8",
+            cpu_threads=CPU_THREADS if DEVICE == "cpu" else 0,
             num_workers=1
         )
         # 4배 빠른 배청 처리를 위한 Pipeline 선언
@@ -28,12 +36,13 @@ def get_whisper_pipeline():
         print("[Engine] Whisper Model loaded successfully.")
     return _transcription_pipeline
 
-def transcribe_chunk(audio_path):
+def transcribe_chunk(audio):
     # BatchedInferencePipeline의 transcribe 호출
+    # audio: 16kHz mono float32 np.ndarray (디코딩 생략) 또는 파일 경로
     pipeline = get_whisper_pipeline()
     
     segments, _ = pipeline.transcribe(
-        audio_path,
+        audio,
         language=LANGUAGE,
         beam_size=5,
         vad_filter=True
@@ -45,3 +54,53 @@ def transcribe_chunk(audio_path):
     ]
 
     return results
+
+
+def transcribe_batch(clips):
+    """
+    여러 짧은 오디오(분리된 트랙 등)를 BatchedInferencePipeline 한 번의 호출로 전사.
+    클립마다 VAD 로 앞뒤 무음을 잘라낸 뒤 하나의 버퍼에 이어 붙이고,
+    clip_timestamps 로 각 클립을 배치의 한 항목으로 넘깁니다.
+
+    :param clips: [np.ndarray] 16kHz mono float32
+    :return: 클립별 segment 리스트 (각 클립 기준 시간)
+    """
+    results = [[] for _ in clips]
+    spans = []  # (버퍼 내 시작 샘플, 끝 샘플, 클립 index, 클립 offset)
+    pieces, offset = [], 0
+    max_clip = MAX_CLIP_SEC * SAMPLE_RATE
+
+    for i, clip in enumerate(clips):
+        speech = get_speech_timestamps(clip, VadOptions(min_silence_duration_ms=160))
+        if speech:
+            start, end = speech[0]["start"], speech[-1]["end"]
+            # 30초를 넘는 클립은 Whisper 입력 길이에 맞춰 분할
+            for s in range(start, end, max_clip):
+                spans.append((offset + s, offset + min(end, s + max_clip), i, offset))
+        pieces.append(clip)
+        offset += len(clip)
+
+    if not spans:
+        return results
+
+    pipeline = get_whisper_pipeline()
+    segments, _ = pipeline.transcribe(
+        np.concatenate(pieces),
+        language=LANGUAGE,
+        beam_size=5,
+        clip_timestamps=[{"start": a / SAMPLE_RATE, "end": b / SAMPLE_RATE} for a, b, _, _ in spans],
+        batch_size=CLIP_BATCH_SIZE,
+    )
+
+    # segment 시작 시각으로 어느 클립에서 나온 것인지 찾아 클립 기준 시간으로 되돌림
+    span_starts = np.array([a for a, _, _, _ in spans]) / SAMPLE_RATE
+    for seg in segments:
+        k = max(0, int(np.searchsorted(span_starts, seg.start + 1e-3, side="right")) - 1)
+        _, _, i, base = spans[k]
+        results[i].append({
+            "start": seg.start - base / SAMPLE_RATE,
+            "end": seg.end - base / SAMPLE_RATE,
+            "text": seg.text,
+        })
+
+    return results
@@ -0,0 +1,255 @@
+"""
+voice_profiles.py
+
+회의가 끝나도 유지되는 등록 화자(voice profile) 저장소
+
+- embedding 은 정규화된 float32 memory-mapped 파일 (시작 시 즉시 열리고, 필요한 페이지만 읽음)
+- 메타데이터(이름, 등록 시각)는 jsonl, 삭제는 tombstone 기록
+- 검색은 NumPy IVF 근사 최근접 이웃 색인 (k-means coarse centroid + 역색인)
+  * 질의와 가까운 nprobe 개 리스트의 행만 memmap 에서 읽어 정확한 cosine 계산
+  * 색인 이후 등록된 행은 전수 비교, 일정 비율 이상 쌓이면 색인 재구성
+  * 등록 수가 적으면 (IVF_MIN_ROWS 미만) 전수 비교
+- SpeakerRegistry 가 새 화자를 등록할 때 조회하여, 등록된 사람이면 PROFILE_<profile_id> 를 전역 ID 로 사용
+  (이름은 표시용, SpeakerRegistry.display_name)
+"""
+
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+IVF_MIN_ROWS = 2048  # 이보다 적으면 색인 없이 전수 비교
+IVF_REBUILD_RATIO = 0.2  # 색인 밖 행이 색인 크기의 이 비율을 넘으면 재구성
+IVF_TRAIN_SAMPLE = 20000  # k-means 학습에 쓰는 최대 행 수
+IVF_ITERATIONS = 10
+
+
+def _normalize(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
+class IvfIndex:
+    """
+    Inverted-file 색인: 행을 가장 가까운 centroid 리스트에 배정 (CSR 형식으로 보관)
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = centroids  # (nlist, dim)
+        self.offsets = offsets  # (nlist + 1,) 리스트 k 의 행 = rows[offsets[k]:offsets[k+1]]
+        self.rows = rows  # 리스트 순으로 정렬된 행 번호
+        self.size = len(rows)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, seed: int = 0):
+        """
+        spherical k-means (nlist ~ 4·sqrt(N)) 로 centroid 학습 후 전체 행 배정
+        """
+        n = len(vectors)
+        nlist = max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+
+        for _ in range(IVF_ITERATIONS):
+            assign = (sample @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=len(centroids)) == 0
+            sums[empty] = centroids[empty]  # 빈 리스트는 이전 centroid 유지
+            centroids = _normalize(sums)
+
+        assign = np.concatenate([
+            (vectors[s:s + 65536] @ centroids.T).argmax(axis=1) for s in range(0, n, 65536)
+        ])
+        rows = np.argsort(assign, kind="stable")
+        offsets = np.r_[0, np.cumsum(np.bincount(assign, minlength=len(centroids)))]
+        return cls(centroids, offsets, rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        질의와 가장 가까운 nprobe 개 리스트의 행 번호
+        """
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[k]:self.offsets[k + 1]] for k in lists])
+
+    def save(self, path: Path):
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows)
+
+    @classmethod
+    def load(cls, path: Path):
+        data = np.load(path)
+        return cls(data["centroids"], data["offsets"], data["rows"])
+
+
+class VoiceProfileStore:
+    """
+    등록 화자 embedding 저장소 (memmap + IVF)
+    """
+
+    def __init__(self, profile_dir: Path, nprobe: int = 8):
+        self.dir = Path(profile_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.nprobe = nprobe
+        self.meta_path = self.dir / "meta.json"
+        self.vectors_path = self.dir / "embeddings.f32"
+        self.records_path = self.dir / "profiles.jsonl"
+        self.index_path = self.dir / "ivf.npz"
+        self._lock = threading.Lock()
+
+        meta = json.loads(self.meta_path.read_text()) if self.meta_path.exists() else {}
+        self.dim = meta.get("dim")
+        self.count = meta.get("count", 0)
+        self.capacity = meta.get("capacity", 0)
+        self._vectors = None
+        if self.dim and self.capacity:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+        # 행 -> profile_id, profile_id -> { name, rows, enrolled_at }
+        self.row_owner = []
+        self.profiles = {}
+        self._tombstoned = []  # 삭제된 profile 의 행 (같은 profile_id 로 다시 등록되어도 되살리지 않음)
+        if self.records_path.exists():
+            with open(self.records_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._apply(json.loads(line))
+        # count 는 재생한 레코드 기준 (meta 기록 전에 종료되었을 수 있음)
+        self.count = len(self.row_owner)
+        self._deleted_rows = np.unique(np.array(self._tombstoned, dtype=np.int64))
+
+        self.index = IvfIndex.load(self.index_path) if self.index_path.exists() else None
+        if self.index is not None and self.index.size > self.count:
+            self.index = None
+
+    def _apply(self, record: dict):
+        if record.get("deleted"):
+            profile = self.profiles.pop(record["profile_id"], None)
+            if profile is not None:
+                self._tombstoned.extend(profile["rows"])
+            return
+        profile = self.profiles.setdefault(record["profile_id"], {
+            "name": record["name"], "rows": [], "enrolled_at": record["enrolled_at"],
+        })
+        profile["rows"].append(record["row"])
+        self.row_owner.append(record["profile_id"])
+
+    def _write_meta(self):
+        self.meta_path.write_text(json.dumps({"dim": self.dim, "count": self.count, "capacity": self.capacity}))
+
+    def _ensure_capacity(self, dim: int):
+        if self.dim is None:
+            self.dim = dim
+        elif dim != self.dim:
+            raise ValueError(f"Embedding dim {dim} does not match the store ({self.dim})")
+        if self.count < self.capacity:
+            return
+
+        # 파일 크기를 2배로 늘린 뒤 다시 map
+        self.capacity = max(1024, 2 * self.capacity)
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(self.capacity * self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._write_meta()
+
+    def enroll(self, name: str, embedding, profile_id: str = None) -> str:
+        """
+        화자 등록 (같은 profile_id 로 여러 번 등록하면 embedding 이 추가됨)
+        :return: profile_id
+        """
+        vector = _normalize(np.asarray(embedding).reshape(-1))
+        with self._lock:
+            self._ensure_capacity(vector.shape[0])
+            if profile_id is None:
+                profile_id = uuid.uuid4().hex[:12]
+            elif profile_id in self.profiles:
+                name = self.profiles[profile_id]["name"]
+
+            # 벡터 -> 레코드 -> count 순으로 기록 (중간에 실패해도 주인 없는 행이 count 안에 들어가지 않음)
+            row = self.count
+            self._vectors[row] = vector
+            self._vectors.flush()
+
+            record = {"profile_id": profile_id, "name": name, "row": row, "enrolled_at": time.time()}
+            with open(self.records_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._apply(record)
+            self.count += 1
+            self._write_meta()
+
+            indexed = self.index.size if self.index is not None else 0
+            unindexed = self.count - indexed
+            if self.count >= IVF_MIN_ROWS and unindexed > IVF_REBUILD_RATIO * max(indexed, 1):
+                self._rebuild_index()
+        return profile_id
+
+    def delete(self, profile_id: str) -> bool:
+        with self._lock:
+            if profile_id not in self.profiles:
+                return False
+            with open(self.records_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"profile_id": profile_id, "deleted": True}) + "\n")
+            self._apply({"profile_id": profile_id, "deleted": True})
+            self._deleted_rows = np.union1d(self._deleted_rows, self._tombstoned)
+            return True
+
+    def _rebuild_index(self):
+        print(f"[Profiles] Rebuilding IVF index over {self.count} embeddings...")
+        self.index = IvfIndex.build(np.asarray(self._vectors[:self.count]))
+        self.index.save(self.index_path)
+
+    def search(self, embedding, k: int = 1):
+        """
+        :return: [(profile_id, name, score)] score 내림차순 (같은 사람은 최고 점수 1개)
+        """
+        with self._lock:
+            if self.count == 0 or self._vectors is None:
+                return []
+            query = _normalize(np.asarray(embedding).reshape(-1))
+            if query.shape[0] != self.dim:
+                return []
+
+            if self.index is None or self.count < IVF_MIN_ROWS:
+                rows = np.arange(self.count)
+            else:
+                # 색인 후보 + 색인 이후 추가된 행
+                rows = np.concatenate([self.index.candidates(query, self.nprobe), np.arange(self.index.size, self.count)])
+            if len(self._deleted_rows):
+                rows = np.setdiff1d(rows, self._deleted_rows, assume_unique=False)
+            if len(rows) == 0:
+                return []
+
+            rows = np.sort(rows)  # memmap 순차 접근
+            scores = np.asarray(self._vectors[rows]) @ query
+
+            results, seen = [], set()
+            for i in np.argsort(-scores):
+                profile_id = self.row_owner[rows[i]]
+                if profile_id in seen:
+                    continue
+                seen.add(profile_id)
+                results.append((profile_id, self.profiles[profile_id]["name"], float(scores[i])))
+                if len(results) >= k:
+                    break
+            return results
+
+    def identify(self, embedding, threshold: float):
+        """
+        threshold 이상으로 가장 가까운 등록 화자 (profile_id, name, score) 또는 None
+        """
+        hits = self.search(embedding, k=1)
+        if hits and hits[0][2] >= threshold:
+            return hits[0]
+        return None
+
+    def list_profiles(self):
+        return [
+            {"profile_id": pid, "name": p["name"], "embeddings": len(p["rows"]), "enrolled_at": p["enrolled_at"]}
+            for pid, p in self.profiles.items()
+        ]
@@ -17,7 +17,13 @@ async def listen_realtime():
                 if data["type"] == "new_segments":
                     print(f"\n--- Chunk {data['chunkIndex']} results ---")
                     for seg in data["segments"]:
-                        print(f"[{seg['start']}s - {seg['end']}s] {seg['speaker']}: {seg['text']}")
+                        # 청크 경계를 넘은 발화: 이전 segment 에 이어 붙일 부분
+                        merged = f" (+ {seg['merged_into']})" if seg.get("merged_into") else ""
+                        print(f"[{seg['start']}s - {seg['end']}s] {seg.get('speaker_name', seg['speaker'])}{merged}: {seg['text']}")
+                elif data["type"] == "segments_refined":
+                    # 이미 받은 segment 의 정제된 텍스트 (segment id 기준)
+                    for seg in data["segments"]:
+                        print(f"  [Refined {seg['id']}] {seg['text']}")
                 else:
                     print(f"[WS] Notification: {data}")
                     